@@ -1,3 +1,16 @@
+from nba_api.stats.library.http import NBAStatsHTTP
+
+from constant import NBA_STATS_BASE_URL
+
 __all__ = [
-    'static_data'
-]
\ No newline at end of file
+    'static_data',
+    'set_base_url',
+]
+
+
+def set_base_url(url):
+    """Sends every nba_api stats request to `url` (e.g. the local mock server) instead of stats.nba.com."""
+    NBAStatsHTTP.base_url = f"{url.rstrip('/')}/{{endpoint}}"
+
+
+set_base_url(NBA_STATS_BASE_URL)
@@ -4,77 +4,233 @@ from nba_api.stats.static import teams, players
 from nba_api.stats.endpoints import playbyplayv3, \
     playergamelogs,playergamelog, franchiseplayers, franchisehistory,\
     playbyplayv2, leaguegamelog, leaguegamefinder, boxscoreadvancedv2,\
-    boxscoretraditionalv2
+    boxscoretraditionalv2, boxscoredefensivev2, boxscorehustlev2, \
+    boxscorematchupsv3, BoxScoreUsageV3, hustlestatsboxscore
 import pandas as pd
 import json
 import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import requests
 
-from utils import export_to_file, retry, get_data_sample, make_dir
-from constant import  JSON_OUTPUT_DIR
+from utils import export_to_file, retry, get_data_sample, make_dir, content_hash
+from constant import  JSON_OUTPUT_DIR, REQUESTS_PER_SECOND, FETCH_WORKERS, \
+    LOCKOUT_SEASON_ID, EMPTY_RESULT_LIMIT, RAW_RESULT, PER_GAME_FORMAT, PER_GAME_COMPRESSION
+from utilities.result_set import raw_result, row_count
+from utilities import serializer
+from api_call.rate_limit import TokenBucket, rate_limited
+from api_call.response_cache import cached
+from api_call.retry import retrying, retry_report
+from api_call.manifest import get_default_manifest, \
+    STATUS_DONE, STATUS_EMPTY, STATUS_FAILED
+
+# tag (output table directory) -> endpoint fetched once per GAME_ID
+# first_season: earliest season the endpoint has data for, None if unknown
+PER_GAME_ENDPOINTS = {
+    'boxScoreAdvance': {'endpoint': boxscoreadvancedv2.BoxScoreAdvancedV2, 'first_season': None},
+    'boxScoreTraditional': {'endpoint': boxscoretraditionalv2.BoxScoreTraditionalV2, 'first_season': None},
+    'boxScoreUsage': {'endpoint': BoxScoreUsageV3, 'first_season': None},
+    'boxScoreDefensive': {'endpoint': boxscoredefensivev2.BoxScoreDefensiveV2, 'first_season': 2017},
+    'boxScoreMatchups': {'endpoint': boxscorematchupsv3.BoxScoreMatchupsV3, 'first_season': 2017},
+    'boxScoreHustle': {'endpoint': boxscorehustlev2.BoxScoreHustleV2, 'first_season': 2015},
+    'hustleStatsBoxScore': {'endpoint': hustlestatsboxscore.HustleStatsBoxScore, 'first_season': 2015},
+}
+
+
+# A per-game file is one dict of result sets: written back as ndjson it would load as a list
+PER_GAME_FORMATS = ['pretty', 'compact']
+
+
+def register_per_game_endpoint(tag, endpoint, first_season=None):
+    """Adds an endpoint taking `game_id` to the per-game pipeline. Results land in JSON_OUTPUT_DIR/<tag>/<season>."""
+    PER_GAME_ENDPOINTS[tag] = {'endpoint': endpoint, 'first_season': first_season}
 
 '''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
     Boxscore availavle starting season 1996
 
 '''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
 
-# @retry(max_retries=4, delay=0.5, exceptions=(ConnectionError, TimeoutError))
-def get_box_score_per_game(season=2024, dirr = JSON_OUTPUT_DIR, table = 'gameSummary', tag = 'boxScoreAdvance'):
+def pending_game_id(manifest, tag, json_data, output_dir, game_rows):
+    """GAME_IDs of the season not fetched yet, from the manifest instead of a directory scan."""
+    # Files fetched before the manifest existed are imported once per season
+    manifest.import_dir(tag, json_data, output_dir)
+    return set(manifest.missing(tag, {i['GAME_ID'] for i in game_rows}))
+
+
+def record_game(manifest, tag, json_data, game_id, path, api_result, status=STATUS_DONE):
+    size = os.path.getsize(path)
+    manifest.record(tag, game_id, json_data, status, size, content_hash(api_result))
+
+
+def normalized_result(api_result):
+    """
+    Result sets of an endpoint as {name: [row dict]}.
+    V3 endpoints return nested JSON and have no normalized dict, their parsed data sets are used instead.
+    """
+    result = api_result.get_normalized_dict()
+    if result:
+        return result
+    data_sets = api_result.nba_response.get_data_sets(api_result.endpoint)
+    return {
+        name: [dict(zip(data_set['headers'], row)) for row in data_set['data']]
+        for name, data_set in data_sets.items()
+    }
+
+
+def get_per_game_data(
+        season=2024,
+        tags=None,
+        dirr=JSON_OUTPUT_DIR,
+        table='gameSummary',
+        max_workers=FETCH_WORKERS,
+        requests_per_second=REQUESTS_PER_SECOND,
+        bucket=None,
+        use_cache=True,
+        raw=RAW_RESULT):
+    """
+    Fetches every per-game endpoint of a season in one pass.
+
+    The season's gameSummary file is read once, the manifest plans which
+    (tag, GAME_ID) pairs are missing, and a bounded pool of workers fetches
+    them under one TokenBucket. Each result is written to dirr/<tag>/<season>.
+
+    An endpoint stops for the season after EMPTY_RESULT_LIMIT empty results
+    (the 1998 lockout season is exempt), the other endpoints carry on.
+    Games recorded as empty are asked again on the next run, past the
+    response cache.
+
+    Args:
+        season (int): Season start year.
+        tags (list): Keys of PER_GAME_ENDPOINTS to fetch. Defaults to all of them.
+        max_workers (int): Size of the worker pool.
+        requests_per_second (float): Request budget when `bucket` is not given.
+        bucket (TokenBucket): Shared budget, pass one to limit several seasons or fetchers together.
+        use_cache (bool): Serve responses from the response cache when possible.
+        raw (bool): Write result sets as {'headers', 'rowSet'} (see utilities/result_set.py)
+            instead of one dict per row.
+
+    Returns:
+        dict: Games written per tag.
+    """
+    if PER_GAME_FORMAT not in PER_GAME_FORMATS:
+        raise ValueError(f"PER_GAME_FORMAT must be one of {PER_GAME_FORMATS}, not {PER_GAME_FORMAT!r}")
+    if tags is None:
+        tags = list(PER_GAME_ENDPOINTS)
+    tags = [tag for tag in tags
+            if PER_GAME_ENDPOINTS[tag]['first_season'] is None or season >= PER_GAME_ENDPOINTS[tag]['first_season']]
+
     json_data = f"{str(season)}_{str(season +1)[-2:]}"
-    dirr= f'{dirr}\\{table}'
-    make_dir(f'{dirr.replace('gameSummary','boxScoreAdvance')}\\{json_data}')
-    with open(f'{dirr}\\{json_data}.json','r',encoding='utf-8') as f1:
-        temp_data = json.load(f1)
-
-    empty_count = 0
-    collect_result = set()
-    for i in os.listdir(f'{JSON_OUTPUT_DIR}\\boxScoreAdvance\\{json_data}'):
-        collect_result.add(i.replace('.json',''))
-    print(len(collect_result))
+    temp_data = serializer.load(serializer.find_data_file(f'{dirr}\\{table}\\{json_data}'))
+
+    # One row per game, the finder has one per team
+    game_rows = {}
     for i in temp_data['LeagueGameFinderResults']:
-        if i['GAME_ID'] not in collect_result:
-            print(i['MATCHUP'])
-            time.sleep(1)
-            api_result = boxscoreadvancedv2.BoxScoreAdvancedV2(game_id=i['GAME_ID'])
+        game_rows.setdefault(i['GAME_ID'], i)
+
+    if bucket is None:
+        bucket = TokenBucket(requests_per_second)
+    manifest = get_default_manifest()
+
+    endpoints = {}
+    output_dirs = {}
+    pending = {}
+    refresh = {}
+    for tag in tags:
+        output_dirs[tag] = f'{dirr}\\{tag}\\{json_data}'
+        make_dir(output_dirs[tag])
+        endpoints[tag] = retrying(rate_limited(PER_GAME_ENDPOINTS[tag]['endpoint'], bucket))
+        if use_cache:
+            endpoints[tag] = cached(endpoints[tag])
+        pending[tag] = pending_game_id(manifest, tag, json_data, output_dirs[tag], game_rows.values())
+        refresh[tag] = manifest.game_ids(tag, json_data, STATUS_EMPTY) if use_cache else set()
+        print(f'{json_data} {tag}: {len(pending[tag])} game to fetch')
+
+    # Plan per game: every endpoint still missing for it
+    task_queue = queue.Queue()
+    for game_id, i in game_rows.items():
+        for tag in tags:
+            if game_id in pending[tag]:
+                task_queue.put((tag, i))
+
+    lock = threading.Lock()
+    stopped = set()
+    empty_count = {tag: 0 for tag in tags}
+    fetched = {tag: 0 for tag in tags}
+
+    def worker():
+        while True:
+            try:
+                tag, i = task_queue.get_nowait()
+            except queue.Empty:
+                return
+            if tag in stopped:
+                continue
+            print(f"{tag} {i['MATCHUP']}")
+            try:
+                kwargs = {'refresh': True} if i['GAME_ID'] in refresh[tag] else {}
+                api_result = endpoints[tag](game_id=i['GAME_ID'], **kwargs)
+                api_result = raw_result(api_result) if raw else normalized_result(api_result)
+            except Exception as e:
+                # Recorded so the next run picks it up again
+                print(f"{tag} {i['GAME_ID']} failed: {e}")
+                manifest.record(tag, i['GAME_ID'], json_data, STATUS_FAILED, error=str(e))
+                continue
 
             # season 1998 is a locked out season with missing game
-            if api_result.get_normalized_dict()['PlayerStats'] == [] and i['SEASON_ID'] not in ["21998","11998","31998","41998"]:
-                print('Result not availabel..')
-                empty_count +=1
-                if empty_count >=5:
-                    break
-            export_to_file(i['GAME_ID'],api_result.get_normalized_dict(),output_dir=f'{JSON_OUTPUT_DIR}\\boxScoreAdvance\\{json_data}')
-            collect_result.add(i['GAME_ID'])
-            # break
+            status = STATUS_DONE
+            if 'PlayerStats' in api_result and row_count(api_result['PlayerStats']) == 0 \
+                    and i['SEASON_ID'] not in LOCKOUT_SEASON_ID:
+                status = STATUS_EMPTY
+                with lock:
+                    empty_count[tag] += 1
+                    if empty_count[tag] >= EMPTY_RESULT_LIMIT and tag not in stopped:
+                        print(f'{tag}: Result not availabel..')
+                        stopped.add(tag)
+                if tag in stopped:
+                    continue
+            path = export_to_file(i['GAME_ID'], api_result, output_dir=output_dirs[tag],
+                                  fmt=PER_GAME_FORMAT if raw else 'pretty', compression=PER_GAME_COMPRESSION)
+            record_game(manifest, tag, json_data, i['GAME_ID'], path, api_result, status)
+            with lock:
+                fetched[tag] += 1
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(worker) for _ in range(max_workers)]
+        for future in futures:
+            # Re-raise anything a worker hit
+            future.result()
 
+    for tag in tags:
+        print(f'{json_data} {tag}: {fetched[tag]} game exported')
+    print(f'Retry: {retry_report()}')
+    return fetched
+
+
+def get_box_score_per_game(season=2024, dirr = JSON_OUTPUT_DIR, table = 'gameSummary', tag = 'boxScoreAdvance'):
+    return get_per_game_data(season, [tag], dirr, table, max_workers=1, requests_per_second=1)
 
 
 def get_traditional_box_score(season=2024, dirr = JSON_OUTPUT_DIR, table = 'gameSummary',tag='boxScoreTraditional'):
-    json_data = f"{str(season)}_{str(season +1)[-2:]}"
-    dirr= f'{dirr}\\{table}'
-    make_dir(f'{dirr.replace('gameSummary',tag)}\\{json_data}')
-    with open(f'{dirr}\\{json_data}.json','r',encoding='utf-8') as f1:
-        temp_data = json.load(f1)
-
-    empty_count = 0
-    collect_result = set()
-    for i in os.listdir(f'{JSON_OUTPUT_DIR}\\{tag}\\{json_data}'):
-        collect_result.add(i.replace('.json',''))
-    print(len(collect_result))
-    for i in temp_data['LeagueGameFinderResults']:
-        if i['GAME_ID'] not in collect_result:
-            print(i['MATCHUP'])
-            time.sleep(1)
-            api_result = boxscoretraditionalv2.BoxScoreTraditionalV2(game_id=i['GAME_ID'])
-            # season 1998 is a locked out season with missing game
-            if api_result.get_normalized_dict()['PlayerStats'] == [] and i['SEASON_ID'] not in ["21998","11998","31998","41998"]:
-                empty_count +=1
-                if empty_count >=5:
-                    print('Result not availabel..')
-                    break
-            export_to_file(
-                i['GAME_ID'],
-                api_result.get_normalized_dict(),
-                output_dir=f'{JSON_OUTPUT_DIR}\\{tag}\\{json_data}')
-            collect_result.add(i['GAME_ID'])
-            # break
+    return get_per_game_data(season, [tag], dirr, table, max_workers=1, requests_per_second=1)
+
+
+def get_box_score_concurrent(
+        season=2024,
+        tag='boxScoreAdvance',
+        dirr=JSON_OUTPUT_DIR,
+        table='gameSummary',
+        max_workers=FETCH_WORKERS,
+        requests_per_second=REQUESTS_PER_SECOND,
+        bucket=None,
+        use_cache=True,
+        raw=RAW_RESULT):
+    """Concurrent fetch of one per-game endpoint. Returns the number of games written."""
+    return get_per_game_data(
+        season, [tag], dirr, table,
+        max_workers=max_workers,
+        requests_per_second=requests_per_second,
+        bucket=bucket,
+        use_cache=use_cache,
+        raw=raw
+    )[tag]
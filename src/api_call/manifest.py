@@ -0,0 +1,198 @@
+import os
+import sqlite3
+import threading
+import time
+
+from constant import MANIFEST_PATH
+from utils import content_hash
+from utilities.serializer import split_extension
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+    Fetch manifest
+
+    One row per (endpoint, game_id) with the fetch status, size,
+    content hash and fetch time. Resume and "what is missing" are
+    primary key lookups instead of directory scans.
+
+    status: done | empty | failed
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+
+STATUS_DONE = 'done'
+STATUS_EMPTY = 'empty'
+STATUS_FAILED = 'failed'
+
+
+class FetchManifest():
+    """
+    SQLite backed record of every per-game fetch.
+
+    Args:
+        path (str): Location of the SQLite file.
+    """
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS fetch (
+                endpoint TEXT NOT NULL,
+                game_id TEXT NOT NULL,
+                season TEXT NOT NULL,
+                status TEXT NOT NULL,
+                bytes INTEGER,
+                content_hash TEXT,
+                fetched_at REAL NOT NULL,
+                error TEXT,
+                PRIMARY KEY (endpoint, game_id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_fetch_season_status
+                ON fetch (endpoint, season, status);
+            CREATE TABLE IF NOT EXISTS season_import (
+                endpoint TEXT NOT NULL,
+                season TEXT NOT NULL,
+                PRIMARY KEY (endpoint, season)
+            );
+        ''')
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def record(self, endpoint, game_id, season, status=STATUS_DONE, size=None, hash_value=None, error=None):
+        with self._lock:
+            self._conn.execute(
+                '''INSERT OR REPLACE INTO fetch
+                   (endpoint, game_id, season, status, bytes, content_hash, fetched_at, error)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                (endpoint, game_id, season, status, size, hash_value, time.time(), error)
+            )
+
+    def record_many(self, rows):
+        """rows: iterable of (endpoint, game_id, season, status, size, hash_value, error) in one transaction."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.executemany(
+                    '''INSERT OR REPLACE INTO fetch
+                       (endpoint, game_id, season, status, bytes, content_hash, fetched_at, error)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                    [(*row[:6], now, row[6]) for row in rows]
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def get(self, endpoint, game_id):
+        with self._lock:
+            row = self._conn.execute(
+                '''SELECT endpoint, game_id, season, status, bytes, content_hash, fetched_at, error
+                   FROM fetch WHERE endpoint = ? AND game_id = ?''',
+                (endpoint, game_id)
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ['endpoint', 'game_id', 'season', 'status', 'bytes', 'content_hash', 'fetched_at', 'error']
+        return dict(zip(keys, row))
+
+    def is_done(self, endpoint, game_id):
+        row = self.get(endpoint, game_id)
+        return row is not None and row['status'] == STATUS_DONE
+
+    def game_ids(self, endpoint, season, status=STATUS_DONE):
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT game_id FROM fetch WHERE endpoint = ? AND season = ? AND status = ?',
+                (endpoint, season, status)
+            ).fetchall()
+        return {i[0] for i in rows}
+
+    def missing(self, endpoint, game_ids):
+        """Returns the game_ids (in order) that are not fetched yet, including failed and empty ones."""
+        done = set()
+        game_ids = list(game_ids)
+        with self._lock:
+            # Stay under SQLite's bound parameter limit
+            for start in range(0, len(game_ids), 900):
+                chunk = game_ids[start:start + 900]
+                rows = self._conn.execute(
+                    f'''SELECT game_id FROM fetch
+                        WHERE endpoint = ? AND status = ? AND game_id IN ({','.join('?' * len(chunk))})''',
+                    (endpoint, STATUS_DONE, *chunk)
+                ).fetchall()
+                done.update(i[0] for i in rows)
+        return [i for i in game_ids if i not in done]
+
+    def failed(self, endpoint, season=None):
+        query = 'SELECT game_id FROM fetch WHERE endpoint = ? AND status = ?'
+        params = [endpoint, STATUS_FAILED]
+        if season is not None:
+            query += ' AND season = ?'
+            params.append(season)
+        with self._lock:
+            return [i[0] for i in self._conn.execute(query, params).fetchall()]
+
+    def summary(self, endpoint, season=None):
+        query = 'SELECT status, COUNT(*), SUM(bytes) FROM fetch WHERE endpoint = ?'
+        params = [endpoint]
+        if season is not None:
+            query += ' AND season = ?'
+            params.append(season)
+        query += ' GROUP BY status'
+        with self._lock:
+            return {i[0]: {'count': i[1], 'bytes': i[2] or 0} for i in self._conn.execute(query, params).fetchall()}
+
+    def import_dir(self, endpoint, season, directory):
+        """
+        One-time import of files fetched before the manifest existed.
+        Only scans `directory` the first time a (endpoint, season) is seen.
+        """
+        with self._lock:
+            seen = self._conn.execute(
+                'SELECT 1 FROM season_import WHERE endpoint = ? AND season = ?',
+                (endpoint, season)
+            ).fetchone()
+        if seen:
+            return 0
+
+        rows = []
+        if os.path.isdir(directory):
+            for filename in os.listdir(directory):
+                game_id, ext = split_extension(filename)
+                if ext:
+                    size = os.path.getsize(os.path.join(directory, filename))
+                    rows.append((endpoint, game_id, season, STATUS_DONE, size, None, None))
+        # Don't overwrite rows the fetcher already wrote
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN')
+            self._conn.executemany(
+                '''INSERT OR IGNORE INTO fetch
+                   (endpoint, game_id, season, status, bytes, content_hash, fetched_at, error)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                [(*row[:6], now, row[6]) for row in rows]
+            )
+            self._conn.execute(
+                'INSERT OR IGNORE INTO season_import (endpoint, season) VALUES (?, ?)',
+                (endpoint, season)
+            )
+            self._conn.execute('COMMIT')
+        return len(rows)
+
+
+_default_manifest = None
+_default_manifest_lock = threading.Lock()
+
+
+def get_default_manifest():
+    global _default_manifest
+    with _default_manifest_lock:
+        if _default_manifest is None:
+            _default_manifest = FetchManifest()
+    return _default_manifest
@@ -0,0 +1,263 @@
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from nba_api.stats.endpoints import leaguegamefinder, playergamelogs, \
+    boxscoreadvancedv2, boxscoretraditionalv2
+
+from api_call.rate_limit import TokenBucket
+from constant import MOCK_FIXTURE_DIR
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+    Local stand-in for stats.nba.com
+
+    Serves /stats/<endpoint>?<params> from recorded payloads:
+        <fixture_dir>/<endpoint>/<GameID | Season | PlayerID>.json
+        <fixture_dir>/<endpoint>/default.json
+    and falls back to a generated payload with the endpoint's
+    headers when nothing is recorded.
+
+    Point src/api_call at it with
+        NBA_STATS_BASE_URL=http://127.0.0.1:8765/stats
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+
+MOCK_ENDPOINTS = {
+    'leaguegamefinder': leaguegamefinder.LeagueGameFinder,
+    'playergamelogs': playergamelogs.PlayerGameLogs,
+    'boxscoreadvancedv2': boxscoreadvancedv2.BoxScoreAdvancedV2,
+    'boxscoretraditionalv2': boxscoretraditionalv2.BoxScoreTraditionalV2,
+}
+
+# Parameters a recorded payload is looked up by, in order
+FIXTURE_KEYS = ['GameID', 'Season', 'PlayerID']
+
+
+def fixture_key(parameters):
+    for name in FIXTURE_KEYS:
+        if parameters.get(name):
+            return str(parameters[name])
+    return 'default'
+
+
+def save_fixture(api_result, fixture_dir=MOCK_FIXTURE_DIR):
+    """Records the raw response of a live endpoint object so the mock server can replay it."""
+    endpoint = api_result.endpoint.lower()
+    os.makedirs(os.path.join(fixture_dir, endpoint), exist_ok=True)
+    path = os.path.join(fixture_dir, endpoint, f'{fixture_key(api_result.parameters)}.json')
+    with open(path, 'w', encoding='utf-8') as f1:
+        f1.write(api_result.nba_response.get_response())
+    return path
+
+
+def fake_value(column, row, parameters):
+    if column == 'GAME_ID':
+        return parameters.get('GameID') or f'00224{row:05d}'
+    if column in ('SEASON_ID', 'SEASON_YEAR'):
+        return parameters.get('Season') or '2024-25'
+    if column.endswith('_ID'):
+        return 1610612737 + row
+    if column.endswith('_PCT') or column in ('MIN', 'PIE', 'PACE'):
+        return round(random.random(), 3)
+    if column.endswith(('_NAME', '_ABBREVIATION', '_CITY')) or column in (
+            'MATCHUP', 'WL', 'NICKNAME', 'START_POSITION', 'COMMENT', 'GAME_DATE'):
+        return f'{column.lower()}_{row}'
+    return random.randint(0, 40)
+
+
+def generated_payload(endpoint, parameters, rows=20):
+    """Payload in the resultSets layout, built from the endpoint's expected headers."""
+    result_sets = []
+    for name, headers in MOCK_ENDPOINTS[endpoint].expected_data.items():
+        result_sets.append({
+            'name': name,
+            'headers': headers,
+            'rowSet': [[fake_value(c, r, parameters) for c in headers] for r in range(rows)],
+        })
+    return json.dumps({'resource': endpoint, 'parameters': parameters, 'resultSets': result_sets})
+
+
+class MockStatsServer():
+    """
+    Args:
+        fixture_dir (str): Folder of recorded payloads.
+        latency (float): Mean added latency per response, in seconds.
+        latency_jitter (float): Latency is uniform in latency +/- latency_jitter.
+        error_rate (float): Share of requests answered with HTTP 500.
+        rate_limit (float): Requests per second accepted before answering 429. 0 means no limit.
+        retry_after (float): Retry-After seconds sent with a 429.
+    """
+    def __init__(self, host='127.0.0.1', port=8765, fixture_dir=MOCK_FIXTURE_DIR,
+                 latency=0.0, latency_jitter=0.0, error_rate=0.0, rate_limit=0.0, retry_after=1):
+        self.fixture_dir = fixture_dir
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        # Full at start: the server takes a burst, the clients pace themselves from empty
+        self.bucket = TokenBucket(rate_limit, tokens=rate_limit) if rate_limit else None
+        self.counts = {'requests': 0, 'ok': 0, 'throttled': 0, 'errors': 0, 'not_found': 0}
+        self._lock = threading.Lock()
+        self._thread = None
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}/stats'
+
+    def _count(self, key):
+        with self._lock:
+            self.counts[key] += 1
+
+    def payload(self, endpoint, parameters):
+        for key in (fixture_key(parameters), 'default'):
+            path = os.path.join(self.fixture_dir, endpoint, f'{key}.json')
+            if os.path.isfile(path):
+                with open(path, 'r', encoding='utf-8') as f1:
+                    return f1.read()
+        if endpoint in MOCK_ENDPOINTS:
+            return generated_payload(endpoint, parameters)
+        return None
+
+    def handle(self, request):
+        self._count('requests')
+        url = urlparse(request.path)
+        endpoint = url.path.rstrip('/').split('/')[-1].lower()
+        parameters = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        if self.bucket is not None and not self.bucket.try_acquire():
+            self._count('throttled')
+            self._send(request, 429, 'Too Many Requests', {'Retry-After': str(self.retry_after)})
+            return
+
+        if self.latency or self.latency_jitter:
+            time.sleep(max(0.0, self.latency + random.uniform(-self.latency_jitter, self.latency_jitter)))
+
+        if self.error_rate and random.random() < self.error_rate:
+            self._count('errors')
+            self._send(request, 500, '{"Message":"An error has occurred."}')
+            return
+
+        contents = self.payload(endpoint, parameters)
+        if contents is None:
+            self._count('not_found')
+            self._send(request, 404, '{"Message":"Unknown endpoint."}')
+            return
+        self._count('ok')
+        self._send(request, 200, contents)
+
+    def _send(self, request, status, body, headers=None):
+        body = body.encode('utf-8')
+        request.send_response(status)
+        request.send_header('Content-Type', 'application/json; charset=utf-8')
+        request.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            request.send_header(key, value)
+        request.end_headers()
+        request.wfile.write(body)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def benchmark(call, n_calls=200, max_workers=8):
+    """
+    Runs `call(i)` n_calls times over a thread pool and reports throughput and latency percentiles.
+    Errors are counted, not raised.
+    """
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def timed(i):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            call(i)
+        except Exception:
+            with lock:
+                errors += 1
+            return
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        list(pool.map(timed, range(n_calls)))
+    total = time.perf_counter() - start
+
+    return {
+        'calls': n_calls,
+        'errors': errors,
+        'seconds': round(total, 3),
+        'calls_per_second': round(n_calls / total, 2) if total else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve recorded stats.nba.com payloads locally.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixture_dir", default=MOCK_FIXTURE_DIR, help="Folder of recorded payloads.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Mean added latency in seconds.")
+    parser.add_argument("--latency_jitter", type=float, default=0.0, help="Latency spread in seconds.")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="Share of requests answered with HTTP 500.")
+    parser.add_argument("--rate_limit", type=float, default=0.0, help="Requests per second before answering 429 (0 = no limit).")
+    parser.add_argument("--retry_after", type=float, default=1, help="Retry-After seconds sent with a 429.")
+    args = parser.parse_args()
+
+    server = MockStatsServer(
+        args.host, args.port, args.fixture_dir,
+        latency=args.latency, latency_jitter=args.latency_jitter,
+        error_rate=args.error_rate, rate_limit=args.rate_limit, retry_after=args.retry_after
+    )
+    print(f"Mock stats server on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(server.counts)
+        server.httpd.server_close()
@@ -0,0 +1,64 @@
+import threading
+import time
+
+
+class TokenBucket():
+    """
+    Thread-safe token bucket shared by every worker that talks to stats.nba.com.
+
+    Args:
+        rate (float): Tokens added per second (the allowed requests per second).
+        capacity (float): Largest burst allowed after an idle period. Defaults to one second worth of tokens.
+        tokens (float): Tokens in the bucket at start, up to capacity. Defaults to 0, so the
+            first second sends at most `rate` requests instead of a full bucket plus the refill.
+    """
+    def __init__(self, rate, capacity=None, tokens=0):
+        if rate <= 0:
+            raise ValueError("rate must be greater than 0")
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(1.0, self.rate)
+        self._tokens = min(self.capacity, float(tokens))
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def try_acquire(self, tokens=1):
+        """Takes `tokens` if they are available right now, without waiting."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1):
+        """Blocks until `tokens` are available, then takes them. Returns the time waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+def rate_limited(endpoint_cls, bucket):
+    """
+    Returns a subclass of an nba_api endpoint whose network call first takes a
+    token from `bucket`, so every instance shares the same request budget.
+    """
+    class RateLimited(endpoint_cls):
+        def get_request(self):
+            bucket.acquire()
+            return super().get_request()
+
+    RateLimited.__name__ = endpoint_cls.__name__
+    RateLimited.__qualname__ = endpoint_cls.__qualname__
+    return RateLimited
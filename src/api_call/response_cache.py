@@ -0,0 +1,264 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from nba_api.stats.library.http import NBAStatsHTTP, NBAStatsResponse
+
+from constant import RESPONSE_CACHE_DIR, RESPONSE_CACHE_MAX_BYTES, \
+    CURRENT_SEASON, CURRENT_SEASON_TTL, ENDPOINT_TTL
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+    On-disk cache of raw stats.nba.com responses.
+
+    Entries are stored as <cache_dir>/<key[:2]>/<key>.json where key is
+    the sha256 of the endpoint name and its sorted parameters, plus the
+    base URL when requests go elsewhere than stats.nba.com (the mock
+    server's payloads never answer a production request).
+    File mtime is the fetch time (used for TTL), atime is the last
+    read (used for LRU eviction).
+
+    Empty responses (a box score not published yet, a season with no
+    games so far) are not stored: a closed season would otherwise
+    serve them forever.
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+
+
+# NBAStatsHTTP.base_url of stats.nba.com, whose entries keep the keys they had before base URLs were keyed
+STATS_BASE_URL = 'https://stats.nba.com/stats/{endpoint}'
+
+
+def cache_key(endpoint, parameters, base_url=None):
+    key = {'endpoint': endpoint.lower(), 'parameters': parameters}
+    if base_url is not None and base_url != STATS_BASE_URL:
+        key['base_url'] = base_url
+    payload = json.dumps(key, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def is_empty_response(contents):
+    """
+    True when the result sets of a response have no rows: all of them, or its PlayerStats set
+    (a box score whose player lines are not published yet).
+    Payloads without resultSets (V3 endpoints) are never taken as empty.
+    """
+    try:
+        data = json.loads(contents)
+    except ValueError:
+        return False
+    if not isinstance(data, dict):
+        return False
+    result_sets = data.get('resultSets', data.get('resultSet'))
+    if isinstance(result_sets, dict):
+        result_sets = [result_sets]
+    if not isinstance(result_sets, list):
+        return False
+    rows = {i.get('name'): i['rowSet'] for i in result_sets if isinstance(i, dict) and 'rowSet' in i}
+    if not rows:
+        return False
+    if 'PlayerStats' in rows:
+        return not rows['PlayerStats']
+    return not any(rows.values())
+
+
+def season_from_parameters(parameters):
+    """Returns the start year of the season a request is about, or None when unknown."""
+    for name in ('Season', 'SeasonYear'):
+        value = parameters.get(name)
+        if value:
+            value = value[0] if isinstance(value, list) else value
+            try:
+                return int(str(value)[:4])
+            except ValueError:
+                return None
+    game_id = parameters.get('GameID')
+    if game_id and len(str(game_id)) == 10:
+        # GAME_ID: 00 + season type + 2 digit season year + game number
+        year = int(str(game_id)[3:5])
+        return 1900 + year if year >= 46 else 2000 + year
+    return None
+
+
+def default_ttl(endpoint, parameters):
+    """
+    Seconds a cached response stays valid. None means forever.
+
+    Closed seasons never change, the current season (or a request with no
+    season at all) expires after CURRENT_SEASON_TTL, and endpoints listed in
+    ENDPOINT_TTL use their own value.
+    """
+    if endpoint.lower() in ENDPOINT_TTL:
+        return ENDPOINT_TTL[endpoint.lower()]
+    season = season_from_parameters(parameters)
+    if season is None or season >= CURRENT_SEASON:
+        return CURRENT_SEASON_TTL
+    return None
+
+
+class ResponseCache():
+    """
+    Size-bounded LRU cache of raw endpoint responses.
+
+    Args:
+        cache_dir (str): Folder holding the cached responses.
+        max_bytes (int): Total size kept on disk before the least recently used entries are dropped.
+        ttl (callable): ttl(endpoint, parameters) -> seconds or None.
+    """
+    def __init__(self, cache_dir=RESPONSE_CACHE_DIR, max_bytes=RESPONSE_CACHE_MAX_BYTES, ttl=default_ttl):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._sizes = {}
+        self._total_bytes = 0
+        self._scan()
+
+    def _scan(self):
+        if not os.path.isdir(self.cache_dir):
+            return
+        for root, _, files in os.walk(self.cache_dir):
+            for filename in files:
+                if filename.endswith('.json'):
+                    size = os.path.getsize(os.path.join(root, filename))
+                    self._sizes[filename[:-5]] = size
+                    self._total_bytes += size
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f'{key}.json')
+
+    def get(self, endpoint, parameters, base_url=None):
+        """Returns the cached response text, or None on a miss or an expired entry."""
+        key = cache_key(endpoint, parameters, base_url)
+        path = self._path(key)
+        try:
+            stat = os.stat(path)
+            ttl = self.ttl(endpoint, parameters)
+            now = time.time()
+            if ttl is not None and now - stat.st_mtime > ttl:
+                contents = None
+            else:
+                with open(path, 'r', encoding='utf-8') as f1:
+                    contents = f1.read()
+                # Keep the fetch time in mtime, mark the read in atime for LRU
+                os.utime(path, (now, stat.st_mtime))
+        except FileNotFoundError:
+            # Not cached, or evicted by another thread since the stat
+            contents = None
+
+        with self._lock:
+            if contents is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return contents
+
+    def set(self, endpoint, parameters, contents, base_url=None):
+        key = cache_key(endpoint, parameters, base_url)
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f1:
+            f1.write(contents)
+        os.replace(tmp_path, path)
+
+        size = os.path.getsize(path)
+        with self._lock:
+            self._total_bytes += size - self._sizes.get(key, 0)
+            self._sizes[key] = size
+        if self._total_bytes > self.max_bytes:
+            self.evict()
+
+    def delete(self, endpoint, parameters, base_url=None):
+        key = cache_key(endpoint, parameters, base_url)
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+        self._total_bytes -= self._sizes.pop(key, 0)
+
+    def evict(self, target_ratio=0.9):
+        """Drops least recently read entries until the cache is under target_ratio * max_bytes."""
+        with self._lock:
+            if self._total_bytes <= self.max_bytes:
+                return 0
+            last_access = []
+            for key in self._sizes:
+                try:
+                    last_access.append((os.stat(self._path(key)).st_atime, key))
+                except FileNotFoundError:
+                    last_access.append((0, key))
+            last_access.sort()
+
+            removed = 0
+            for _, key in last_access:
+                if self._total_bytes <= self.max_bytes * target_ratio:
+                    break
+                self._remove(key)
+                removed += 1
+            return removed
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._sizes),
+                'bytes': self._total_bytes,
+            }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache()
+    return _default_cache
+
+
+def cached(endpoint_cls, cache=None):
+    """
+    Returns a subclass of an nba_api endpoint that serves its response from
+    the on-disk cache when a valid entry exists, and stores it otherwise
+    (unless it is empty, see is_empty_response).
+    Wrap it around rate_limited(...) so cache hits don't use request budget.
+
+    refresh=True skips the cached entry and replaces it with the new response,
+    e.g. for a game recorded as empty (an entry written before empty responses
+    were left out would otherwise answer it again).
+    """
+    class Cached(endpoint_cls):
+        def __init__(self, *args, refresh=False, **kwargs):
+            # Set before the endpoint's __init__, which sends the request
+            self.refresh = refresh
+            super().__init__(*args, **kwargs)
+
+        def get_request(self):
+            response_cache = cache or get_default_cache()
+            # Where the request goes now (api_call.set_base_url), read at call time
+            base_url = NBAStatsHTTP.base_url
+            contents = None if self.refresh else response_cache.get(self.endpoint, self.parameters, base_url)
+            if contents is not None:
+                self.nba_response = NBAStatsResponse(response=contents, status_code=200, url=None)
+                self.load_response()
+                return
+
+            super().get_request()
+            contents = self.nba_response.get_response()
+            if self.nba_response.valid_json() and not is_empty_response(contents):
+                response_cache.set(self.endpoint, self.parameters, contents, base_url)
+
+    Cached.__name__ = endpoint_cls.__name__
+    Cached.__qualname__ = endpoint_cls.__qualname__
+    return Cached
@@ -0,0 +1,239 @@
+import collections
+import email.utils
+import logging
+import threading
+import time
+
+import requests
+from nba_api.stats.library.http import NBAStatsHTTP
+
+from utils import retry
+from constant import RETRY_MAX_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY, RETRY_AFTER_MAX_DELAY, \
+    BREAKER_WINDOW, BREAKER_MIN_CALLS, BREAKER_ERROR_RATE, BREAKER_COOLDOWN
+
+logger = logging.getLogger(__name__)
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+    Retry for stats.nba.com calls
+
+    - 429 / 5xx responses are raised as ThrottledError by a session
+      hook, with Retry-After (if sent) attached
+    - retries use utils.retry: exponential backoff with full jitter,
+      or the Retry-After wait when longer (up to RETRY_AFTER_MAX_DELAY)
+    - one CircuitBreaker per endpoint pauses every worker calling it
+      while its recent error rate is too high
+    - RetryStats counts attempts, waits and failures per endpoint
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+
+
+class ThrottledError(requests.exceptions.HTTPError):
+    """429 or 5xx from stats.nba.com. `retry_after` is in seconds, None when not sent."""
+    def __init__(self, status_code, retry_after=None, url=None):
+        super().__init__(f"HTTP {status_code} from {url}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+RETRYABLE_EXCEPTIONS = (
+    requests.exceptions.RequestException,
+    ConnectionError,
+    TimeoutError,
+    # stats.nba.com answers with an HTML / error body when it throttles without a status
+    ValueError,
+)
+
+
+def parse_retry_after(value):
+    """Retry-After is either seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def raise_for_throttle(response, *args, **kwargs):
+    """requests response hook: turns 429 and 5xx into ThrottledError."""
+    if response.status_code == 429 or response.status_code >= 500:
+        raise ThrottledError(
+            response.status_code,
+            parse_retry_after(response.headers.get('Retry-After')),
+            response.url
+        )
+    return response
+
+
+def install_throttle_hook(http_cls=NBAStatsHTTP):
+    """Adds raise_for_throttle to the requests session nba_api uses. Safe to call more than once."""
+    session = http_cls.get_session()
+    if raise_for_throttle not in session.hooks['response']:
+        session.hooks['response'].append(raise_for_throttle)
+    return session
+
+
+class RetryStats():
+    """Thread-safe counters of one endpoint."""
+    def __init__(self, name):
+        self.name = name
+        self.attempts = 0
+        self.successes = 0
+        self.retries = 0
+        self.wait_seconds = 0.0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def record_attempt(self):
+        with self._lock:
+            self.attempts += 1
+
+    def record_success(self):
+        with self._lock:
+            self.successes += 1
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.retries += 1
+            self.wait_seconds += seconds
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'attempts': self.attempts,
+                'successes': self.successes,
+                'retries': self.retries,
+                'wait_seconds': round(self.wait_seconds, 2),
+                'failures': self.failures,
+            }
+
+
+class CircuitBreaker():
+    """
+    Opens when the error rate over the last `window` calls reaches `error_rate`
+    (after at least `min_calls`). While open, before_call blocks every caller
+    for `cooldown` seconds, then one trial call is let through (half open):
+    success closes the breaker, failure opens it again.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, window=BREAKER_WINDOW, min_calls=BREAKER_MIN_CALLS,
+                 error_rate=BREAKER_ERROR_RATE, cooldown=BREAKER_COOLDOWN):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.opened = 0
+        self._results = collections.deque(maxlen=window)
+        self._open_until = 0.0
+        self._trial_running = False
+        self._cond = threading.Condition()
+
+    def before_call(self):
+        with self._cond:
+            while True:
+                if self.state == self.CLOSED:
+                    return
+                now = time.monotonic()
+                if self.state == self.OPEN and now >= self._open_until:
+                    self.state = self.HALF_OPEN
+                if self.state == self.HALF_OPEN and not self._trial_running:
+                    self._trial_running = True
+                    return
+                timeout = self._open_until - now if self.state == self.OPEN else None
+                self._cond.wait(timeout)
+
+    def record_success(self):
+        with self._cond:
+            if self.state == self.HALF_OPEN:
+                logger.info("%s: circuit closed", self.name)
+                self.state = self.CLOSED
+                self._trial_running = False
+                self._results.clear()
+                self._cond.notify_all()
+            self._results.append(True)
+
+    def record_failure(self):
+        with self._cond:
+            self._results.append(False)
+            if self.state == self.HALF_OPEN:
+                self._trial_running = False
+                self._open()
+                return
+            if self.state == self.CLOSED and len(self._results) >= self.min_calls:
+                failures = self._results.count(False)
+                if failures / len(self._results) >= self.error_rate:
+                    self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self.opened += 1
+        self._open_until = time.monotonic() + self.cooldown
+        logger.warning("%s: circuit open, pausing calls for %ss", self.name, self.cooldown)
+        self._cond.notify_all()
+
+
+_breakers = {}
+_stats = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(name):
+    with _registry_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+def get_stats(name):
+    with _registry_lock:
+        if name not in _stats:
+            _stats[name] = RetryStats(name)
+        return _stats[name]
+
+
+def retry_report():
+    """Counters of every endpoint called so far, with the number of times its circuit opened."""
+    with _registry_lock:
+        names = sorted(set(_stats) | set(_breakers))
+    report = {}
+    for name in names:
+        report[name] = get_stats(name).as_dict()
+        report[name]['circuit_opened'] = get_breaker(name).opened
+    return report
+
+
+def retrying(endpoint_cls, max_retries=RETRY_MAX_ATTEMPTS, delay=RETRY_BASE_DELAY,
+             max_delay=RETRY_MAX_DELAY, name=None, max_retry_after=RETRY_AFTER_MAX_DELAY):
+    """
+    Returns a subclass of an nba_api endpoint whose network call is retried with
+    backoff and goes through the endpoint's circuit breaker. Put it outside
+    rate_limited(...) so each attempt takes a token, and inside cached(...).
+    """
+    install_throttle_hook()
+    name = name or endpoint_cls.endpoint
+    breaker = get_breaker(name)
+    stats = get_stats(name)
+
+    class Retrying(endpoint_cls):
+        @retry(max_retries=max_retries, delay=delay, max_delay=max_delay,
+               exceptions=RETRYABLE_EXCEPTIONS, stats=stats, breaker=breaker, max_retry_after=max_retry_after)
+        def get_request(self):
+            return super().get_request()
+
+    Retrying.__name__ = endpoint_cls.__name__
+    Retrying.__qualname__ = endpoint_cls.__qualname__
+    return Retrying
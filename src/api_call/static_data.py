@@ -7,11 +7,16 @@ from nba_api.stats.endpoints import leaguegamefinder, playergamelogs, \
     BoxScoreTraditionalV3, BoxScoreUsageV3,hustlestatsboxscore
 from utils import export_to_file
 from constant import JSON_OUTPUT_DIR
+from api_call.response_cache import cached
+from api_call.retry import retrying
 
 import time
 import pandas as pd
 
 
+FranchiseHistory = cached(retrying(franchisehistory.FranchiseHistory))
+PlayerGameLogs = cached(retrying(playergamelogs.PlayerGameLogs))
+LeagueGameFinder = cached(retrying(leaguegamefinder.LeagueGameFinder))
 
 
 # Get All Current Team 
@@ -33,7 +38,7 @@ def get_all_player(status=None):
 
 # Get All team History
 def get_team_history():
-    x = franchisehistory.FranchiseHistory()
+    x = FranchiseHistory()
     table_name = x.get_available_data()
 
     for i in table_name:
@@ -52,7 +57,7 @@ def get_player_log_per_game(from_season = 1983, to_season = 2024, season_Type =
     for season in range(from_season,to_season+1):
 
         for st in season_Type:
-            result = playergamelogs.PlayerGameLogs(
+            result = PlayerGameLogs(
                     season_nullable=f'{str(season)}-{str(str(season +1)[-2:])}',
                     # season_type_nullable= "Regular Season"
                     # season_type_nullable= "Playoffs"
@@ -87,7 +92,7 @@ def get_game_summary(from_season = 1983, to_season = 2024):
 def get_game_season(season=2024, league_id = "00"):
     h= str(season +1)[-2:]
     print(f"{str(season)}-{str(h)}")
-    gamefinder = leaguegamefinder.LeagueGameFinder(
+    gamefinder = LeagueGameFinder(
         league_id_nullable= league_id,
             # nba = "00"
             # aba = "01"
@@ -6,12 +6,16 @@ from data_export import get_all_player, get_game_summary,get_all_team
 import pandas as pd
 import json
 
-with open('output\\data\\json_export\\player_stats\\player_stats_2024_25_playoffs.json'
-# with open('output\\data\\json_export\\All_players.json'
-          ,'r' , encoding='utf-8') as f1:
-    output_text = json.load(f1)
+from utilities import serializer
 
-team_df = pd.DataFrame(output_text['PlayerGameLogs'])
+# The column types only need a sample, the first batch is read instead of the whole file
+output_text = next(serializer.iter_batches(
+    'output\\data\\json_export\\player_stats\\player_stats_2024_25_playoffs.json',
+    # 'output\\data\\json_export\\All_players.json',
+    key='PlayerGameLogs'
+), [])
+
+team_df = pd.DataFrame(output_text)
 # team_df = pd.DataFrame(output_text)
 export_to_file(
     'output',
@@ -6,9 +6,14 @@ from nba_api.stats.endpoints import leaguegamefinder, playergamelogs, \
     boxscoreadvancedv2, boxscoredefensivev2,boxscorehustlev2,boxscorematchupsv3,\
     BoxScoreTraditionalV3, BoxScoreUsageV3,hustlestatsboxscore
 from utils import export_to_file, retry
-from constant import JSON_OUTPUT_DIR
+from constant import JSON_OUTPUT_DIR, REQUESTS_PER_SECOND
 
-from api_call.data_per_game import get_box_score_per_game, get_traditional_box_score
+from api_call.data_per_game import get_box_score_per_game, get_traditional_box_score, \
+    get_box_score_concurrent, get_per_game_data
+from api_call.rate_limit import TokenBucket
+from api_call.response_cache import cached
+from api_call.retry import retrying
+from utilities import serializer
 
 
 import time
@@ -18,8 +23,10 @@ from api_call.static_data import get_all_team, get_all_player, \
 
 #################################################################################
 
+CommonPlayerInfo = cached(retrying(commonplayerinfo.CommonPlayerInfo))
+
 def get_player_info(i):
-    x = commonplayerinfo.CommonPlayerInfo(player_id=i).get_normalized_dict()
+    x = CommonPlayerInfo(player_id=i).get_normalized_dict()
     export_to_file(str(i),x,output_dir=f'{JSON_OUTPUT_DIR}\\player_info')
 
 
@@ -30,7 +37,7 @@ def index_game(season):
     print(season_abbr)
     game_pair = list()
     gmae_code = list()
-    with open(f"{JSON_OUTPUT_DIR}\\gameSummary\\{season_abbr}.json",'r') as f1:
+    with serializer.open_read(serializer.find_data_file(f"{JSON_OUTPUT_DIR}\\gameSummary\\{season_abbr}")) as f1:
         game_data = json.load(f1)
         for game in game_data['LeagueGameFinderResults']:
             # print(game)
@@ -66,9 +73,12 @@ if __name__ == "__main__":
 
     # data per gameboxScoreTraditional
     # for year in range(2007,2025):
+    bucket = TokenBucket(REQUESTS_PER_SECOND)
     for year in reversed(range(1983,2025)):
     #     print(f'Season{year}', end=" ")
-        get_box_score_per_game(season = year)
+        # get_box_score_per_game(season = year)
+        # get_box_score_concurrent(season = year, bucket = bucket)
+        get_per_game_data(season = year, bucket = bucket)
 
     # Continus
     # get_player_log_per_game(from_season=2024)
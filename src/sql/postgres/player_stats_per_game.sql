@@ -69,8 +69,52 @@ CREATE TABLE playerStatsPerGame (
   "available_flag" INTEGER,
   "min_sec" VARCHAR(30),
   "creation_timestamp" TIMESTAMPTZ DEFAULT NOW() NOT NULL
-);
+) PARTITION BY LIST (season_year);
 
-CREATE INDEX idx_player_id ON playerStatsPerGame(PLAYER_ID);
-CREATE INDEX idx_player_id ON playerStatsPerGame(PLAYER_ID);
-CREATE INDEX idx_player_id ON playerStatsPerGame(PLAYER_ID);
+CREATE TABLE IF NOT EXISTS playerstatspergame_1983_84 PARTITION OF playerstatspergame FOR VALUES IN ('1983-84');
+CREATE TABLE IF NOT EXISTS playerstatspergame_1984_85 PARTITION OF playerstatspergame FOR VALUES IN ('1984-85');
+CREATE TABLE IF NOT EXISTS playerstatspergame_1985_86 PARTITION OF playerstatspergame FOR VALUES IN ('1985-86');
+CREATE TABLE IF NOT EXISTS playerstatspergame_1986_87 PARTITION OF playerstatspergame FOR VALUES IN ('1986-87');
+CREATE TABLE IF NOT EXISTS playerstatspergame_1987_88 PARTITION OF playerstatspergame FOR VALUES IN ('1987-88');
+CREATE TABLE IF NOT EXISTS playerstatspergame_1988_89 PARTITION OF playerstatspergame FOR VALUES IN ('1988-89');
+CREATE TABLE IF NOT EXISTS playerstatspergame_1989_90 PARTITION OF playerstatspergame FOR VALUES IN ('1989-90');
+CREATE TABLE IF NOT EXISTS playerstatspergame_1990_91 PARTITION OF playerstatspergame FOR VALUES IN ('1990-91');
+CREATE TABLE IF NOT EXISTS playerstatspergame_1991_92 PARTITION OF playerstatspergame FOR VALUES IN ('1991-92');
+CREATE TABLE IF NOT EXISTS playerstatspergame_1992_93 PARTITION OF playerstatspergame FOR VALUES IN ('1992-93');
+CREATE TABLE IF NOT EXISTS playerstatspergame_1993_94 PARTITION OF playerstatspergame FOR VALUES IN ('1993-94');
+CREATE TABLE IF NOT EXISTS playerstatspergame_1994_95 PARTITION OF playerstatspergame FOR VALUES IN ('1994-95');
+CREATE TABLE IF NOT EXISTS playerstatspergame_1995_96 PARTITION OF playerstatspergame FOR VALUES IN ('1995-96');
+CREATE TABLE IF NOT EXISTS playerstatspergame_1996_97 PARTITION OF playerstatspergame FOR VALUES IN ('1996-97');
+CREATE TABLE IF NOT EXISTS playerstatspergame_1997_98 PARTITION OF playerstatspergame FOR VALUES IN ('1997-98');
+CREATE TABLE IF NOT EXISTS playerstatspergame_1998_99 PARTITION OF playerstatspergame FOR VALUES IN ('1998-99');
+CREATE TABLE IF NOT EXISTS playerstatspergame_1999_00 PARTITION OF playerstatspergame FOR VALUES IN ('1999-00');
+CREATE TABLE IF NOT EXISTS playerstatspergame_2000_01 PARTITION OF playerstatspergame FOR VALUES IN ('2000-01');
+CREATE TABLE IF NOT EXISTS playerstatspergame_2001_02 PARTITION OF playerstatspergame FOR VALUES IN ('2001-02');
+CREATE TABLE IF NOT EXISTS playerstatspergame_2002_03 PARTITION OF playerstatspergame FOR VALUES IN ('2002-03');
+CREATE TABLE IF NOT EXISTS playerstatspergame_2003_04 PARTITION OF playerstatspergame FOR VALUES IN ('2003-04');
+CREATE TABLE IF NOT EXISTS playerstatspergame_2004_05 PARTITION OF playerstatspergame FOR VALUES IN ('2004-05');
+CREATE TABLE IF NOT EXISTS playerstatspergame_2005_06 PARTITION OF playerstatspergame FOR VALUES IN ('2005-06');
+CREATE TABLE IF NOT EXISTS playerstatspergame_2006_07 PARTITION OF playerstatspergame FOR VALUES IN ('2006-07');
+CREATE TABLE IF NOT EXISTS playerstatspergame_2007_08 PARTITION OF playerstatspergame FOR VALUES IN ('2007-08');
+CREATE TABLE IF NOT EXISTS playerstatspergame_2008_09 PARTITION OF playerstatspergame FOR VALUES IN ('2008-09');
+CREATE TABLE IF NOT EXISTS playerstatspergame_2009_10 PARTITION OF playerstatspergame FOR VALUES IN ('2009-10');
+CREATE TABLE IF NOT EXISTS playerstatspergame_2010_11 PARTITION OF playerstatspergame FOR VALUES IN ('2010-11');
+CREATE TABLE IF NOT EXISTS playerstatspergame_2011_12 PARTITION OF playerstatspergame FOR VALUES IN ('2011-12');
+CREATE TABLE IF NOT EXISTS playerstatspergame_2012_13 PARTITION OF playerstatspergame FOR VALUES IN ('2012-13');
+CREATE TABLE IF NOT EXISTS playerstatspergame_2013_14 PARTITION OF playerstatspergame FOR VALUES IN ('2013-14');
+CREATE TABLE IF NOT EXISTS playerstatspergame_2014_15 PARTITION OF playerstatspergame FOR VALUES IN ('2014-15');
+CREATE TABLE IF NOT EXISTS playerstatspergame_2015_16 PARTITION OF playerstatspergame FOR VALUES IN ('2015-16');
+CREATE TABLE IF NOT EXISTS playerstatspergame_2016_17 PARTITION OF playerstatspergame FOR VALUES IN ('2016-17');
+CREATE TABLE IF NOT EXISTS playerstatspergame_2017_18 PARTITION OF playerstatspergame FOR VALUES IN ('2017-18');
+CREATE TABLE IF NOT EXISTS playerstatspergame_2018_19 PARTITION OF playerstatspergame FOR VALUES IN ('2018-19');
+CREATE TABLE IF NOT EXISTS playerstatspergame_2019_20 PARTITION OF playerstatspergame FOR VALUES IN ('2019-20');
+CREATE TABLE IF NOT EXISTS playerstatspergame_2020_21 PARTITION OF playerstatspergame FOR VALUES IN ('2020-21');
+CREATE TABLE IF NOT EXISTS playerstatspergame_2021_22 PARTITION OF playerstatspergame FOR VALUES IN ('2021-22');
+CREATE TABLE IF NOT EXISTS playerstatspergame_2022_23 PARTITION OF playerstatspergame FOR VALUES IN ('2022-23');
+CREATE TABLE IF NOT EXISTS playerstatspergame_2023_24 PARTITION OF playerstatspergame FOR VALUES IN ('2023-24');
+CREATE TABLE IF NOT EXISTS playerstatspergame_2024_25 PARTITION OF playerstatspergame FOR VALUES IN ('2024-25');
+CREATE TABLE IF NOT EXISTS playerstatspergame_default PARTITION OF playerstatspergame DEFAULT;
+
+CREATE INDEX IF NOT EXISTS idx_playerstatspergame_player_id_game_date ON playerstatspergame ("player_id", "game_date");
+CREATE INDEX IF NOT EXISTS idx_playerstatspergame_game_id ON playerstatspergame ("game_id");
+CREATE INDEX IF NOT EXISTS idx_playerstatspergame_team_id_season_year ON playerstatspergame ("team_id", "season_year");
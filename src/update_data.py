@@ -1,97 +1,126 @@
 import json
 import os
+import argparse
+from datetime import date, timedelta
 from api_call.static_data import get_game_summary, get_player_log_per_game
 from utils import export_to_file, get_data_sample
 from nba_api.stats.endpoints import boxscoreadvancedv2
+from api_call.response_cache import cached
+from api_call.retry import retrying
+from constant import JSON_OUTPUT_DIR, FULL_JSON_DIR, FULL_STORE_DIR, CURRENT_SEASON, SEASON_TYPE
+from utilities.result_set import raw_result, to_records
+from utilities.season_store import SeasonStore, unique_records
+from utilities import serializer
 
-def update_file():
-    read_dir = 'output\\data\\full_json'
+BoxScoreAdvancedV2 = cached(retrying(boxscoreadvancedv2.BoxScoreAdvancedV2))
 
-    current_season = 2024
-    current_season_id = []
-    for i in range(1,7):
-        current_season_id.extend([f'{i}{str(current_season)}'])
 
-    update_gameId_List, current_season_game = get_game_summary(from_season=current_season)
-    update_list = []
+def open_store(table, key='GAME_ID', read_dir=FULL_JSON_DIR, store_dir=FULL_STORE_DIR):
+    """Season store of a full_json table, migrated from the combined file the first time."""
+    store = SeasonStore(store_dir, table, key=key)
+    migrated = store.import_combined(serializer.find_data_file(f'{read_dir}//{table}'))
+    if migrated:
+        print(f'{table}: imported {sum(migrated.values())} game from {read_dir}')
+    return store
 
-    with open(f'{read_dir}//gameSummary.json','r',encoding='utf-8') as f1:
-        data = json.load(f1)
-        for i in data:
-            if i['SEASON_ID'] in current_season_id:
 
-                if i['GAME_ID'] in update_gameId_List:
-                    update_gameId_List.remove(i['GAME_ID'])
+def recheck_game_id(game_rows, recheck_days, today=None):
+    """GAME_IDs played in the last `recheck_days` days, whose box scores may still be corrected."""
+    if not recheck_days:
+        return set()
+    today = today or date.today()
+    since = (today - timedelta(days=recheck_days)).isoformat()
+    return {i['GAME_ID'] for i in game_rows if i['GAME_DATE'][:10] >= since}
 
-        for j in current_season_game:
-            for i in current_season_game[j]:
-                if i['GAME_ID'] in update_gameId_List:
-                    update_list.extend([i])
 
-        print(f'Update Game: {len(update_list)}')
-        data.extend(update_list)
-    print(update_gameId_List)
+def update_file(current_season=CURRENT_SEASON, read_dir=FULL_JSON_DIR, store_dir=FULL_STORE_DIR,
+                write_combined=False, recheck_days=0):
+    """
+    Adds the games of the current season that are not stored yet to the
+    gameSummary, full_player_stats and playerBoxscore stores. Only the new
+    games are read and written, the history is never loaded.
 
-    # export_to_file('gameSummary',data, output_dir=read_dir)
+    With recheck_days, games of the last N days are fetched again and a game
+    is rewritten only when the content hash of its records changed (stat
+    corrections published after the game).
 
-    if True:
-        result = get_player_log_per_game(from_season=current_season, to_season=current_season)
+    Args:
+        write_combined (bool): Also rewrite the combined full_json files of the tables that changed.
+        recheck_days (int): Size of the recheck window, 0 to only add new games.
 
+    Returns:
+        dict: {table: {'added': [game_id], 'changed': [game_id]}} for downstream loads.
+    """
+    season_abbr = f"{str(current_season)}_{str(current_season +1)[-2:]}"
+    update_gameId_List, current_season_game = get_game_summary(from_season=current_season, to_season=current_season)
+    game_rows = []
+    for j in current_season_game:
+        game_rows.extend(current_season_game[j])
+    recheck = recheck_game_id(game_rows, recheck_days)
+    print(f'Recheck Game: {len(recheck)}')
+    result = {}
 
+    # Game Summary
+    summary_store = open_store('gameSummary', read_dir=read_dir, store_dir=store_dir)
+    wanted = set(summary_store.missing(update_gameId_List)) | recheck
+    result['gameSummary'] = summary_store.upsert([i for i in game_rows if i['GAME_ID'] in wanted])
+    print(f"Update Game: {len(result['gameSummary']['added'])}, changed: {len(result['gameSummary']['changed'])}")
+
+    # Player stats per game
+    player_store = open_store('full_player_stats', read_dir=read_dir, store_dir=store_dir)
+    wanted = set(player_store.missing(update_gameId_List)) | recheck
+    result['full_player_stats'] = {'added': [], 'changed': []}
+    if wanted:
+        get_player_log_per_game(from_season=current_season, to_season=current_season)
         update_list = []
-        with open(f'output/data/json_export/player_stats/player_stats_2024_25_playoffs.json','r',encoding='utf-8') as f1:
-            data = json.load(f1)
-            for j in data:
-                for i in data[j]:
-                    if i['GAME_ID'] in update_gameId_List:
-                        update_list.extend([i])
-            print(len(update_list))
-
-        if len(update_list) >0:
-            with open(f'{read_dir}//full_player_stats.json','r',encoding='utf-8') as f1:
-                data_og = json.load(f1)
-                print(f'Original count: {len(data_og)}')
-                index_id = set()
-                for i in data_og:
-                    index_id.add(i['GAME_ID'])
-
-                player_stats_update = 0 
-                print(f'update_list :{len(update_list)}')
-                for j in update_list:
-                    if j['GAME_ID'] not in index_id:
-                        data_og += [j]
-                        player_stats_update += 1
-                # data_og.extend(update_list)
-                
-            print(player_stats_update)
-            print(f'Updated count: {len(data_og)}')
-        
-        export_to_file('full_player_stats',data_og, output_dir=read_dir)
-
-    if True:
-        update_list = []
-        with open(f'{read_dir}//playerBoxscore.json','r',encoding='utf-8') as f1:
-            data = json.load(f1)
-            print(f'Original count: {len(data)}')
-            index_id = set()
-            for i in data:
-                index_id.add(i['id'])
-            
-            for j in update_gameId_List:
-                if j not in index_id:
-                    api_result = boxscoreadvancedv2.BoxScoreAdvancedV2(game_id=j).get_normalized_dict()
-                    print(j)
-                    update_list.extend([{
-                        "id":j,
-                        "PlayerStats":api_result['PlayerStats'],
-                        "TeamStats":api_result['TeamStats']
-                    }])
-                
-        
-        if len(update_list) >0:
-            data.extend(update_list)
-            print(f'Update count: {len(data)}')
-            # export_to_file('playerBoxscore',data,output_dir=read_dir)
-
-if __name__ == "main":
-    update_file()
\ No newline at end of file
+        for st in SEASON_TYPE:
+            st_name = st.replace(' ','').lower()
+            file_path = serializer.find_data_file(f"{JSON_OUTPUT_DIR}\\player_stats\\player_stats_{season_abbr}_{st_name}")
+            if file_path is None:
+                continue
+            # Streamed, only the rows of the wanted games are kept
+            for i in serializer.iter_json(file_path, key='PlayerGameLogs'):
+                if i['GAME_ID'] in wanted:
+                    update_list.extend([i])
+        # In-Season Tournament games are Regular Season games too, their rows come twice
+        update_list = list(unique_records(update_list, ('GAME_ID', 'PLAYER_ID')))
+        result['full_player_stats'] = player_store.upsert(update_list)
+    print(f"Player stats update: {len(result['full_player_stats']['added'])}, "
+          f"changed: {len(result['full_player_stats']['changed'])}")
+
+    # Box score
+    box_store = open_store('playerBoxscore', key='id', read_dir=read_dir, store_dir=store_dir)
+    update_list = []
+    for j in dict.fromkeys(box_store.missing(update_gameId_List) + sorted(recheck)):
+        api_result = raw_result(BoxScoreAdvancedV2(game_id=j))
+        print(j)
+        if not api_result['PlayerStats']['rowSet']:
+            # Not available yet, picked up by the next update
+            continue
+        update_list.extend([{
+            "id":j,
+            "PlayerStats":to_records(api_result['PlayerStats']),
+            "TeamStats":to_records(api_result['TeamStats'])
+        }])
+    result['playerBoxscore'] = box_store.upsert(update_list)
+    print(f"Box score update: {len(result['playerBoxscore']['added'])}, "
+          f"changed: {len(result['playerBoxscore']['changed'])}")
+
+    if write_combined:
+        for store in (summary_store, player_store, box_store):
+            if result[store.table]['added'] or result[store.table]['changed']:
+                # Same file, format and compression as the one the store was migrated from
+                combined = serializer.find_data_file(f'{read_dir}//{store.table}')
+                store.write_combined(combined or f'{read_dir}//{store.table}.json')
+
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add new games of the current season to the full_json stores.")
+    parser.add_argument("--recheck_days", type=int, default=0,
+                        help="Fetch games of the last N days again and rewrite the ones that changed.")
+    parser.add_argument("--write_combined", action="store_true",
+                        help="Rewrite the combined full_json files of the tables that changed.")
+    args = parser.parse_args()
+
+    update_file(recheck_days=args.recheck_days, write_combined=args.write_combined)
@@ -0,0 +1,302 @@
+import argparse
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from constant import JSON_OUTPUT_DIR, COLUMN_STORE_DIR, SEASON_TYPE
+from utilities import serializer
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+    Memory-mapped columnar store
+
+    <root>/<season>/<season_type>/_meta.json       rows, column kinds
+    <root>/<season>/<season_type>/<COLUMN>.npy     numeric column
+    <root>/<season>/<season_type>/<COLUMN>.codes.npy + <COLUMN>.dict.json
+                                                   dictionary encoded column
+
+    e.g. 2024_25/regularseason/PTS.npy
+
+    Numeric columns get the smallest fixed-width dtype that holds them
+    (int columns with nulls become float64 with NaN). Strings are stored
+    as int codes into a per-partition dictionary, -1 is null.
+
+    Columns are opened with numpy memmap (np.load(mmap_mode='r')), so
+    opening a partition only reads _meta.json and a query reads just
+    the columns it asks for.
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+
+NUMERIC = 'numeric'
+DICTIONARY = 'dictionary'
+NULL_CODE = -1
+
+
+def season_type_dir(season_type):
+    """'Regular Season' -> 'regularseason', the suffix of the player_stats files."""
+    return season_type.replace(' ', '').lower()
+
+
+def _int_dtype(values):
+    low, high = min(values), max(values)
+    for dtype in (np.int8, np.int16, np.int32, np.int64):
+        if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+            return dtype
+    return None
+
+
+def encode_column(values):
+    """
+    Returns (kind, arrays, meta) for one column.
+    arrays: {'': data} for numeric columns, {'codes': codes, 'dict': [values]} for dictionary ones.
+    """
+    kinds = {type(v) for v in values if v is not None}
+    has_null = any(v is None for v in values)
+
+    if kinds == {bool} and not has_null:
+        return NUMERIC, {'': np.array(values, dtype=np.bool_)}, {'dtype': 'bool'}
+    if kinds and kinds <= {int}:
+        dtype = None if has_null else _int_dtype(values)
+        if dtype is not None:
+            return NUMERIC, {'': np.array(values, dtype=dtype)}, {'dtype': np.dtype(dtype).name}
+        # Nulls or out of int64 range
+        data = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+        return NUMERIC, {'': data}, {'dtype': 'float64', 'int_values': True}
+    if kinds and kinds <= {int, float}:
+        data = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+        return NUMERIC, {'': data}, {'dtype': 'float64'}
+
+    # Strings (anything else is stored as its JSON text)
+    dictionary = {}
+    codes = np.empty(len(values), dtype=np.int32)
+    for n, v in enumerate(values):
+        if v is None:
+            codes[n] = NULL_CODE
+            continue
+        if not isinstance(v, str):
+            v = json.dumps(v, ensure_ascii=False)
+        codes[n] = dictionary.setdefault(v, len(dictionary))
+    code_dtype = np.int16 if len(dictionary) < np.iinfo(np.int16).max else np.int32
+    return DICTIONARY, {'codes': codes.astype(code_dtype), 'dict': list(dictionary)}, {'dtype': np.dtype(code_dtype).name}
+
+
+def write_partition(partition_dir, records, source=None):
+    """
+    Writes `records` (row dicts) as one partition, replacing it if it exists.
+    The partition is built next to the old one and swapped in when complete.
+
+    Returns:
+        int: Number of rows.
+    """
+    columns = list(dict.fromkeys(column for record in records for column in record))
+    tmp_dir = f'{partition_dir}.tmp'
+    if os.path.isdir(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+
+    meta = {'rows': len(records), 'source': source, 'columns': {}}
+    for column in columns:
+        kind, arrays, column_meta = encode_column([record.get(column) for record in records])
+        if kind == NUMERIC:
+            np.save(os.path.join(tmp_dir, f'{column}.npy'), arrays[''])
+        else:
+            np.save(os.path.join(tmp_dir, f'{column}.codes.npy'), arrays['codes'])
+            with open(os.path.join(tmp_dir, f'{column}.dict.json'), 'w', encoding='utf-8') as f1:
+                json.dump(arrays['dict'], f1, ensure_ascii=False)
+        meta['columns'][column] = {'kind': kind, **column_meta}
+    with open(os.path.join(tmp_dir, '_meta.json'), 'w', encoding='utf-8') as f1:
+        json.dump(meta, f1, indent=4)
+
+    if os.path.isdir(partition_dir):
+        shutil.rmtree(partition_dir)
+    os.replace(tmp_dir, partition_dir)
+    return len(records)
+
+
+class DictionaryColumn():
+    """Codes (memmap) and dictionary of one string column."""
+    def __init__(self, codes, values):
+        self.codes = codes
+        self.values = values
+
+    def __len__(self):
+        return len(self.codes)
+
+    def decode(self):
+        """Object array of the strings, None for nulls."""
+        lookup = np.array(self.values + [None], dtype=object)
+        # NULL_CODE (-1) picks the trailing None
+        return lookup[self.codes]
+
+    def to_categorical(self):
+        return pd.Categorical.from_codes(np.asarray(self.codes, dtype=np.int32), categories=self.values)
+
+
+class Partition():
+    """One season / season type. Columns are memory-mapped on first access."""
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, '_meta.json'), 'r', encoding='utf-8') as f1:
+            self.meta = json.load(f1)
+        self.rows = self.meta['rows']
+        self.columns = list(self.meta['columns'])
+        self._cache = {}
+
+    def column(self, name):
+        if name not in self._cache:
+            info = self.meta['columns'][name]
+            if info['kind'] == NUMERIC:
+                self._cache[name] = np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode='r')
+            else:
+                codes = np.load(os.path.join(self.path, f'{name}.codes.npy'), mmap_mode='r')
+                with open(os.path.join(self.path, f'{name}.dict.json'), 'r', encoding='utf-8') as f1:
+                    self._cache[name] = DictionaryColumn(codes, json.load(f1))
+        return self._cache[name]
+
+    def nbytes(self, columns=None):
+        """Bytes on disk of `columns` (all by default)."""
+        total = 0
+        for name in columns or self.columns:
+            for suffix in ('.npy', '.codes.npy', '.dict.json'):
+                path = os.path.join(self.path, f'{name}{suffix}')
+                if os.path.isfile(path):
+                    total += os.path.getsize(path)
+        return total
+
+
+def _fill_missing(chunks):
+    """
+    Replaces the row counts standing for partitions without the column by all null chunks:
+    NaN when the other partitions hold numbers (int columns become float64, as with nulls
+    within a partition), None otherwise.
+    """
+    present = [i for i in chunks if not isinstance(i, int)]
+    numeric = bool(present) and all(i.dtype.kind in 'iuf' for i in present)
+    return [
+        (np.full(i, np.nan) if numeric else np.full(i, None, dtype=object)) if isinstance(i, int) else i
+        for i in chunks
+    ]
+
+
+class ColumnStore():
+    """
+    Args:
+        root (str): Store folder, holding <season>/<season_type> partitions.
+    """
+    def __init__(self, root=COLUMN_STORE_DIR):
+        self.root = root
+
+    def partition_dir(self, season, season_type):
+        return os.path.join(self.root, season, season_type_dir(season_type))
+
+    def partitions(self, seasons=None, season_types=None):
+        """Partitions matching the filters, in season order. seasons: ['2024_25'], season_types: ['Playoffs']."""
+        if not os.path.isdir(self.root):
+            return []
+        wanted_types = None if season_types is None else {season_type_dir(i) for i in season_types}
+        result = []
+        for season in sorted(os.listdir(self.root)):
+            if seasons is not None and season not in seasons:
+                continue
+            season_dir = os.path.join(self.root, season)
+            if not os.path.isdir(season_dir):
+                continue
+            for st in sorted(os.listdir(season_dir)):
+                path = os.path.join(season_dir, st)
+                if st.endswith('.tmp') or not os.path.isfile(os.path.join(path, '_meta.json')):
+                    continue
+                if wanted_types is None or st in wanted_types:
+                    result.append(Partition(path))
+        return result
+
+    def write(self, season, season_type, records, source=None):
+        return write_partition(self.partition_dir(season, season_type), records, source)
+
+    def read(self, columns, seasons=None, season_types=None):
+        """
+        {column: array} over the matching partitions. Numeric columns are memmaps when a single
+        partition matches; string columns are decoded to object arrays. A partition without the
+        column contributes NaN for a numeric column, None otherwise.
+        """
+        parts = self.partitions(seasons, season_types)
+        result = {}
+        for name in columns:
+            chunks = []
+            for part in parts:
+                if name not in part.meta['columns']:
+                    chunks.append(part.rows)
+                    continue
+                col = part.column(name)
+                chunks.append(col.decode() if isinstance(col, DictionaryColumn) else col)
+            chunks = _fill_missing(chunks)
+            if len(chunks) == 1:
+                result[name] = chunks[0]
+            else:
+                result[name] = np.concatenate(chunks) if chunks else np.empty(0)
+        return result
+
+    def to_frame(self, columns=None, seasons=None, season_types=None):
+        """DataFrame of `columns` (all by default), string columns as categoricals."""
+        parts = self.partitions(seasons, season_types)
+        if not parts:
+            return pd.DataFrame(columns=columns)
+        if columns is None:
+            columns = list(dict.fromkeys(name for part in parts for name in part.columns))
+        data = {}
+        for name in columns:
+            chunks = []
+            for part in parts:
+                col = part.column(name) if name in part.meta['columns'] else None
+                if isinstance(col, DictionaryColumn):
+                    chunks.append(col.to_categorical())
+                elif col is None:
+                    chunks.append(part.rows)
+                else:
+                    chunks.append(np.asarray(col))
+            # Partitions without the column: all null, with the categories dtype of the others
+            categories = next((i.categories[:0] for i in chunks if isinstance(i, pd.Categorical)), None)
+            if categories is not None:
+                chunks = [pd.Categorical([None] * i, categories=categories) if isinstance(i, int) else i for i in chunks]
+            else:
+                chunks = _fill_missing(chunks)
+            if all(isinstance(i, pd.Categorical) for i in chunks):
+                # Each partition has its own dictionary
+                data[name] = pd.api.types.union_categoricals(chunks)
+            else:
+                data[name] = pd.concat([pd.Series(i) for i in chunks], ignore_index=True)
+        return pd.DataFrame(data)
+
+
+def build_column_store(from_season=1983, to_season=2024, season_types=SEASON_TYPE,
+                       source_dir=f'{JSON_OUTPUT_DIR}\\player_stats', root=COLUMN_STORE_DIR):
+    """
+    Converts the player_stats_<season>_<season type> files to the column store, one partition each.
+
+    Returns:
+        dict: Rows written per (season, season type).
+    """
+    store = ColumnStore(root)
+    written = {}
+    for i in range(from_season, to_season + 1):
+        season = f"{str(i)}_{str(i +1)[-2:]}"
+        for st in season_types:
+            file_path = serializer.find_data_file(os.path.join(source_dir, f'player_stats_{season}_{season_type_dir(st)}'))
+            if file_path is None:
+                continue
+            records = list(serializer.iter_json(file_path, key='PlayerGameLogs'))
+            written[(season, st)] = store.write(season, st, records, source=os.path.basename(file_path))
+            print(f'{season} {st}: {written[(season, st)]} rows')
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert player_stats JSON files to the memory-mapped column store.")
+    parser.add_argument("--input_folder", type=str, default=f'{JSON_OUTPUT_DIR}\\player_stats')
+    parser.add_argument("--output_folder", type=str, default=COLUMN_STORE_DIR)
+    parser.add_argument("--from_season", type=int, default=1983)
+    parser.add_argument("--to_season", type=int, default=2024)
+    args = parser.parse_args()
+
+    build_column_store(args.from_season, args.to_season, source_dir=args.input_folder, root=args.output_folder)
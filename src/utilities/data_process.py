@@ -2,101 +2,159 @@ import json
 import os
 import argparse
 import sys
+from concurrent.futures import ProcessPoolExecutor
 
+from utilities.result_set import normalize_result
+from utilities.serializer import RecordWriter, split_extension, is_data_file
+from utilities import serializer
 
-def combine_json_files(input_folder, output_file, json_structure = 1):
+
+# combine output format -> serializer format
+OUTPUT_FORMATS = {'json': 'pretty', 'compact': 'compact', 'ndjson': 'ndjson'}
+
+
+def combine_json_files(input_folder, output_file, json_structure = 1, output_format='json', exit_on_error=True,
+                       compression=None):
     """
     Combines multiple JSON files from a specified folder into a single JSON file.
 
+    Records are written as each file is read, so memory stays at about one
+    input file whatever the size of the folder.
+
     Args:
         input_folder (str): The path to the folder containing the input JSON files.
         output_file (str): The path where the combined JSON file will be saved.
+        output_format (str): 'json' for one JSON array, 'compact' for one array without whitespace,
+            'ndjson' for one record per line.
+        compression (str): None, 'gzip' or 'zstd'.
+        exit_on_error (bool): Exit the script on a missing folder or write error (command line use),
+            otherwise return None.
+
+    Returns:
+        dict: Number of files, records and files with errors, or None when nothing was written.
     """
-    combined_data = []
     file_count = 0
     error_files = []
 
     # Check if the input folder exists
     if not os.path.isdir(input_folder):
         print(f"Error: Input folder '{input_folder}' not found or is not a directory.")
-        sys.exit(1) # Exit script with an error code
+        if exit_on_error:
+            sys.exit(1) # Exit script with an error code
+        return None
 
     print(f"Searching for JSON files in: {input_folder}")
+    writer = RecordWriter(output_file, OUTPUT_FORMATS[output_format], compression)
 
-    # Iterate through all files in the input folder
-    for filename in os.listdir(input_folder):
-        # Construct the full file path
-        file_path = os.path.join(input_folder, filename)
-
-        # Process only files with the .json extension
-        if filename.lower().endswith(".json") and os.path.isfile(file_path):
-            file_count += 1
-            print(f"  Processing file: {filename}...")
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    # Load JSON data from the file
-                    data_load = json.load(f)
+    try:
+        # Iterate through all files in the input folder, by name so the output order is stable
+        for filename in sorted(os.listdir(input_folder)):
+            # Construct the full file path
+            file_path = os.path.join(input_folder, filename)
+
+            # Process only data files (.json / .ndjson, optionally .gz / .zst)
+            if is_data_file(filename) and os.path.isfile(file_path):
+                file_count += 1
+                print(f"  Processing file: {filename}...")
+                try:
+                    # Load JSON data from the file, whatever format it was written in
+                    data_load = serializer.load(file_path)
                     data = single_layer(data_load,filename)
                     # data = record_only(data_load,filename)
                     # data = data_load
 
                     # Check if the loaded data is a list or a single object
                     if isinstance(data, list):
-                        # If it's a list, extend the main list
-                        combined_data.extend(data)
+                        # If it's a list, write every item
+                        for item in data:
+                            writer.write(item)
                         print(f"    -> Added {len(data)} items (list).")
                     elif isinstance(data, dict):
-                        # If it's a dictionary (object), append it to the main list
-                        combined_data.append(data)
+                        # If it's a dictionary (object), write it as one record
+                        writer.write(data)
                         print("    -> Added 1 item (object).")
                     else:
                         print(f"    -> Warning: Content of {filename} is neither a JSON list nor object. Skipping content.")
                         error_files.append(filename + " (invalid root type)")
 
-
-            except json.JSONDecodeError as e:
-                print(f"    -> Error: Could not decode JSON from {filename}. Skipping file. Error: {e}")
-                error_files.append(filename + " (JSON decode error)")
-            except IOError as e:
-                print(f"    -> Error: Could not read file {filename}. Skipping file. Error: {e}")
-                error_files.append(filename + " (read error)")
-            except Exception as e:
-                print(f"    -> Error: An unexpected error occurred processing {filename}. Skipping file. Error: {e}")
-                error_files.append(filename + " (unexpected error)")
+                except json.JSONDecodeError as e:
+                    print(f"    -> Error: Could not decode JSON from {filename}. Skipping file. Error: {e}")
+                    error_files.append(filename + " (JSON decode error)")
+                except IOError as e:
+                    print(f"    -> Error: Could not read file {filename}. Skipping file. Error: {e}")
+                    error_files.append(filename + " (read error)")
+                except Exception as e:
+                    print(f"    -> Error: An unexpected error occurred processing {filename}. Skipping file. Error: {e}")
+                    error_files.append(filename + " (unexpected error)")
+    except Exception as e:
+        writer.discard()
+        print(f"Error: An unexpected error occurred while writing the output file. Error: {e}")
+        if exit_on_error:
+            sys.exit(1) # Exit script with an error code
+        return None
 
     if file_count == 0:
+        writer.discard()
         print("No JSON files found in the specified folder.")
-        return # Exit the function gracefully
+        return None # Exit the function gracefully
 
     print(f"\nProcessed {file_count} JSON files.")
 
-    if not combined_data:
+    if writer.count == 0:
+        writer.discard()
         print("Warning: No valid JSON data was successfully combined.")
         if error_files:
              print(f"Files with errors: {', '.join(error_files)}")
-        return
+        return None
 
-    # Write the combined data to the output file
     try:
-        print(f"\nWriting combined data to: {output_file}")
-        with open(output_file, 'w', encoding='utf-8') as f:
-            # Use indent for pretty printing, ensure_ascii=False for non-ASCII chars
-            json.dump(combined_data, f, indent=4, ensure_ascii=False)
-        print("Successfully combined JSON files!")
-        if error_files:
-            print(f"\nNote: Some files encountered errors during processing: {', '.join(error_files)}")
-
+        writer.close()
     except IOError as e:
         print(f"Error: Could not write to output file {output_file}. Error: {e}")
-        sys.exit(1) # Exit script with an error code
-    except Exception as e:
-        print(f"Error: An unexpected error occurred while writing the output file. Error: {e}")
-        sys.exit(1) # Exit script with an error code
+        if exit_on_error:
+            sys.exit(1) # Exit script with an error code
+        return None
+    print(f"Successfully combined {writer.count} records to: {output_file}")
+    if error_files:
+        print(f"\nNote: Some files encountered errors during processing: {', '.join(error_files)}")
+
+    return {'files': file_count, 'records': writer.count, 'errors': len(error_files)}
+
+
+def combine_season(args):
+    """Process pool entry point: combines one season folder."""
+    input_folder, output_file, output_format, compression = args
+    return input_folder, combine_json_files(input_folder, output_file, output_format=output_format,
+                                            exit_on_error=False, compression=compression)
+
+
+def combine_seasons(input_path, output_path, from_season=1983, to_season=2024, output_format='json', max_workers=None,
+                    compression=None):
+    """
+    Combines <input_path>/<season> into <output_path>/<season>.json (or .ndjson, .json.gz, ...)
+    for every season, one season per worker process.
+
+    Returns:
+        dict: combine_json_files result per season folder.
+    """
+    ext = serializer.file_extension(OUTPUT_FORMATS[output_format], compression)
+    tasks = []
+    for i in range(from_season, to_season + 1):
+        season = f"{str(i)}_{str(i +1)[-2:]}"
+        tasks.append((os.path.join(input_path, season), os.path.join(output_path, f'{season}.{ext}'), output_format, compression))
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        for input_folder, result in pool.map(combine_season, tasks):
+            results[input_folder] = result
+    return results
 
 def single_layer(data_load,filename):
     record = {}
-    _id = filename.replace('.json','')
+    _id = split_extension(filename)[0]
     record['id']= _id
+    # Raw {"headers", "rowSet"} files are expanded to the usual row dicts
+    data_load = normalize_result(data_load)
     for i in data_load:
         record[i] = data_load[i]
     
@@ -104,7 +162,7 @@ def single_layer(data_load,filename):
 
 def record_only(data_load,filename):
     # record = {}
-    _id = filename.replace('.json','')
+    _id = split_extension(filename)[0]
     record = {
         'season': _id,
         'data': data_load
@@ -135,19 +193,37 @@ if __name__ == "__main__":
 
     )
 
+    parser.add_argument(
+        "--format",
+        choices=["json", "compact", "ndjson"],
+        default="json",
+        help="Combined output as one JSON array (indented or compact) or one record per line.",
+    )
+    parser.add_argument(
+        "--compression",
+        choices=["gzip", "zstd"],
+        default=None,
+        help="Compress the combined output (zstd needs the zstandard package).",
+    )
+    parser.add_argument(
+        "--season_loop",
+        action="store_true",
+        help="Combine every season folder of --input_folder into --output_file (a folder), in parallel.",
+    )
+    parser.add_argument("--from_season", type=int, default=1983)
+    parser.add_argument("--to_season", type=int, default=2024)
+    parser.add_argument("--workers", type=int, default=None, help="Processes used with --season_loop.")
+
     # Parse arguments from the command line
     args = parser.parse_args(
         
     )
 
-    season_loop = False
-
     # Call the main function with the provided arguments
-    if season_loop == False:
-        combine_json_files(args.input_folder, args.output_file)
+    if args.season_loop == False:
+        combine_json_files(args.input_folder, args.output_file, output_format=args.format,
+                           compression=args.compression)
     else:
-        for i in range(1983,2025):
-            season = f"{str(i)}_{str(i +1)[-2:]}"
-            input_path = "output\\data\\json_export\\boxScoreAdvance"
-            output_path = "output\\data\\json_export\\boxScore"
-            combine_json_files(f'{input_path}\\{season}', f'{output_path}\\{season}.json')
+        # e.g. --input_folder output\\data\\json_export\\boxScoreAdvance --output_file output\\data\\json_export\\boxScore
+        combine_seasons(args.input_folder, args.output_file, args.from_season, args.to_season,
+                        output_format=args.format, max_workers=args.workers, compression=args.compression)
@@ -5,6 +5,14 @@ import statistics
 import math
 import sys
 import os # For seeding hash functions
+import functools
+import struct
+
+import numpy as np
+
+from utilities import serializer, profile_state, profile_sampling
+from utilities.profile_accumulators import LengthStats, TopValues, HyperLogLog, KLLSketch, collect_events, welford_combine, \
+    merge_collected, map_shards, fnv1a_64, BUFFER_SIZE, MAX_TRACKED_VALUES
 
 # --- Dependency Check and Import for Count-Min Sketch ---
 try:
@@ -14,17 +22,28 @@ except ImportError:
     sys.exit(1)
 
 # --- Configuration ---
-MAX_UNIQUE_STRINGS_TO_STORE = 1000 # Limit memory usage for unique string tracking
+# Fixed size per path: HyperLogLog registers (2**p bytes) and KLL items (~3k)
+HLL_PRECISION = 14
+KLL_K = 200
+QUANTILES = {'median': 0.5, 'p95': 0.95, 'p99': 0.99}
+# CountMinSketch bins are C ints, saturated at the max
+CMS_BIN_MAX = 2 ** 31 - 1
+CMS_FOOTER = struct.Struct("IIq")
 
 # --- Helper Function to Safely Calculate Welford-based Stats ---
-def calculate_welford_stats(n, mean, s, min_val, max_val, numeric_counter): # Added numeric_counter
-    """Calculates final stats from Welford accumulators and finds mode from counter."""
+def calculate_welford_stats(n, mean, s, min_val, max_val, numeric_values, quantiles, distinct):
+    """
+    Calculates final stats from Welford accumulators, the mode from the bounded value counts
+    (TopValues), quantiles from the KLL sketch and the distinct count from HyperLogLog.
+    """
     stats = {
         'min': min_val,
         'max': max_val,
         'mean': None,
         'mode': None, # <-- ADDED
         'mode_count': 0, # <-- ADDED
+        'unique_count': distinct.count(),
+        **{name: None for name in QUANTILES},
         'stdev': None,
         'variance_sample': None,
         'variance_population': None
@@ -46,28 +65,33 @@ def calculate_welford_stats(n, mean, s, min_val, max_val, numeric_counter): # Ad
              stats['variance_population'] = 0.0
 
 
-        # Calculate Mode from counter
-        if numeric_counter:
+        stats.update({name: value for name, value in
+                      zip(QUANTILES, quantiles.quantiles(list(QUANTILES.values())).values())})
+
+        # Calculate Mode from the value counts
+        if numeric_values:
             # Find the highest frequency
-            most_common_items = numeric_counter.most_common() # Returns list of (value, count) sorted by count desc
+            most_common_items = numeric_values.most_common(1) # [(value, count)] of the highest count
             if most_common_items:
                 max_freq = most_common_items[0][1]
                 # Get all items with the max frequency (handles ties)
-                modes = [item[0] for item in most_common_items if item[1] == max_freq]
+                modes = [value for value, count in numeric_values.counts.items() if count == max_freq]
                 stats['mode'] = modes[0] if len(modes) == 1 else modes # Store single mode or list of modes
                 stats['mode_count'] = max_freq
+                if not numeric_values.exact:
+                    # Counts of values seen before the rare ones were dropped may be short
+                    stats['mode_count_error'] = numeric_values.dropped_max
 
 
     return stats
 
 # --- Modified Helper for String Stats ---
-def calculate_string_stats_cms(cms, string_lengths, empty_count, examples, unique_strings, unique_strings_limited): # Added unique tracking params
-    """Calculates stats for strings using CMS, length info, examples, and unique count."""
+def calculate_string_stats_cms(cms, string_lengths, empty_count, examples, distinct):
+    """Calculates stats for strings using CMS, length info (LengthStats), examples, and HyperLogLog unique count."""
     stats = {
         'min_length': None, 'max_length': None, 'avg_length': None,
         'empty_count': empty_count,
-        'unique_count': len(unique_strings), # <-- ADDED
-        'unique_count_limited': unique_strings_limited, # <-- ADDED flag
+        'unique_count': distinct.count(),
         'estimated_total_items': cms.elements_added,
         'cms_width': cms.width,
         'cms_depth': cms.depth,
@@ -78,140 +102,377 @@ def calculate_string_stats_cms(cms, string_lengths, empty_count, examples, uniqu
     if not string_lengths:
         return stats
 
-    try:
-        stats['min_length'] = min(string_lengths)
-        stats['max_length'] = max(string_lengths)
-        stats['avg_length'] = statistics.mean(string_lengths)
-    except ValueError: # Handle empty list edge case if necessary
-        pass
-
+    stats.update(string_lengths.to_dict())
     return stats
 
 
 def calculate_list_stats(lengths):
-    """Calculates stats for list lengths."""
-    stats = {'min_length': None, 'max_length': None, 'avg_length': None}
-    if not lengths:
-        return stats
-    try:
-        stats['min_length'] = min(lengths)
-        stats['max_length'] = max(lengths)
-        stats['avg_length'] = statistics.mean(lengths)
-    except ValueError: # Handle empty list edge case
-        pass
-    return stats
+    """Calculates stats for list lengths (LengthStats)."""
+    return lengths.to_dict()
+
+# --- Core Collection Logic: parse events, explicit stack (utilities/profile_accumulators.py) ---
+def new_node_info(cms_width, cms_depth, cms_error_rate, cms_confidence):
+    """Empty accumulators of one path, all of bounded size."""
+    seeds = [int.from_bytes(os.urandom(8), byteorder='big') for _ in range(cms_depth)]
+    return {
+        'count': 0,
+        'types': Counter(),
+        'null_count': 0,
+        'empty_count': 0,
+        'list_lengths': LengthStats(),
+        'string_lengths': LengthStats(),
+        'string_examples': [],
+        'pending': [],
+        # Count-Min Sketch counters of the flushed batches (numpy), folded into 'cms' by fold_cms
+        'cms_counts': None,
+        'cms_added': 0,
+        # Distinct numbers and distinct strings, apart so a mixed path counts each kind on its own
+        'numeric_distinct': HyperLogLog(HLL_PRECISION),
+        'string_distinct': HyperLogLog(HLL_PRECISION),
+        # Welford accumulators
+        'welford_n': 0,
+        'welford_mean': 0.0,
+        'welford_s': 0.0,
+        'numeric_min': float('inf'),
+        'numeric_max': float('-inf'),
+        'numeric_values': TopValues(MAX_TRACKED_VALUES), # Bounded counts for the mode
+        'quantiles': KLLSketch(KLL_K, seed=0),
+        # Count-Min Sketch
+        'cms': CountMinSketch(width=cms_width,
+                              depth=cms_depth,
+                              error_rate=cms_error_rate,
+                              confidence=cms_confidence,
+                            #   seeds=seeds
+                              )
+    }
 
-# --- Core Traversal and Collection Logic (Modified) ---
-def traverse_and_collect(data, path, collected_data, cms_width, cms_depth, cms_error_rate, cms_confidence):
+def add_value(current_node_info, data):
+    """Buffers one scalar of the path, the accumulators are updated BUFFER_SIZE values at a time."""
+    pending = current_node_info['pending']
+    pending.append(data)
+    if len(pending) >= BUFFER_SIZE:
+        flush_values(current_node_info)
+
+
+def add_values(current_node_info, values):
+    """Buffers a column of scalars of the path (table fast path), flushed as one batch."""
+    pending = current_node_info['pending']
+    pending.extend(values)
+    if len(pending) >= BUFFER_SIZE:
+        flush_values(current_node_info)
+
+
+def number_arrays(values, type_counts):
+    """The ints and the floats (NaN left out) of a batch as numpy arrays, bool is not a number here."""
+    arrays = []
+    for number_type, dtype in ((int, np.int64), (float, np.float64)):
+        if number_type not in type_counts:
+            continue
+        numbers = values if type_counts[number_type] == len(values) else [v for v in values if type(v) is number_type]
+        try:
+            array = np.array(numbers, dtype=dtype)
+        except OverflowError:
+            # Beyond int64, profiled as floats
+            array = np.array(numbers, dtype=np.float64)
+        if dtype is np.float64:
+            array = array[~np.isnan(array)]
+        if len(array):
+            arrays.append(array)
+    return arrays
+
+
+def add_numbers(current_node_info, array):
+    """Welford / min / max / value counts / quantiles of a numeric batch, vectorized."""
+    current_node_info['numeric_min'] = min(current_node_info['numeric_min'], array.min().item())
+    current_node_info['numeric_max'] = max(current_node_info['numeric_max'], array.max().item())
+    values, counts = np.unique(array, return_counts=True)
+    number_counts = dict(zip(values.tolist(), counts.tolist()))
+    current_node_info['numeric_values'].update(number_counts)
+    current_node_info['numeric_distinct'].update(number_counts)
+    current_node_info['quantiles'].add_many(array.tolist())
+    # --- Welford's Algorithm, one batch at a time ---
+    mean = float(array.mean())
+    n, mean, s = welford_combine(current_node_info['welford_n'], current_node_info['welford_mean'],
+                                 current_node_info['welford_s'],
+                                 len(array), mean, float(np.square(array - mean).sum()))
+    current_node_info['welford_n'] = n
+    current_node_info['welford_mean'] = mean
+    current_node_info['welford_s'] = s
+
+
+def add_cms_counts(current_node_info, string_counts):
     """
-    Recursively traverses the data structure and collects information using
-    Welford+Counter for numbers and Count-Min Sketch+LimitedSet for strings.
+    Count-Min Sketch update of a batch of {string: count}: the sketch's own FNV-1a hashes,
+    computed for the whole batch (fnv1a_64) and added to numpy counters, see fold_cms.
     """
-    # Initialize node info if path is new
-    if path not in collected_data:
-         seeds = [int.from_bytes(os.urandom(8), byteorder='big') for _ in range(cms_depth)]
-         collected_data[path] = {
-            'count': 0,
-            'types': Counter(),
-            'null_count': 0,
-            'empty_count': 0,
-            'list_lengths': [],
-            'string_lengths': [],
-            'string_examples': [],
-            'unique_strings': set(), # <-- ADDED: Set for unique strings
-            'unique_strings_limited': False, # <-- ADDED: Flag if set limit reached
-            # Welford accumulators
-            'welford_n': 0,
-            'welford_mean': 0.0,
-            'welford_s': 0.0,
-            'numeric_min': float('inf'),
-            'numeric_max': float('-inf'),
-            'numeric_counter': Counter(), # <-- ADDED: Counter for numeric mode
-            # Count-Min Sketch
-            'cms': CountMinSketch(width=cms_width, 
-                                  depth=cms_depth, 
-                                  error_rate=cms_error_rate, 
-                                  confidence=cms_confidence, 
-                                #   seeds=seeds
-                                  )
-        }
+    cms = current_node_info['cms']
+    if current_node_info['cms_counts'] is None:
+        current_node_info['cms_counts'] = np.zeros(cms.width * cms.depth, dtype=np.int64)
+    counts = np.fromiter(string_counts.values(), dtype=np.int64, count=len(string_counts))
+    hashes = fnv1a_64(list(string_counts), range(cms.depth))
+    bins = hashes % np.uint64(cms.width) + (np.arange(cms.depth, dtype=np.uint64) * np.uint64(cms.width))[:, None]
+    np.add.at(current_node_info['cms_counts'], bins.ravel().astype(np.intp), np.tile(counts, cms.depth))
+    current_node_info['cms_added'] += int(counts.sum())
+
+
+def fold_cms(current_node_info):
+    """Adds the numpy counters of add_cms_counts into the CountMinSketch (same bins as cms.add)."""
+    counts = current_node_info['cms_counts']
+    if counts is None:
+        return
+    cms = current_node_info['cms']
+    # The sketch's bytes layout (bins, then width / depth / elements added), joined as another sketch
+    data = np.minimum(counts, CMS_BIN_MAX).astype(np.int32).tobytes() + \
+        CMS_FOOTER.pack(cms.width, cms.depth, current_node_info['cms_added'])
+    cms.join(CountMinSketch.frombytes(data))
+    current_node_info['cms_counts'] = None
+    current_node_info['cms_added'] = 0
 
-    current_node_info = collected_data[path]
-    current_node_info['count'] += 1
-    data_type = type(data).__name__
-    current_node_info['types'][data_type] += 1
-
-    if data is None:
-        current_node_info['null_count'] += 1
-    elif isinstance(data, bool):
-        pass
-    elif isinstance(data, (int, float)) and not math.isnan(data): # Welford update + Counter Update
-        current_node_info['numeric_min'] = min(current_node_info['numeric_min'], data)
-        current_node_info['numeric_max'] = max(current_node_info['numeric_max'], data)
-
-        # --- ADDED: Update Numeric Counter for Mode ---
-        current_node_info['numeric_counter'][data] += 1
-        # ---------------------------------------------
-
-        # --- Welford's Algorithm Step ---
-        n = current_node_info['welford_n'] + 1
-        old_mean = current_node_info['welford_mean']
-        new_mean = old_mean + (data - old_mean) / n
-        new_s = current_node_info['welford_s'] + (data - new_mean) * (data - old_mean)
-        current_node_info['welford_n'] = n
-        current_node_info['welford_mean'] = new_mean
-        current_node_info['welford_s'] = new_s
-        # --------------------------------
-
-    elif isinstance(data, str): # Count-Min Sketch update + Example Collection + Unique Set Update
-        current_node_info['string_lengths'].append(len(data))
-        current_node_info['cms'].add(data)
-        if data == "":
-             current_node_info['empty_count'] += 1
+
+def flush_values(current_node_info):
+    """
+    Adds the buffered scalars of a path to its accumulators, numpy on the whole batch:
+    Welford+KLL+TopValues for numbers, Count-Min Sketch for strings, a HyperLogLog for each.
+    """
+    values = current_node_info['pending']
+    if not values:
+        return
+    current_node_info['pending'] = []
+    current_node_info['count'] += len(values)
+    type_counts = Counter(map(type, values))
+    for value_type, count in type_counts.items():
+        current_node_info['types'][value_type.__name__] += count
+    current_node_info['null_count'] += type_counts.get(type(None), 0)
+
+    # bool is its own type here
+    for array in number_arrays(values, type_counts):
+        add_numbers(current_node_info, array)
+
+    if str in type_counts: # Count-Min Sketch update + Example Collection + Unique Set Update
+        strings = values if type_counts[str] == len(values) else [v for v in values if type(v) is str]
+        current_node_info['string_lengths'].add_many(list(map(len, strings)))
+        string_counts = Counter(strings)
+        add_cms_counts(current_node_info, string_counts)
+        current_node_info['empty_count'] += string_counts.get("", 0)
 
         # Collect up to 2 string examples
-        if len(current_node_info['string_examples']) < 2:
+        for data in string_counts:
+            if len(current_node_info['string_examples']) >= 2:
+                break
             if data not in current_node_info['string_examples']:
                  current_node_info['string_examples'].append(data)
 
-        # --- ADDED: Update unique string set (up to limit) ---
-        if not current_node_info['unique_strings_limited']:
-            if len(current_node_info['unique_strings']) < MAX_UNIQUE_STRINGS_TO_STORE:
-                current_node_info['unique_strings'].add(data)
-            else:
-                # Limit reached, stop adding and set flag
-                current_node_info['unique_strings_limited'] = True
-        # ----------------------------------------------------
-
-    elif isinstance(data, list):
-        current_node_info['list_lengths'].append(len(data))
-        if len(data) == 0:
-            current_node_info['empty_count'] += 1
-        list_element_path = f"{path}[*]"
-        for item in data:
-            traverse_and_collect(item, list_element_path, collected_data, cms_width, cms_depth, cms_error_rate, cms_confidence)
-    elif isinstance(data, dict):
-        if len(data) == 0:
-             current_node_info['empty_count'] += 1
-        for key, value in data.items():
-            sanitized_key = str(key).replace('.', '_')
-            child_path = f"{path}.{sanitized_key}"
-            traverse_and_collect(value, child_path, collected_data, cms_width, cms_depth, cms_error_rate, cms_confidence)
-    else:
-        current_node_info['types']['unknown'] += 1
+        current_node_info['string_distinct'].update(string_counts)
+
+
+def add_container(node_info, data_type, length):
+    """Counts one list / dict at the end of its items (which were added to their own paths)."""
+    node_info['count'] += 1
+    node_info['types'][data_type] += 1
+    if data_type == 'list':
+        node_info['list_lengths'].add(length)
+    if length == 0:
+        node_info['empty_count'] += 1
+
+
+def collect(events, cms_width, cms_depth, cms_error_rate, cms_confidence, collected_data=None):
+    """path -> accumulators of a parse event stream."""
+    new_info = functools.partial(new_node_info, cms_width, cms_depth, cms_error_rate, cms_confidence)
+    return collect_events(events, new_info, add_value, add_container, collected_data, add_values=add_values)
 
 
 # --- Main Profiling Function (Modified calls to stats functions) ---
 def profile_json_data(data, cms_width, cms_depth, cms_error_rate, cms_confidence):
     """Profiles the loaded JSON data (Python object) using memory-efficient techniques."""
-    collected_data = {}
-
     print("Starting data traversal and collection...")
-    traverse_and_collect(data, '$', collected_data, cms_width, cms_depth, cms_error_rate, cms_confidence)
+    collected_data = collect([(serializer.VALUE, data)], cms_width, cms_depth, cms_error_rate, cms_confidence)
     print("Traversal complete. Calculating final statistics...")
+    return build_profile(collected_data)
+
+
+def profile_json_file(file_path, cms_width, cms_depth, cms_error_rate, cms_confidence, key=None):
+    """
+    Profiles a JSON / NDJSON file from its parse events (utilities/serializer.py iter_events),
+    so only about one record is in memory at a time, whatever the document shape.
+    Paths are the same as profile_json_data on the loaded file.
+
+    Args:
+        key (str): Only profile this top-level key, e.g. 'PlayerGameLogs'.
+    """
+    print("Starting streamed data traversal and collection...")
+    collected_data = collect(serializer.iter_events(file_path, key=key),
+                             cms_width, cms_depth, cms_error_rate, cms_confidence)
+    print(f"Traversal complete ({len(collected_data)} paths). Calculating final statistics...")
+    return build_profile(collected_data)
+
+
+# --- Sharded Profiling: one process per file / season folder, merged accumulators ---
+def merge_node_info(node_info, other):
+    """Adds the accumulators of `other` (same path, another shard) into node_info."""
+    for info in (node_info, other):
+        flush_values(info)
+        fold_cms(info)
+    node_info['count'] += other['count']
+    node_info['types'].update(other['types'])
+    node_info['null_count'] += other['null_count']
+    node_info['empty_count'] += other['empty_count']
+    node_info['list_lengths'].merge(other['list_lengths'])
+    node_info['string_lengths'].merge(other['string_lengths'])
+    for data in other['string_examples']:
+        if len(node_info['string_examples']) < 2 and data not in node_info['string_examples']:
+            node_info['string_examples'].append(data)
+
+    node_info['numeric_distinct'].merge(other['numeric_distinct'])
+    node_info['string_distinct'].merge(other['string_distinct'])
+
+    # --- Parallel variance: Welford states of disjoint data ---
+    n, mean, s = welford_combine(node_info['welford_n'], node_info['welford_mean'], node_info['welford_s'],
+                                 other['welford_n'], other['welford_mean'], other['welford_s'])
+    node_info['welford_n'] = n
+    node_info['welford_mean'] = mean
+    node_info['welford_s'] = s
+    node_info['numeric_min'] = min(node_info['numeric_min'], other['numeric_min'])
+    node_info['numeric_max'] = max(node_info['numeric_max'], other['numeric_max'])
+    node_info['numeric_values'].merge(other['numeric_values'])
+    node_info['quantiles'].merge(other['quantiles'])
+    # Same width / depth / hashes, so the counters add up
+    node_info['cms'].join(other['cms'])
+    return node_info
+
+
+def portable_collected(collected_data):
+    """
+    collected_data that can cross a process boundary: CountMinSketch does not pickle,
+    it travels as its bytes (restore_collected turns them back).
+    """
+    for info in collected_data.values():
+        flush_values(info)
+        fold_cms(info)
+        info['cms'] = bytes(info['cms'])
+    return collected_data
+
+
+def restore_collected(collected_data, cms_width, cms_depth, cms_error_rate, cms_confidence):
+    for info in collected_data.values():
+        if isinstance(info['cms'], bytes):
+            # Joined into a sketch of the original parameters, frombytes() only keeps width / depth
+            cms = CountMinSketch(width=cms_width, depth=cms_depth, error_rate=cms_error_rate, confidence=cms_confidence)
+            cms.join(CountMinSketch.frombytes(info['cms']))
+            info['cms'] = cms
+    return collected_data
+
+
+def profile_shard(reads, cms_width, cms_depth, cms_error_rate, cms_confidence, key=None):
+    """
+    Accumulators of one shard (a data file, or a folder such as boxScoreAdvance/2024_25):
+    its (path, start, end) reads from profile_state.plan_reads.
+    """
+    collected_data = {}
+    for file_path, start, end in reads:
+        collect(serializer.iter_events(file_path, key=key, start=start, end=end),
+                cms_width, cms_depth, cms_error_rate, cms_confidence, collected_data)
+    return portable_collected(collected_data)
+
+
+def collect_files(shards, cms_width, cms_depth, cms_error_rate, cms_confidence, key=None, workers=1,
+                  collected_data=None, files=None):
+    """
+    Accumulators of several files / folders, one process per shard, merged in shard order
+    into collected_data: the ones of a single pass over the shards in that order
+    (floating point rounding of mean / stdev aside).
+
+    Args:
+        files (dict): Files read by an earlier run (its saved state), only what was added since is read.
+
+    Returns:
+        tuple: (collected_data, {path: file mark} of the files read)
+    """
+    reads, marks, changed = profile_state.plan_reads(shards, files)
+    if changed:
+        raise ValueError(f"{len(changed)} file(s) rewritten or removed since the last profile "
+                         f"(e.g. {changed[0]}), run a full profile")
+    shard_function = functools.partial(profile_shard, cms_width=cms_width, cms_depth=cms_depth,
+                                       cms_error_rate=cms_error_rate, cms_confidence=cms_confidence, key=key)
+    collected_data = {} if collected_data is None else collected_data
+    print(f"Profiling {sum(map(len, reads))} file(s) of {len(shards)} shard(s) with {workers} worker(s)...")
+    for n, shard_data in enumerate(map_shards(shard_function, reads, workers)):
+        restore_collected(shard_data, cms_width, cms_depth, cms_error_rate, cms_confidence)
+        merge_collected(collected_data, shard_data, merge_node_info)
+        print(f"  {n + 1}/{len(shards)} {shards[n]}: {len(shard_data)} paths")
+    print("Merge complete.")
+    return collected_data, marks
+
+
+def profile_json_files(shards, cms_width, cms_depth, cms_error_rate, cms_confidence, key=None, workers=1):
+    """Profiles several files / folders, one process per shard, see collect_files."""
+    collected_data, _ = collect_files(shards, cms_width, cms_depth, cms_error_rate, cms_confidence, key, workers)
+    print("Calculating final statistics...")
+    return build_profile(collected_data)
+
+
+# --- Incremental Profiling: accumulators saved next to the profile (utilities/profile_state.py) ---
+def state_params(cms_width, cms_depth, cms_error_rate, cms_confidence, key=None):
+    return {'cms_width': cms_width, 'cms_depth': cms_depth, 'cms_error_rate': cms_error_rate,
+            'cms_confidence': cms_confidence, 'key': key}
+
+
+def profile_with_state(shards, state_file, cms_width, cms_depth, cms_error_rate, cms_confidence, key=None,
+                       workers=1, update=False):
+    """
+    Profiles the shards and saves the accumulators to state_file. With update, the saved
+    accumulators are loaded and only what was added to the shards since is read, so the
+    refreshed profile costs the size of the delta.
+
+    Returns:
+        dict: The profile.
+    """
+    params = state_params(cms_width, cms_depth, cms_error_rate, cms_confidence, key)
+    collected_data, files = None, {}
+    if update:
+        state = profile_state.load_state(state_file, 'data_profile', params)
+        collected_data = restore_collected(state['collected'], cms_width, cms_depth, cms_error_rate, cms_confidence)
+        files = state['files']
+        print(f"Loaded state of {len(files)} file(s), {len(collected_data)} paths from {state_file}")
+    collected_data, marks = collect_files(shards, cms_width, cms_depth, cms_error_rate, cms_confidence, key, workers,
+                                          collected_data, files)
+    print("Calculating final statistics...")
+    profile = build_profile(collected_data)
+    profile_state.save_state(state_file, profile_state.new_state('data_profile', params,
+                                                                  portable_collected(collected_data),
+                                                                  {**files, **marks}))
+    print(f"State saved to {state_file}")
+    return profile
+
+
+# --- Sampled Profiling: a random sample of the records in a bounded time (utilities/profile_sampling.py) ---
+def profile_sampled(shards, size, cms_width, cms_depth, cms_error_rate, cms_confidence, key=None, stratify=None,
+                    max_seconds=profile_sampling.DEFAULT_MAX_SECONDS, seed=0, confidence=0.95):
+    """
+    Profiles a random sample of `size` records of the shards, with confidence intervals of
+    the percentages, means (and medians, from the KLL sketch) and the estimated counts.
+    """
+    sample, info = profile_sampling.sample_records(shards, size, key, stratify, max_seconds, seed)
+    print(f"Sampled {info['size']} of {info['records_read']} records read in {info['seconds']}s"
+          f"{'' if info['complete'] else ' (stopped at the time limit)'}")
+    collected_data = collect(profile_sampling.sample_events(sample), cms_width, cms_depth, cms_error_rate,
+                             cms_confidence)
+    print("Calculating final statistics...")
+    profile = build_profile(collected_data)
+
+    def quantiles(path, qs):
+        values = collected_data[path]['quantiles'].quantiles(qs)
+        return [values[q] for q in qs]
+
+    return profile_sampling.add_intervals(profile, info, confidence, quantiles)
+
+
+def build_profile(collected_data):
+    """Final statistics of every path from its accumulators."""
 
     profile_results = {}
     for path, info in collected_data.items():
+        flush_values(info)
+        fold_cms(info)
         result = {
             'count': info['count'],
             'types': dict(info['types']),
@@ -232,18 +493,19 @@ def profile_json_data(data, cms_width, cms_depth, cms_error_rate, cms_confidence
              max_val = info['numeric_max'] if info['numeric_max'] != float('-inf') else None
              result['numeric_stats'] = calculate_welford_stats(
                  info['welford_n'], info['welford_mean'], info['welford_s'], min_val, max_val,
-                 info['numeric_counter'] # Pass counter for mode
+                 info['numeric_values'], info['quantiles'], info['numeric_distinct']
              )
-             result['numeric_stats']['note'] = "Mean/Stdev via Welford. Mode via Counter. Float mode depends on exact precision."
+             result['numeric_stats']['note'] = ("Mean/Stdev via Welford. Quantiles via KLL sketch, unique count via "
+                                                "HyperLogLog. Float mode depends on exact precision.")
 
         # --- String Stats ---
-        if info['cms'].elements_added > 0 or info['string_examples'] or info['unique_strings']:
+        if info['cms'].elements_added > 0 or info['string_examples']:
              result['string_stats'] = calculate_string_stats_cms(
                  info['cms'], info['string_lengths'], info['empty_count'],
                  info['string_examples'], # Pass examples
-                 info['unique_strings'], info['unique_strings_limited'] # Pass unique info
+                 info['string_distinct']
              )
-             result['string_stats']['note'] = f"Unique count tracked up to {MAX_UNIQUE_STRINGS_TO_STORE} items. Freq estimates via CMS."
+             result['string_stats']['note'] = "Unique count via HyperLogLog (~0.8% error). Freq estimates via CMS."
 
         # --- List Stats ---
         if info['list_lengths']:
@@ -277,6 +539,11 @@ def format_and_print_profile(profile):
         return
 
     print("\n--- JSON Data Profile ---")
+    sample = profile.get('$', {}).get('sample')
+    if sample:
+        print(f"Sample: {sample['size']} of {sample['records_read']} records read, {sample['method']}, "
+              f"{'whole input' if sample['complete'] else 'time limited'}, "
+              f"{sample['confidence']:.0%} confidence intervals")
     for path, stats in sorted(profile.items()):
         print(f"\nPath: {path}")
         print(f"  Count: {stats['count']}")
@@ -299,9 +566,8 @@ def format_and_print_profile(profile):
 
         if 'string_stats' in stats:
             s_stats = stats['string_stats']
-            unique_limit_note = "(Limit Reached)" if s_stats.get('unique_count_limited') else ""
             # Print basic string stats first
-            print(f"  String Stats: Unique={s_stats.get('unique_count', 'N/A')}{unique_limit_note}, "
+            print(f"  String Stats: Unique~{s_stats.get('unique_count', 'N/A')}, "
                   f"AvgLen={s_stats.get('avg_length', 'N/A'):.2f}, "
                   f"MinLen={s_stats.get('min_length', 'N/A')}, MaxLen={s_stats.get('max_length', 'N/A')}, "
                   f"EmptyCnt={s_stats.get('empty_count', 'N/A')}")
@@ -325,31 +591,72 @@ def format_and_print_profile(profile):
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
-        description="Profile a JSON file using Welford's algorithm and Counter for numeric stats, "
-                    "and Count-Min Sketch + Limited Set for string frequency/uniqueness estimation.",
+        description="Profile a JSON file using Welford's algorithm and a KLL sketch for numeric stats, "
+                    "Count-Min Sketch for string frequency and HyperLogLog for uniqueness estimation.",
         formatter_class=argparse.ArgumentDefaultsHelpFormatter
         )
-    parser.add_argument("-f","--json_file",help="Path to the input JSON file.")
+    parser.add_argument("-f","--json_file", nargs="+",
+                        help="Path to the input JSON file. Several files or folders (e.g. boxScoreAdvance/*) are profiled in parallel and merged.")
     parser.add_argument("-o", "--output", help="Path to save the profile results (JSON format).")
+    parser.add_argument("-k", "--key", help="Top-level key holding the record array (e.g. PlayerGameLogs), streamed record by record.")
     parser.add_argument("--cms_error_rate", type=float, default=0.001, help="Target error rate for Count-Min Sketch (adjusts width/depth).")
     parser.add_argument("--cms_confidence", type=float, default=0.99, help="Target confidence for Count-Min Sketch estimates (adjusts depth/width).")
-    # Removed MAX_UNIQUE_STRINGS_TO_STORE from args for now, using constant
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="Processes profiling the files / folders.")
+    parser.add_argument("--state", default=None,
+                        help="Path of the saved accumulators, <output>.state by default (saved whenever --output is given).")
+    parser.add_argument("--update", action="store_true",
+                        help="Load the saved state and only profile what was added to the files / folders since.")
+    parser.add_argument("--sample", type=int, default=None,
+                        help="Profile a random sample of this many records, with confidence intervals (no state saved).")
+    parser.add_argument("--stratify", choices=profile_sampling.STRATIFY, default=None,
+                        help="Sample each season in proportion to its records.")
+    parser.add_argument("--max_seconds", type=float, default=profile_sampling.DEFAULT_MAX_SECONDS,
+                        help="Stop reading records for the sample after this many seconds (0 for no limit).")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level of the sample's intervals.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the sample.")
 
     args = parser.parse_args()
+    if args.sample is not None and (args.update or args.state):
+        parser.error("--sample does not save or update a state")
+    if args.sample is not None and args.sample < 1:
+        parser.error("--sample must be at least 1")
+    state_file = None if args.sample is not None else (
+        args.state or (profile_state.state_path(args.output) if args.output else None))
+    if args.update and not (state_file and os.path.isfile(state_file)):
+        parser.error("--update needs the state of an earlier run (--state, or --output next to its .state file)")
 
     temp_cms = CountMinSketch(error_rate=args.cms_error_rate, confidence=args.cms_confidence)
     cms_width = temp_cms.width
     cms_depth = temp_cms.depth
     print(f"Using Count-Min Sketch with calculated params: width={cms_width}, depth={cms_depth} (for error_rate={args.cms_error_rate}, confidence={args.cms_confidence})")
-    print(f"Tracking exact unique strings up to a limit of: {MAX_UNIQUE_STRINGS_TO_STORE}")
+    print(f"Unique counts via HyperLogLog (p={HLL_PRECISION}), quantiles via KLL (k={KLL_K})")
 
 
-    print(f"Loading JSON file: {args.json_file}")
-    json_data = load_json_file(args.json_file)
+    print(f"Profiling JSON file: {', '.join(args.json_file)}")
+    profile = None
+    missing = [i for i in args.json_file if not os.path.exists(i)]
+    if missing:
+        print(f"Error: File not found at {', '.join(missing)}", file=sys.stderr)
+    else:
+        try:
+            if args.sample is not None:
+                profile = profile_sampled(args.json_file, args.sample, cms_width, cms_depth, args.cms_error_rate,
+                                          args.cms_confidence, key=args.key, stratify=args.stratify,
+                                          max_seconds=args.max_seconds, seed=args.seed, confidence=args.confidence)
+            elif state_file:
+                profile = profile_with_state(args.json_file, state_file, cms_width, cms_depth, args.cms_error_rate,
+                                             args.cms_confidence, key=args.key, workers=args.workers,
+                                             update=args.update)
+            elif len(args.json_file) == 1 and os.path.isfile(args.json_file[0]):
+                profile = profile_json_file(args.json_file[0], cms_width, cms_depth, args.cms_error_rate,
+                                              args.cms_confidence, key=args.key)
+            else:
+                profile = profile_json_files(args.json_file, cms_width, cms_depth, args.cms_error_rate,
+                                             args.cms_confidence, key=args.key, workers=args.workers)
+        except (json.JSONDecodeError, KeyError, ValueError) as e:
+            print(f"Error: Could not profile {args.json_file}: {e}", file=sys.stderr)
 
-    if json_data is not None:
-        print("Profiling data...")
-        profile = profile_json_data(json_data, cms_width, cms_depth, args.cms_error_rate, args.cms_confidence)
+    if profile is not None:
         print("Profiling complete.")
 
         format_and_print_profile(profile)
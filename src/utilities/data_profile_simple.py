@@ -4,135 +4,243 @@ from collections import defaultdict, Counter
 import statistics
 import math
 import sys
+import os
+import functools
+
+from utilities import serializer, profile_state, profile_sampling
+from utilities.profile_accumulators import LengthStats, RunningStats, TopValues, Reservoir, collect_events, \
+    merge_collected, map_shards, MAX_TRACKED_VALUES, RESERVOIR_SIZE, BUFFER_SIZE
 
 # --- Helper Function to Safely Calculate Stats ---
-def calculate_numeric_stats(values):
-    """Calculates stats for a list of numeric values, handling errors."""
+def calculate_numeric_stats(numbers, numeric_values, sample):
+    """
+    Stats of numbers from their RunningStats. The median is exact while the distinct
+    values fit TopValues, from the Reservoir sample after that.
+    """
     stats = {
         'min': None, 'max': None, 'mean': None,
         'median': None, 'stdev': None
     }
-    numeric_values = [v for v in values if isinstance(v, (int, float)) and not math.isnan(v)]
-    if not numeric_values:
+    if not numbers:
         return stats
 
-    try:
-        stats['min'] = min(numeric_values)
-        stats['max'] = max(numeric_values)
-        stats['mean'] = statistics.mean(numeric_values)
-        stats['median'] = statistics.median(numeric_values)
-        if len(numeric_values) > 1:
-            stats['stdev'] = statistics.stdev(numeric_values)
-    except statistics.StatisticsError as e:
-        print(f"Warning: Could not calculate some stats: {e}", file=sys.stderr)
-    except Exception as e:
-        print(f"Warning: Unexpected error calculating stats: {e}", file=sys.stderr)
-
+    stats['min'] = numbers.min
+    stats['max'] = numbers.max
+    stats['mean'] = numbers.mean
+    stats['median'] = numeric_values.median()
+    if stats['median'] is None:
+        stats['median'] = sample.median()
+        stats['median_estimated'] = True
+    stats['stdev'] = numbers.stdev
     return stats
 
-def calculate_string_stats(values, top_n=5):
-    """Calculates stats for a list of string values."""
+def calculate_string_stats(string_values, string_lengths, empty_count, top_n=5):
+    """Stats of strings from their TopValues and LengthStats."""
     stats = {
         'min_length': None, 'max_length': None, 'avg_length': None,
         'empty_count': 0, 'unique_count': 0, 'most_common': []
     }
-    string_values = [v for v in values if isinstance(v, str)]
-    if not string_values:
+    if not string_lengths:
         return stats
 
-    lengths = [len(s) for s in string_values]
-    stats['min_length'] = min(lengths)
-    stats['max_length'] = max(lengths)
-    stats['avg_length'] = statistics.mean(lengths) if lengths else 0
-    stats['empty_count'] = sum(1 for s in string_values if s == "")
-
-    try:
-        counter = Counter(string_values)
-        stats['unique_count'] = len(counter)
-        stats['most_common'] = counter.most_common(top_n)
-    except TypeError as e:
-        # Handle cases where unhashable types might have slipped through (shouldn't happen with check)
-        print(f"Warning: Could not count frequencies due to unhashable type: {e}", file=sys.stderr)
-        stats['unique_count'] = "Error calculating"
-        stats['most_common'] = ["Error calculating"]
-
-
+    stats.update(string_lengths.to_dict())
+    stats['empty_count'] = empty_count
+    stats['unique_count'] = string_values.unique_count
+    stats['most_common'] = string_values.most_common(top_n)
+    if not string_values.exact:
+        # Lower bound, and counts may be short by up to dropped_max
+        stats['unique_count_limited'] = True
     return stats
 
 def calculate_list_stats(lengths):
-    """Calculates stats for list lengths."""
-    stats = {'min_length': None, 'max_length': None, 'avg_length': None}
-    if not lengths:
-        return stats
-    stats['min_length'] = min(lengths)
-    stats['max_length'] = max(lengths)
-    stats['avg_length'] = statistics.mean(lengths)
-    return stats
+    """Calculates stats for list lengths (LengthStats)."""
+    return lengths.to_dict()
 
-# --- Core Traversal and Collection Logic ---
-def traverse_and_collect(data, path, collected_data):
-    """
-    Recursively traverses the data structure and collects information.
-    `collected_data` is a dict mapping path -> stats_dict.
-    """
-    current_node_info = collected_data[path]
+# --- Core Collection Logic: parse events, explicit stack (utilities/profile_accumulators.py) ---
+def new_node_info():
+    """Accumulators of one path, all of bounded size."""
+    return {
+        'count': 0,
+        'types': Counter(),
+        'null_count': 0,
+        'empty_count': 0, # Count "" for strings, [] for lists, {} for dicts
+        'empty_strings': 0,
+        'pending': [],
+        'numbers': RunningStats(),
+        'numeric_values': TopValues(MAX_TRACKED_VALUES),
+        'sample': Reservoir(RESERVOIR_SIZE, seed=0),
+        'string_values': TopValues(MAX_TRACKED_VALUES),
+        'list_lengths': LengthStats(),
+        'string_lengths': LengthStats()
+    }
+
+def add_value(current_node_info, data):
+    """Buffers one scalar of the path, the accumulators are updated BUFFER_SIZE values at a time."""
+    pending = current_node_info['pending']
+    pending.append(data)
+    if len(pending) >= BUFFER_SIZE:
+        flush_values(current_node_info)
+
+def add_values(current_node_info, values):
+    """Buffers a column of scalars of the path (table fast path), flushed as one batch."""
+    pending = current_node_info['pending']
+    pending.extend(values)
+    if len(pending) >= BUFFER_SIZE:
+        flush_values(current_node_info)
+
+def flush_values(current_node_info):
+    """Adds the buffered scalars of a path to its accumulators."""
+    values = current_node_info['pending']
+    if not values:
+        return
+    current_node_info['pending'] = []
+    current_node_info['count'] += len(values)
+    type_counts = Counter(map(type, values))
+    for value_type, count in type_counts.items():
+        current_node_info['types'][value_type.__name__] += count
+    current_node_info['null_count'] += type_counts.get(type(None), 0)
+
+    if int in type_counts or float in type_counts:
+        # bool is its own type here, NaN != NaN drops it
+        numbers = [v for v in values if (type(v) is int or type(v) is float) and v == v]
+        current_node_info['numbers'].add_many(numbers)
+        current_node_info['numeric_values'].update(numbers)
+        current_node_info['sample'].add_many(numbers)
+    if str in type_counts:
+        strings = [v for v in values if type(v) is str]
+        current_node_info['string_values'].update(strings)
+        current_node_info['string_lengths'].add_many([len(v) for v in strings])
+        empty = strings.count("")
+        current_node_info['empty_count'] += empty
+        current_node_info['empty_strings'] += empty
+
+def add_container(current_node_info, data_type, length):
+    """Counts one list / dict at the end of its items (which were added to their own paths)."""
     current_node_info['count'] += 1
-    data_type = type(data).__name__
     current_node_info['types'][data_type] += 1
-
-    if data is None:
-        current_node_info['null_count'] += 1
-        current_node_info['values'].append(data)
-    elif isinstance(data, bool):
-         current_node_info['values'].append(data) # Can count True/False later if needed
-    elif isinstance(data, (int, float)):
-        current_node_info['values'].append(data)
-    elif isinstance(data, str):
-        current_node_info['values'].append(data)
-        current_node_info['string_lengths'].append(len(data))
-        if data == "":
-             current_node_info['empty_count'] += 1
-    elif isinstance(data, list):
-        current_node_info['list_lengths'].append(len(data))
-        if len(data) == 0:
-            current_node_info['empty_count'] += 1
-        # Use [*] to represent "any element" in the list for profiling list contents
-        list_element_path = f"{path}[*]"
-        for item in data:
-            traverse_and_collect(item, list_element_path, collected_data)
-    elif isinstance(data, dict):
-        if len(data) == 0:
-             current_node_info['empty_count'] += 1
-        for key, value in data.items():
-            # Ensure keys are valid strings for paths
-            sanitized_key = str(key).replace('.', '_') # Basic sanitization
-            child_path = f"{path}.{sanitized_key}"
-            traverse_and_collect(value, child_path, collected_data)
-    else:
-        # Handle other potential JSON-like types if necessary
-        current_node_info['types']['unknown'] += 1
+    if data_type == 'list':
+        current_node_info['list_lengths'].add(length)
+    if length == 0:
+        current_node_info['empty_count'] += 1
 
 
 # --- Main Profiling Function ---
+def new_collected_data():
+    """path -> accumulators, in the order the paths are first seen."""
+    return {}
+
+def collect(events, collected_data=None):
+    """path -> accumulators of a parse event stream."""
+    return collect_events(events, new_node_info, add_value, add_container, collected_data, add_values=add_values)
+
 def profile_json_data(data):
     """Profiles the loaded JSON data (Python object)."""
-    # Use defaultdict for easier aggregation during traversal
-    collected_data = defaultdict(lambda: {
-        'count': 0,
-        'types': Counter(),
-        'values': [], # Store raw values for stats (can be memory intensive!)
-        'null_count': 0,
-        'empty_count': 0, # Count "" for strings, [] for lists, {} for dicts
-        'list_lengths': [],
-        'string_lengths': []
-    })
+    # Start from the root '$'
+    return build_profile(collect([(serializer.VALUE, data)]))
+
+def profile_json_file(file_path, key=None):
+    """
+    Profiles a JSON / NDJSON file from its parse events instead of loading it first,
+    so memory stays at about one record plus the fixed size accumulators of each path.
+    Paths are the same as profile_json_data on the loaded file.
+
+    Args:
+        key (str): Only profile this top-level key, e.g. 'PlayerGameLogs'.
+    """
+    return build_profile(collect(serializer.iter_events(file_path, key=key)))
+
+# --- Sharded Profiling: one process per file / season folder, merged accumulators ---
+def merge_node_info(current_node_info, other):
+    """Adds the accumulators of `other` (same path, another shard) into current_node_info."""
+    flush_values(current_node_info)
+    flush_values(other)
+    for name in ('count', 'null_count', 'empty_count', 'empty_strings'):
+        current_node_info[name] += other[name]
+    current_node_info['types'].update(other['types'])
+    for name in ('numbers', 'numeric_values', 'sample', 'string_values', 'list_lengths', 'string_lengths'):
+        current_node_info[name].merge(other[name])
+    return current_node_info
+
+def profile_shard(reads, key=None):
+    """
+    Accumulators of one shard (a data file, or a folder such as boxScoreAdvance/2024_25):
+    its (path, start, end) reads from profile_state.plan_reads.
+    """
+    collected_data = new_collected_data()
+    for file_path, start, end in reads:
+        collect(serializer.iter_events(file_path, key=key, start=start, end=end), collected_data)
+    for info in collected_data.values():
+        flush_values(info)
+    return collected_data
+
+def collect_files(shards, key=None, workers=1, collected_data=None, files=None):
+    """
+    Accumulators of several files / folders, one process per shard, merged in shard order
+    into collected_data: the ones of a single pass over them.
 
-    # Start traversal from the root '$'
-    traverse_and_collect(data, '$', collected_data)
+    Args:
+        files (dict): Files read by an earlier run (its saved state), only what was added since is read.
 
+    Returns:
+        tuple: (collected_data, {path: file mark} of the files read)
+    """
+    reads, marks, changed = profile_state.plan_reads(shards, files)
+    if changed:
+        raise ValueError(f"{len(changed)} file(s) rewritten or removed since the last profile "
+                         f"(e.g. {changed[0]}), run a full profile")
+    collected_data = new_collected_data() if collected_data is None else collected_data
+    for shard_data in map_shards(functools.partial(profile_shard, key=key), reads, workers):
+        merge_collected(collected_data, shard_data, merge_node_info)
+    return collected_data, marks
+
+def profile_json_files(shards, key=None, workers=1):
+    """Profiles several files / folders, one process per shard, see collect_files."""
+    collected_data, _ = collect_files(shards, key, workers)
+    return build_profile(collected_data)
+
+def profile_with_state(shards, state_file, key=None, workers=1, update=False):
+    """
+    Profiles the shards and saves the accumulators to state_file (utilities/profile_state.py).
+    With update, the saved accumulators are loaded and only what was added to the shards
+    since is read, so the refreshed profile costs the size of the delta.
+    """
+    params = {'key': key}
+    collected_data, files = None, {}
+    if update:
+        state = profile_state.load_state(state_file, 'data_profile_simple', params)
+        collected_data, files = state['collected'], state['files']
+        print(f"Loaded state of {len(files)} file(s), {len(collected_data)} paths from {state_file}")
+    collected_data, marks = collect_files(shards, key, workers, collected_data, files)
+    profile = build_profile(collected_data)
+    profile_state.save_state(state_file, profile_state.new_state('data_profile_simple', params, collected_data,
+                                                                  {**files, **marks}))
+    print(f"State saved to {state_file}")
+    return profile
+
+def profile_sampled(shards, size, key=None, stratify=None, max_seconds=profile_sampling.DEFAULT_MAX_SECONDS, seed=0,
+                    confidence=0.95):
+    """
+    Profiles a random sample of `size` records of the shards (utilities/profile_sampling.py),
+    with confidence intervals of the percentages, means, medians and the estimated counts.
+    """
+    sample, info = profile_sampling.sample_records(shards, size, key, stratify, max_seconds, seed)
+    print(f"Sampled {info['size']} of {info['records_read']} records read in {info['seconds']}s"
+          f"{'' if info['complete'] else ' (stopped at the time limit)'}")
+    collected_data = collect(profile_sampling.sample_events(sample))
+    profile = build_profile(collected_data)
+
+    def quantiles(path, qs):
+        values = sorted(collected_data[path]['sample'].items)
+        return [values[min(int(q * len(values)), len(values) - 1)] for q in qs] if values else [None for _ in qs]
+
+    return profile_sampling.add_intervals(profile, info, confidence, quantiles)
+
+def build_profile(collected_data):
+    """Final statistics of every path."""
     # --- Post-traversal: Calculate final statistics ---
     profile_results = {}
     for path, info in collected_data.items():
+        flush_values(info)
         result = {
             'count': info['count'],
             'types': dict(info['types']),
@@ -151,17 +259,14 @@ def profile_json_data(data):
 
         # Add stats based on dominant type
         if dominant_type in ('int', 'float'):
-            result['numeric_stats'] = calculate_numeric_stats(info['values'])
+            result['numeric_stats'] = calculate_numeric_stats(info['numbers'], info['numeric_values'], info['sample'])
         elif dominant_type == 'str':
-            result['string_stats'] = calculate_string_stats(info['values'])
+            result['string_stats'] = calculate_string_stats(info['string_values'], info['string_lengths'],
+                                                            info['empty_strings'])
         elif dominant_type == 'list':
             result['list_stats'] = calculate_list_stats(info['list_lengths'])
             # Note: Stats for list *contents* are under the path[*] key
 
-        # Cleanup - don't need raw values in final report (unless explicitly desired)
-        # Be mindful of memory if keeping large lists of values
-        # del info['values']
-
         profile_results[path] = result
 
     return profile_results
@@ -189,6 +294,9 @@ def format_and_print_profile(profile):
         return
 
     print("--- JSON Data Profile ---")
+    sample = profile.get('$', {}).get('sample')
+    if sample:
+        print(f"Sample: {sample}")
     for path, stats in sorted(profile.items()): # Sort paths for readability
         print(f"\nPath: {path}")
         print(f"  Count: {stats['count']}")
@@ -207,17 +315,55 @@ def format_and_print_profile(profile):
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Profile a JSON file to understand its structure and data types.")
-    parser.add_argument("-f","--json_file", help="Path to the input JSON file.")
+    parser.add_argument("-f","--json_file", nargs="+",
+                        help="Path to the input JSON file. Several files or folders are profiled in parallel and merged.")
     parser.add_argument("-o", "--output", help="Path to save the profile results (JSON format).")
+    parser.add_argument("-k", "--key", help="Top-level key holding the record array (e.g. PlayerGameLogs), streamed record by record.")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="Processes profiling the files / folders.")
+    parser.add_argument("--state", default=None,
+                        help="Path of the saved accumulators, <output>.state by default (saved whenever --output is given).")
+    parser.add_argument("--update", action="store_true",
+                        help="Load the saved state and only profile what was added to the files / folders since.")
+    parser.add_argument("--sample", type=int, default=None,
+                        help="Profile a random sample of this many records, with confidence intervals (no state saved).")
+    parser.add_argument("--stratify", choices=profile_sampling.STRATIFY, default=None,
+                        help="Sample each season in proportion to its records.")
+    parser.add_argument("--max_seconds", type=float, default=profile_sampling.DEFAULT_MAX_SECONDS,
+                        help="Stop reading records for the sample after this many seconds (0 for no limit).")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level of the sample's intervals.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the sample.")
 
     args = parser.parse_args()
-
-    print(f"Loading JSON file: {args.json_file}")
-    json_data = load_json_file(args.json_file)
-
-    if json_data is not None:
-        print("Profiling data...")
-        profile = profile_json_data(json_data)
+    if args.sample is not None and (args.update or args.state):
+        parser.error("--sample does not save or update a state")
+    if args.sample is not None and args.sample < 1:
+        parser.error("--sample must be at least 1")
+    state_file = None if args.sample is not None else (
+        args.state or (profile_state.state_path(args.output) if args.output else None))
+    if args.update and not (state_file and os.path.isfile(state_file)):
+        parser.error("--update needs the state of an earlier run (--state, or --output next to its .state file)")
+
+    print(f"Profiling JSON file: {', '.join(args.json_file)}")
+    profile = None
+    missing = [i for i in args.json_file if not os.path.exists(i)]
+    if missing:
+        print(f"Error: File not found at {', '.join(missing)}", file=sys.stderr)
+    else:
+        try:
+            if args.sample is not None:
+                profile = profile_sampled(args.json_file, args.sample, key=args.key, stratify=args.stratify,
+                                          max_seconds=args.max_seconds, seed=args.seed, confidence=args.confidence)
+            elif state_file:
+                profile = profile_with_state(args.json_file, state_file, key=args.key, workers=args.workers,
+                                             update=args.update)
+            elif len(args.json_file) == 1 and os.path.isfile(args.json_file[0]):
+                profile = profile_json_file(args.json_file[0], key=args.key)
+            else:
+                profile = profile_json_files(args.json_file, key=args.key, workers=args.workers)
+        except (json.JSONDecodeError, KeyError, ValueError) as e:
+            print(f"Error: Could not profile {args.json_file}: {e}", file=sys.stderr)
+
+    if profile is not None:
         print("Profiling complete.")
 
         format_and_print_profile(profile)
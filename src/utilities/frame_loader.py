@@ -0,0 +1,200 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from constant import JSON_OUTPUT_DIR, SEASON_TYPE, CURRENT_SEASON, PLAYER_STATS_PROFILE
+from utilities import serializer
+from utilities.column_store import season_type_dir
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+    Memory-optimized DataFrame of the player_stats files
+
+    load_player_stats([2023, 2024], ['Playoffs'], ['PLAYER_NAME', 'GAME_DATE', 'PTS'])
+
+    pd.DataFrame(records) keeps every stat as int64 / float64 and
+    every name as a Python string. Here, per file:
+        - only the asked columns are kept
+        - int columns get the smallest type holding the profiled
+          min/max (full_player_profile.json) and the file's values,
+          so every season ends up with the same dtype; pandas nullable
+          Int8/Int16/... when the column has nulls. Only the columns
+          the profile types as int (or already int in the file): a
+          float column with whole values in one file stays float
+        - names, team, matchup and WL become categoricals
+        - GAME_DATE is parsed to datetime64
+    The frame is built one file at a time, the naive frame of the
+    whole selection never exists.
+
+    df.attrs['memory'] holds the bytes of the naive frame vs the
+    optimized one.
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+
+# Low cardinality strings: 40 teams, ~3.5k players, 2 values of WL
+CATEGORY_COLUMNS = ['SEASON_YEAR', 'SEASON_ID', 'PLAYER_NAME', 'NICKNAME', 'TEAM_ABBREVIATION', 'TEAM_NAME',
+                    'MATCHUP', 'WL', 'SEASON_TYPE']
+DATE_COLUMNS = ['GAME_DATE']
+INT_DTYPES = [np.int8, np.int16, np.int32, np.int64]
+NULLABLE_INT_DTYPES = {np.int8: 'Int8', np.int16: 'Int16', np.int32: 'Int32', np.int64: 'Int64'}
+
+
+def load_int_ranges(profile_path=PLAYER_STATS_PROFILE):
+    """{column: (min, max)} of the int only columns of a data_profile.py profile, empty without the file."""
+    if not profile_path or not os.path.isfile(profile_path):
+        return {}
+    with open(profile_path, 'r', encoding='utf-8') as f1:
+        profile = json.load(f1)
+    ranges = {}
+    for path, stats in profile.items():
+        if not path.startswith('$[*].') or '.' in path[len('$[*].'):]:
+            continue
+        types = {t for t, c in stats.get('types', {}).items() if c and t != 'NoneType'}
+        numeric = stats.get('numeric_stats') or {}
+        if types == {'int'} and numeric.get('min') is not None:
+            ranges[path[len('$[*].'):]] = (numeric['min'], numeric['max'])
+    return ranges
+
+
+def smallest_int_dtype(low, high):
+    for dtype in INT_DTYPES:
+        if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+            return dtype
+    return None
+
+
+def downcast_int(series, profile_range=None):
+    """
+    `series` as the smallest int dtype holding its values and `profile_range`,
+    unchanged when it is not an int column (floats, strings, all null).
+    """
+    values = series.dropna()
+    if not len(values) or not pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+        return series
+    if not (values == np.floor(values)).all():
+        return series
+    low, high = int(values.min()), int(values.max())
+    if profile_range is not None:
+        low, high = min(low, profile_range[0]), max(high, profile_range[1])
+    dtype = smallest_int_dtype(low, high)
+    if dtype is None:
+        return series
+    if series.isna().any():
+        return series.astype(NULLABLE_INT_DTYPES[dtype])
+    return series.astype(dtype)
+
+
+def optimize_frame(df, int_ranges=None):
+    """
+    Downcast int columns (typed int by `int_ranges` or already int), categoricals for
+    CATEGORY_COLUMNS, datetime64 for DATE_COLUMNS. Returns a new frame.
+    """
+    int_ranges = int_ranges or {}
+    data = {}
+    for column in df.columns:
+        series = df[column]
+        if column in DATE_COLUMNS:
+            data[column] = pd.to_datetime(series, format='ISO8601', errors='coerce')
+        elif column in CATEGORY_COLUMNS:
+            data[column] = series.astype('category')
+        elif column in int_ranges or pd.api.types.is_integer_dtype(series):
+            data[column] = downcast_int(series, int_ranges.get(column))
+        else:
+            data[column] = series
+    return pd.DataFrame(data, index=df.index)
+
+
+def concat_frames(frames):
+    """pd.concat keeping categoricals: each file has its own categories, unioned here."""
+    if not frames:
+        return pd.DataFrame()
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+    data = {}
+    for column in dict.fromkeys(c for frame in frames for c in frame.columns):
+        present = [frame[column] for frame in frames if column in frame.columns]
+        categorical = all(isinstance(i.dtype, pd.CategoricalDtype) for i in present)
+        # A column missing from a file is all null there, categorical when it is elsewhere
+        chunks = [frame[column] if column in frame.columns
+                  else pd.Series(pd.Categorical([None] * len(frame), categories=present[0].cat.categories[:0])
+                                 if categorical else [None] * len(frame))
+                  for frame in frames]
+        if categorical:
+            data[column] = pd.Series(pd.api.types.union_categoricals([i.values for i in chunks]))
+        else:
+            data[column] = pd.concat(chunks, ignore_index=True)
+    return pd.DataFrame(data)
+
+
+def frame_bytes(df):
+    return int(df.memory_usage(deep=True, index=False).sum())
+
+
+def load_player_stats(seasons=None, season_types=None, columns=None, json_dir=f'{JSON_OUTPUT_DIR}\\player_stats',
+                      profile_path=PLAYER_STATS_PROFILE, report=True):
+    """
+    Player game logs of the player_stats files as a memory-optimized DataFrame.
+
+    Args:
+        seasons (list): Season start years, e.g. [2023, 2024]. Every season from 1983 by default.
+        season_types (list): e.g. ['Regular Season', 'Playoffs'], SEASON_TYPE by default.
+        columns (list): Columns to keep (PlayerGameLogs names, plus 'SEASON_TYPE'), all by default.
+        json_dir (str): Folder of the player_stats_<season>_<season type> files.
+        profile_path (str): Profile of the data, the source of the int ranges. Optional.
+        report (bool): Also measure the naive frame and print the bytes saved.
+
+    Returns:
+        pd.DataFrame: With df.attrs['memory'] = {'naive_bytes', 'bytes', 'saved_bytes'} when report is set.
+    """
+    seasons = seasons if seasons is not None else range(1983, CURRENT_SEASON + 1)
+    season_types = season_types or SEASON_TYPE
+    int_ranges = load_int_ranges(profile_path)
+
+    frames = []
+    naive_bytes = 0
+    for i in seasons:
+        season = f"{str(i)}_{str(i +1)[-2:]}"
+        for st in season_types:
+            file_path = serializer.find_data_file(os.path.join(json_dir, f'player_stats_{season}_{season_type_dir(st)}'))
+            if file_path is None:
+                continue
+            records = list(serializer.iter_json(file_path, key='PlayerGameLogs'))
+            if not records:
+                continue
+            wanted = columns or list(dict.fromkeys(c for record in records for c in record)) + ['SEASON_TYPE']
+            df = pd.DataFrame({
+                c: [st] * len(records) if c == 'SEASON_TYPE' else [record.get(c) for record in records]
+                for c in wanted
+            })
+            del records
+            if report:
+                naive_bytes += frame_bytes(df)
+            frames.append(optimize_frame(df, int_ranges))
+
+    result = concat_frames(frames)
+    if columns:
+        result = result.reindex(columns=columns)
+    if report:
+        optimized = frame_bytes(result)
+        result.attrs['memory'] = {
+            'naive_bytes': naive_bytes,
+            'bytes': optimized,
+            'saved_bytes': naive_bytes - optimized,
+        }
+        print(f'{len(result)} rows: {naive_bytes / 1024 ** 2:.1f} MB naive -> {optimized / 1024 ** 2:.1f} MB '
+              f'({(naive_bytes - optimized) / naive_bytes if naive_bytes else 0:.0%} saved)')
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load player_stats files as a memory-optimized DataFrame.")
+    parser.add_argument("--input_folder", type=str, default=f'{JSON_OUTPUT_DIR}\\player_stats')
+    parser.add_argument("--seasons", type=int, nargs="*", default=None)
+    parser.add_argument("--season_types", nargs="*", choices=SEASON_TYPE, default=None)
+    parser.add_argument("--columns", nargs="*", default=None)
+    args = parser.parse_args()
+
+    df = load_player_stats(args.seasons, args.season_types, args.columns, args.input_folder)
+    print(df.dtypes.to_string())
@@ -0,0 +1,316 @@
+import argparse
+import os
+import re
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from constant import JSON_OUTPUT_DIR, PARQUET_OUTPUT_DIR, PARQUET_COMPRESSION, PARQUET_ROW_GROUP_SIZE, \
+    SEASON_TYPE
+from utilities import serializer
+from utilities.result_set import normalize_result
+from utilities.column_store import season_type_dir
+from utilities.sql_schema import column_types
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+    Parquet export (needs `pip install pyarrow`)
+
+    <PARQUET_OUTPUT_DIR>/<table>/season=<2024_25>/season_type=<regularseason>/part-0.parquet
+
+    Hive style partitions, so pyarrow.dataset / pandas / DuckDB /
+    Spark readers skip whole seasons from the directory names, and
+    every row group keeps min/max statistics for the rest.
+
+    Tables:
+        gameSummary                      gameSummary/<season>.json
+        player_stats                     player_stats/player_stats_<season>_<type>.json
+        boxScoreAdvance/<result set>     boxScoreAdvance/<season>/<game_id>.json
+        boxScoreTraditional/<result set> boxScoreTraditional/<season>/<game_id>.json
+
+    Column types come from the CREATE TABLE scripts of sql/postgres
+    when the table has one (player_stats -> playerStatsPerGame) and
+    are inferred by pyarrow otherwise. Every column stays nullable.
+
+    Inferred types can differ between seasons (a column all null in
+    one season, int in one and double in another), so each table keeps
+    one schema, the union of its partitions, in <table>/_common_metadata.
+    Every partition is written with it.
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+
+# export table -> CREATE TABLE name in sql/postgres
+SQL_TABLE = {
+    'player_stats': 'playerStatsPerGame',
+}
+
+# Schema of every partition of a table, in the table folder (skipped by dataset readers: leading '_')
+SCHEMA_FILE = '_common_metadata'
+
+# Third digit of a GAME_ID
+GAME_ID_SEASON_TYPE = {
+    '1': 'Pre Season',
+    '2': 'Regular Season',
+    '3': 'All Star',
+    '4': 'Playoffs',
+    '5': 'PlayIn',
+    '6': 'IST',
+}
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("Parquet export needs the 'pyarrow' package: pip install pyarrow")
+
+
+def arrow_type(sql_type):
+    """Arrow type of a Postgres column type, None when pyarrow should infer it."""
+    sql_type = sql_type.upper()
+    base = re.sub(r'\(.*\)', '', sql_type).strip()
+    if base in ('SMALLINT', 'INT2'):
+        return pa.int16()
+    if base in ('INT', 'INTEGER', 'INT4', 'SERIAL'):
+        return pa.int32()
+    if base in ('BIGINT', 'INT8', 'BIGSERIAL'):
+        return pa.int64()
+    if base in ('REAL', 'FLOAT4'):
+        return pa.float32()
+    if base in ('DOUBLE PRECISION', 'FLOAT8', 'FLOAT', 'NUMERIC', 'DECIMAL'):
+        return pa.float64()
+    if base in ('BOOLEAN', 'BOOL'):
+        return pa.bool_()
+    if base in ('VARCHAR', 'CHAR', 'CHARACTER', 'TEXT', 'CHARACTER VARYING'):
+        return pa.string()
+    if base == 'DATE':
+        return pa.date32()
+    return None
+
+
+def season_type_of_game_id(game_id):
+    return GAME_ID_SEASON_TYPE.get(str(game_id)[2], 'Unknown')
+
+
+def records_to_table(records, table=None):
+    """
+    Arrow table of row dicts, column order of the first records. Columns known to the
+    sql/postgres schema of `table` get its type; a column whose values don't fit it is
+    inferred instead (with a warning) rather than failing the export.
+    """
+    _require_pyarrow()
+    sql_types = column_types(SQL_TABLE[table]) if table in SQL_TABLE else {}
+    columns = list(dict.fromkeys(column for record in records for column in record))
+    arrays = []
+    for column in columns:
+        values = [record.get(column) for record in records]
+        wanted = arrow_type(sql_types[column.lower()]) if column.lower() in sql_types else None
+        if wanted is not None:
+            try:
+                arrays.append(pa.array(values, type=wanted, from_pandas=True))
+                continue
+            except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+                print(f"Warning: {table}.{column} does not fit {wanted}, inferring its type. Error: {e}")
+        arrays.append(pa.array(values, from_pandas=True))
+    return pa.Table.from_arrays(arrays, names=columns)
+
+
+def unify_schemas(schemas):
+    """One schema for all of `schemas`: an all null column takes the type seen elsewhere, int64 and double give double."""
+    return pa.unify_schemas(schemas, promote_options='permissive')
+
+
+def conform(arrow_table, schema):
+    """`arrow_table` with the columns, order and types of `schema`. Columns it lacks are all null."""
+    arrays = [
+        arrow_table.column(field.name).cast(field.type) if field.name in arrow_table.column_names
+        else pa.nulls(len(arrow_table), field.type)
+        for field in schema
+    ]
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def _partition_files(table_dir):
+    return sorted(os.path.join(root, i) for root, dirs, names in os.walk(table_dir)
+                  for i in names if i.endswith('.parquet'))
+
+
+def table_schema(table, output_dir=PARQUET_OUTPUT_DIR):
+    """
+    Schema shared by the partitions of an exported table, None before its first export.
+    Tables exported before SCHEMA_FILE was kept get the union of their file schemas.
+    """
+    _require_pyarrow()
+    table_dir = os.path.join(output_dir, table)
+    if os.path.isfile(os.path.join(table_dir, SCHEMA_FILE)):
+        return pq.read_schema(os.path.join(table_dir, SCHEMA_FILE))
+    files = _partition_files(table_dir)
+    return unify_schemas([pq.read_schema(i) for i in files]) if files else None
+
+
+def _write_table(arrow_table, path, compression=PARQUET_COMPRESSION, row_group_size=PARQUET_ROW_GROUP_SIZE):
+    tmp_path = f'{path}.tmp'
+    pq.write_table(
+        arrow_table,
+        tmp_path,
+        compression=compression,
+        row_group_size=row_group_size,
+        write_statistics=True,
+    )
+    os.replace(tmp_path, path)
+
+
+def write_partition(table, season, season_type, records, output_dir=PARQUET_OUTPUT_DIR,
+                    compression=PARQUET_COMPRESSION, row_group_size=PARQUET_ROW_GROUP_SIZE):
+    """
+    Writes one season / season type partition of `table`, replacing it, with the table schema
+    widened to the new records if needed. Partitions written before a widening are rewritten
+    by align_partitions.
+
+    Returns:
+        str: Path of the parquet file, None when there is no record.
+    """
+    _require_pyarrow()
+    if not records:
+        return None
+    partition_dir = os.path.join(output_dir, table, f'season={season}', f'season_type={season_type_dir(season_type)}')
+    os.makedirs(partition_dir, exist_ok=True)
+    path = os.path.join(partition_dir, 'part-0.parquet')
+
+    arrow_table = records_to_table(records, table.split('/')[0])
+    schema = table_schema(table, output_dir)
+    schema = arrow_table.schema if schema is None else unify_schemas([schema, arrow_table.schema])
+    _write_table(conform(arrow_table, schema), path, compression, row_group_size)
+    pq.write_metadata(schema, os.path.join(output_dir, table, SCHEMA_FILE))
+    return path
+
+
+def align_partitions(table, output_dir=PARQUET_OUTPUT_DIR, compression=PARQUET_COMPRESSION,
+                     row_group_size=PARQUET_ROW_GROUP_SIZE):
+    """
+    Rewrites the partitions of `table` (and of the tables under it, e.g. boxScoreAdvance/*)
+    whose schema differs from their table schema. Returns the rewritten paths.
+    """
+    _require_pyarrow()
+    rewritten = []
+    for root, dirs, names in os.walk(os.path.join(output_dir, table)):
+        if SCHEMA_FILE not in names:
+            continue
+        dirs.clear()
+        schema = pq.read_schema(os.path.join(root, SCHEMA_FILE))
+        for path in _partition_files(root):
+            if pq.read_schema(path).remove_metadata().equals(schema.remove_metadata()):
+                continue
+            _write_table(conform(pq.read_table(path, partitioning=None), schema), path, compression, row_group_size)
+            rewritten.append(path)
+    return rewritten
+
+
+def _by_season_type(records):
+    grouped = {}
+    for record in records:
+        grouped.setdefault(season_type_of_game_id(record['GAME_ID']), []).append(record)
+    return grouped
+
+
+def export_game_summary(season, json_dir=JSON_OUTPUT_DIR, output_dir=PARQUET_OUTPUT_DIR):
+    season_abbr = f"{str(season)}_{str(season +1)[-2:]}"
+    file_path = serializer.find_data_file(os.path.join(json_dir, 'gameSummary', season_abbr))
+    if file_path is None:
+        return {}
+    records = serializer.iter_json(file_path, key='LeagueGameFinderResults')
+    return {st: write_partition('gameSummary', season_abbr, st, rows, output_dir)
+            for st, rows in _by_season_type(records).items()}
+
+
+def export_player_stats(season, season_types=None, json_dir=JSON_OUTPUT_DIR, output_dir=PARQUET_OUTPUT_DIR):
+    season_abbr = f"{str(season)}_{str(season +1)[-2:]}"
+    written = {}
+    for st in season_types or SEASON_TYPE:
+        file_path = serializer.find_data_file(
+            os.path.join(json_dir, 'player_stats', f'player_stats_{season_abbr}_{season_type_dir(st)}'))
+        if file_path is None:
+            continue
+        records = list(serializer.iter_json(file_path, key='PlayerGameLogs'))
+        written[st] = write_partition('player_stats', season_abbr, st, records, output_dir)
+    return written
+
+
+def export_box_score(season, tag='boxScoreAdvance', json_dir=JSON_OUTPUT_DIR, output_dir=PARQUET_OUTPUT_DIR):
+    """One table per result set of the per-game files: <tag>/PlayerStats, <tag>/TeamStats."""
+    season_abbr = f"{str(season)}_{str(season +1)[-2:]}"
+    season_dir = os.path.join(json_dir, tag, season_abbr)
+    if not os.path.isdir(season_dir):
+        return {}
+    result_sets = {}
+    for filename in sorted(os.listdir(season_dir)):
+        if not serializer.is_data_file(filename):
+            continue
+        data = normalize_result(serializer.load(os.path.join(season_dir, filename)))
+        for name, rows in data.items():
+            if isinstance(rows, list):
+                result_sets.setdefault(name, []).extend(rows)
+    written = {}
+    for name, records in result_sets.items():
+        for st, rows in _by_season_type(records).items():
+            written[(name, st)] = write_partition(f'{tag}/{name}', season_abbr, st, rows, output_dir)
+    return written
+
+
+EXPORTS = {
+    'gameSummary': export_game_summary,
+    'player_stats': export_player_stats,
+    'boxScoreAdvance': lambda season, **kwargs: export_box_score(season, 'boxScoreAdvance', **kwargs),
+    'boxScoreTraditional': lambda season, **kwargs: export_box_score(season, 'boxScoreTraditional', **kwargs),
+}
+
+
+def export_parquet(tables=None, from_season=1983, to_season=2024, json_dir=JSON_OUTPUT_DIR, output_dir=PARQUET_OUTPUT_DIR):
+    """Exports every season of `tables` (all of EXPORTS by default)."""
+    _require_pyarrow()
+    written = {}
+    for table in tables or list(EXPORTS):
+        for season in range(from_season, to_season + 1):
+            written[(table, season)] = EXPORTS[table](season, json_dir=json_dir, output_dir=output_dir)
+            print(f'{table} {season}: {len(written[(table, season)])} partition')
+        # Seasons written before a later one widened the schema
+        aligned = align_partitions(table, output_dir)
+        if aligned:
+            print(f'{table}: {len(aligned)} partition rewritten with the table schema')
+    return written
+
+
+def read_parquet(table, seasons=None, season_types=None, columns=None, output_dir=PARQUET_OUTPUT_DIR):
+    """
+    Reads an exported table as a pandas DataFrame. Partitions outside `seasons`
+    ('2024_25') and `season_types` ('Playoffs') are pruned from the directory names.
+    Every partition is read with the table schema, not the one of the first file found.
+    """
+    _require_pyarrow()
+    import pyarrow.dataset as ds
+
+    partitioning = ds.partitioning(pa.schema([('season', pa.string()), ('season_type', pa.string())]), flavor='hive')
+    schema = table_schema(table, output_dir)
+    if schema is not None:
+        schema = unify_schemas([schema, partitioning.schema])
+    dataset = ds.dataset(os.path.join(output_dir, table), schema=schema, format='parquet', partitioning=partitioning)
+    condition = None
+    if seasons is not None:
+        condition = ds.field('season').isin(list(seasons))
+    if season_types is not None:
+        st_filter = ds.field('season_type').isin([season_type_dir(i) for i in season_types])
+        condition = st_filter if condition is None else condition & st_filter
+    return dataset.to_table(columns=columns, filter=condition).to_pandas()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export JSON tables to season partitioned Parquet.")
+    parser.add_argument("--tables", nargs="*", choices=list(EXPORTS), default=None)
+    parser.add_argument("--from_season", type=int, default=1983)
+    parser.add_argument("--to_season", type=int, default=2024)
+    parser.add_argument("--input_folder", type=str, default=JSON_OUTPUT_DIR)
+    parser.add_argument("--output_folder", type=str, default=PARQUET_OUTPUT_DIR)
+    args = parser.parse_args()
+
+    export_parquet(args.tables, args.from_season, args.to_season, args.input_folder, args.output_folder)
@@ -0,0 +1,437 @@
+import argparse
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import psycopg
+except ImportError:
+    psycopg = None
+
+import pandas as pd
+
+from constant import JSON_OUTPUT_DIR, POSTGRES_DSN, COPY_CHUNK_ROWS, LOAD_WORKERS, SEASON_TYPE, SQL_SCHEMA_DIR
+from utilities import serializer
+from utilities.column_store import season_type_dir
+from utilities.scan_df import create_postgres_sql_from_pandas, partition_name, partition_bound_sql, season_year
+from utilities.sql_schema import load_schemas, parse_create_table
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+    Postgres bulk loader (needs `pip install "psycopg[binary]"`)
+
+    Records are streamed from the JSON files into COPY ... FROM STDIN,
+    one COPY per COPY_CHUNK_ROWS rows. Each season loads in a single
+    transaction (its old rows deleted in the same one), so a failed load
+    leaves the season as it was. Seasons load in parallel, one
+    connection of the pool each. Secondary indexes are
+    dropped before the load and rebuilt once at the end, instead of
+    being maintained row by row.
+
+    Tables partitioned by season_year (sql/postgres/player_stats_per_game.sql)
+    can reload one season with reload_season(): the rows are copied and
+    indexed in a staging table that replaces the season's partition with
+    DETACH / ATTACH, the other seasons are never rewritten or re-indexed.
+
+    Local test database:
+        docker run --name nba_pg -e POSTGRES_PASSWORD=postgres -p 5435:5432 -d postgres
+        python -m utilities.pg_loader --from_season 2023 --to_season 2024
+        python -m utilities.pg_loader --reload_season 2024
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+
+# Columns filled by Postgres, never copied
+DEFAULT_COLUMNS = {'creation_timestamp'}
+
+
+def _require_psycopg():
+    if psycopg is None:
+        raise ImportError("The Postgres loader needs the 'psycopg' package: pip install \"psycopg[binary]\"")
+
+
+class ConnectionPool():
+    """Fixed number of connections handed out to the load workers."""
+    def __init__(self, dsn=POSTGRES_DSN, size=LOAD_WORKERS):
+        _require_psycopg()
+        self._pool = queue.Queue()
+        self._all = []
+        for _ in range(size):
+            conn = psycopg.connect(dsn)
+            self._all.append(conn)
+            self._pool.put(conn)
+
+    def connection(self):
+        return _PooledConnection(self._pool)
+
+    def close(self):
+        for conn in self._all:
+            conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class _PooledConnection():
+    def __init__(self, pool):
+        self._pool = pool
+        self._conn = None
+
+    def __enter__(self):
+        self._conn = self._pool.get()
+        return self._conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self._conn.rollback()
+        self._pool.put(self._conn)
+
+
+class LoadStats():
+    """Rows and time per partition, thread-safe."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.partitions = {}
+        self.started = time.monotonic()
+
+    def record(self, partition, rows, seconds):
+        with self._lock:
+            self.partitions[partition] = {'rows': rows, 'seconds': seconds,
+                                          'rows_per_sec': rows / seconds if seconds else None}
+
+    def report(self):
+        elapsed = time.monotonic() - self.started
+        rows = sum(i['rows'] for i in self.partitions.values())
+        return {'rows': rows, 'seconds': round(elapsed, 2),
+                'rows_per_sec': round(rows / elapsed) if elapsed else None,
+                'partitions': len(self.partitions)}
+
+
+def table_schema(table, records=None):
+    """
+    Schema of `table` from sql/postgres, or generated by scan_df from the first batch of
+    `records` when no script defines it. `records` is only read in that case.
+    """
+    schema = load_schemas().get(table.lower())
+    if schema is not None:
+        return schema
+    sample = next(serializer.batched(records), None) if records is not None else None
+    if not sample:
+        raise KeyError(f"No sql/postgres script for {table} and no sample to build one")
+    return parse_create_table(create_postgres_sql_from_pandas(pd.DataFrame(sample), table) + '\n')[0]
+
+
+def ensure_table(conn, schema):
+    """
+    Creates the table when it does not exist. With a sql/postgres script, the whole script runs
+    (partitions and indexes too) with IF NOT EXISTS, so it is a no-op on an existing table.
+    """
+    sql = schema['sql']
+    if schema.get('file'):
+        with open(os.path.join(SQL_SCHEMA_DIR, schema['file']), 'r', encoding='utf-8') as f1:
+            sql = f1.read()
+    sql = re.sub(r'CREATE\s+TABLE\s+(?!IF\s+NOT\s+EXISTS)', 'CREATE TABLE IF NOT EXISTS ', sql, flags=re.IGNORECASE)
+    sql = re.sub(r'CREATE\s+INDEX\s+(?!IF\s+NOT\s+EXISTS)', 'CREATE INDEX IF NOT EXISTS ', sql, flags=re.IGNORECASE)
+    conn.execute(sql)
+    conn.commit()
+
+
+def _quote_like(schema, name):
+    """Quotes `name` the way the table's own identifier is quoted."""
+    return f'"{name}"' if schema['identifier'].startswith('"') else name
+
+
+def _bare_name(schema):
+    return schema['table'] if schema['identifier'].startswith('"') else schema['table'].lower()
+
+
+def partition_strategy(conn, identifier):
+    """'list', 'range' (or 'hash'), None when the table is not partitioned."""
+    row = conn.execute('SELECT partstrat FROM pg_partitioned_table WHERE partrelid = %s::regclass',
+                       (identifier,)).fetchone()
+    if row is None:
+        return None
+    return {'l': 'list', 'r': 'range', 'h': 'hash'}[row[0]]
+
+
+def ensure_season_partition(conn, schema, season, strategy):
+    part = _quote_like(schema, partition_name(_bare_name(schema), season))
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {part} PARTITION OF {schema['identifier']} "
+                 f"{partition_bound_sql(season, strategy)}")
+    conn.commit()
+
+
+def detach_season(conn, schema, season):
+    """
+    Detaches the partition of `season`, keeping it as a standalone table.
+    Returns its identifier, None when the season has no attached partition.
+    """
+    name = partition_name(_bare_name(schema), season)
+    attached = conn.execute(
+        '''SELECT 1 FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+           WHERE i.inhparent = %s::regclass AND c.relname = %s''',
+        (schema['identifier'], name)
+    ).fetchone()
+    if attached is None:
+        return None
+    part = _quote_like(schema, name)
+    conn.execute(f"ALTER TABLE {schema['identifier']} DETACH PARTITION {part}")
+    return part
+
+
+def attach_season(conn, schema, season, table, strategy='list'):
+    """Attaches `table` as the partition of `season`. Its indexes matching the parent's are adopted, not rebuilt."""
+    conn.execute(f"ALTER TABLE {schema['identifier']} ATTACH PARTITION {table} {partition_bound_sql(season, strategy)}")
+
+
+def secondary_indexes(conn, identifier):
+    """(name, definition) of the indexes of a table that don't back a constraint."""
+    rows = conn.execute(
+        '''SELECT i.relname, pg_get_indexdef(i.oid)
+           FROM pg_index x
+           JOIN pg_class i ON i.oid = x.indexrelid
+           WHERE x.indrelid = %s::regclass
+             AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid)''',
+        (identifier,)
+    ).fetchall()
+    return [(i[0], i[1]) for i in rows]
+
+
+def drop_indexes(conn, identifier):
+    """Drops the secondary indexes of a table, returns their definitions for rebuild_indexes."""
+    indexes = secondary_indexes(conn, identifier)
+    for name, _ in indexes:
+        conn.execute(f'DROP INDEX IF EXISTS "{name}"')
+    conn.commit()
+    return indexes
+
+
+def recursive_definition(definition):
+    """
+    pg_get_indexdef of a partitioned table's index reads 'CREATE INDEX ... ON ONLY <table>':
+    run as is it builds an invalid parent index and none on the partitions. Without ONLY
+    the index is built on every partition and attached.
+    """
+    return re.sub(r'\sON\s+ONLY\s', ' ON ', definition, count=1, flags=re.IGNORECASE)
+
+
+def repair_invalid_indexes(conn, identifier):
+    """
+    Rebuilds the invalid indexes of a table, e.g. a parent only index left by an earlier load
+    (CREATE INDEX IF NOT EXISTS of ensure_table skips them). Returns their names.
+    """
+    rows = conn.execute(
+        '''SELECT i.relname, pg_get_indexdef(i.oid)
+           FROM pg_index x
+           JOIN pg_class i ON i.oid = x.indexrelid
+           WHERE x.indrelid = %s::regclass AND NOT x.indisvalid''',
+        (identifier,)
+    ).fetchall()
+    for name, definition in rows:
+        conn.execute(f'DROP INDEX IF EXISTS "{name}"')
+        conn.execute(recursive_definition(definition))
+    conn.commit()
+    return [i[0] for i in rows]
+
+
+def rebuild_indexes(pool, indexes):
+    """Recreates the dropped indexes, one connection of the pool each."""
+    def build(index):
+        name, definition = index
+        start = time.monotonic()
+        with pool.connection() as conn:
+            conn.execute(recursive_definition(definition))
+            conn.commit()
+        print(f'Index {name}: {time.monotonic() - start:.1f}s')
+
+    with ThreadPoolExecutor(max_workers=max(1, len(indexes))) as executor:
+        list(executor.map(build, indexes))
+
+
+def copy_records(conn, identifier, columns, records, chunk_rows=COPY_CHUNK_ROWS, commit=True):
+    """
+    Streams row dicts into COPY, one COPY per `chunk_rows` rows, committed after each
+    one unless `commit` is False (the caller commits).
+    Record keys are matched to the columns case-insensitively (PLAYER_ID -> player_id).
+
+    Returns:
+        int: Rows copied.
+    """
+    column_list = ', '.join(f'"{i}"' for i in columns)
+    copy_sql = f'COPY {identifier} ({column_list}) FROM STDIN'
+    key_of = None
+    total = 0
+    for chunk in serializer.batched(records, chunk_rows):
+        if key_of is None:
+            keys = {k.lower(): k for k in chunk[0]}
+            key_of = [keys.get(i, i) for i in columns]
+        with conn.cursor() as cur:
+            with cur.copy(copy_sql) as copy:
+                for record in chunk:
+                    copy.write_row([record.get(k) for k in key_of])
+        if commit:
+            conn.commit()
+        total += len(chunk)
+    return total
+
+
+def player_stats_records(season, json_dir=JSON_OUTPUT_DIR, season_types=SEASON_TYPE):
+    """Streams the PlayerGameLogs rows of every season type of one season."""
+    season_abbr = f"{str(season)}_{str(season +1)[-2:]}"
+    for st in season_types:
+        file_path = serializer.find_data_file(
+            os.path.join(json_dir, 'player_stats', f'player_stats_{season_abbr}_{season_type_dir(st)}'))
+        if file_path is not None:
+            yield from serializer.iter_json(file_path, key='PlayerGameLogs')
+
+
+def load_season(pool, schema, season, records, stats, replace=True, chunk_rows=COPY_CHUNK_ROWS):
+    """
+    Loads one season partition in a single transaction. With replace, the rows of the
+    season already in the table are deleted in it too, so a reload is idempotent and a
+    failed one leaves the old rows in place.
+    """
+    identifier = schema['identifier']
+    columns = [i['name'] for i in schema['columns'] if i['name'] not in DEFAULT_COLUMNS]
+    start = time.monotonic()
+    with pool.connection() as conn:
+        strategy = partition_strategy(conn, identifier)
+        if strategy in ('list', 'range'):
+            ensure_season_partition(conn, schema, season, strategy)
+        if replace and 'season_year' in columns:
+            conn.execute(f'DELETE FROM {identifier} WHERE season_year = %s', (season_year(season),))
+        rows = copy_records(conn, identifier, columns, records, chunk_rows, commit=False)
+        conn.commit()
+    seconds = time.monotonic() - start
+    stats.record(season_year(season), rows, seconds)
+    print(f'{identifier} {season_year(season)}: {rows} rows in {seconds:.1f}s ({rows / seconds if seconds else 0:.0f} rows/s)')
+    return rows
+
+
+def _index_method_and_columns(definition):
+    """'CREATE INDEX i ON ONLY public.t USING btree (player_id, game_date)' -> ('btree', 'player_id, game_date')"""
+    match = re.search(r'USING\s+(\w+)\s+\((.*)\)\s*$', definition)
+    return match.group(1), match.group(2)
+
+
+def reload_season(pool, schema, season, records, stats):
+    """
+    Reloads one season of a season partitioned table. The rows are copied and indexed in a
+    staging table while the old partition keeps serving reads, then one short transaction
+    swaps it in: DETACH and DROP the old partition, ATTACH the staging table. Its indexes are
+    adopted by the parent's and its CHECK constraint lets Postgres skip the validation scan.
+    """
+    identifier = schema['identifier']
+    columns = [i['name'] for i in schema['columns'] if i['name'] not in DEFAULT_COLUMNS]
+    name = partition_name(_bare_name(schema), season)
+    part = _quote_like(schema, name)
+    staging = _quote_like(schema, f'{name}_staging')
+    check = _quote_like(schema, f'{name}_season_check')
+    start = time.monotonic()
+    with pool.connection() as conn:
+        strategy = partition_strategy(conn, identifier)
+        if strategy not in ('list', 'range'):
+            raise ValueError(f"{identifier} is not partitioned by season")
+        conn.execute(f'DROP TABLE IF EXISTS {staging}')
+        conn.execute(f'CREATE TABLE {staging} (LIKE {identifier} INCLUDING DEFAULTS)')
+        conn.commit()
+        rows = copy_records(conn, staging, columns, records)
+
+        conn.execute(f"ALTER TABLE {staging} ADD CONSTRAINT {check} CHECK (season_year = '{season_year(season)}')")
+        for _, definition in secondary_indexes(conn, identifier):
+            method, index_columns = _index_method_and_columns(definition)
+            conn.execute(f'CREATE INDEX ON {staging} USING {method} ({index_columns})')
+        conn.commit()
+
+        old = detach_season(conn, schema, season)
+        if old is not None:
+            conn.execute(f'DROP TABLE {old}')
+        conn.execute(f'ALTER TABLE {staging} RENAME TO {part}')
+        attach_season(conn, schema, season, part, strategy)
+        # Redundant with the partition bound once attached
+        conn.execute(f'ALTER TABLE {part} DROP CONSTRAINT {check}')
+        conn.commit()
+    seconds = time.monotonic() - start
+    stats.record(season_year(season), rows, seconds)
+    print(f'{identifier} {season_year(season)}: reloaded {rows} rows in {seconds:.1f}s')
+    return rows
+
+
+def load_player_stats(from_season=1983, to_season=2024, dsn=POSTGRES_DSN, workers=LOAD_WORKERS,
+                      table='playerStatsPerGame', json_dir=JSON_OUTPUT_DIR, defer_indexes=True):
+    """
+    Bulk loads the player_stats files into `table`, seasons in parallel.
+
+    Returns:
+        dict: Total rows, seconds and rows/sec.
+    """
+    _require_psycopg()
+    # Only read when `table` has no sql/postgres script
+    sample = (record for season in range(from_season, to_season + 1)
+              for record in player_stats_records(season, json_dir))
+    schema = table_schema(table, sample)
+    stats = LoadStats()
+    with ConnectionPool(dsn, workers) as pool:
+        with pool.connection() as conn:
+            ensure_table(conn, schema)
+            indexes = []
+            if defer_indexes:
+                # Invalid ones are dropped too, and rebuilt valid
+                indexes = drop_indexes(conn, schema['identifier'])
+            else:
+                repair_invalid_indexes(conn, schema['identifier'])
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(load_season, pool, schema, season,
+                                    player_stats_records(season, json_dir), stats)
+                    for season in range(from_season, to_season + 1)
+                ]
+                for future in futures:
+                    future.result()
+        finally:
+            # Also after a failed load, the table must not be left without its indexes
+            if indexes:
+                rebuild_indexes(pool, indexes)
+        with pool.connection() as conn:
+            conn.execute(f"ANALYZE {schema['identifier']}")
+            conn.commit()
+    report = stats.report()
+    print(f"Loaded {report['rows']} rows in {report['seconds']}s ({report['rows_per_sec']} rows/s)")
+    return report
+
+
+def reload_player_stats_season(season, dsn=POSTGRES_DSN, table='playerStatsPerGame', json_dir=JSON_OUTPUT_DIR):
+    """Swaps in a fresh copy of one season (usually the current one) of the season partitioned table."""
+    _require_psycopg()
+    schema = table_schema(table, player_stats_records(season, json_dir))
+    stats = LoadStats()
+    with ConnectionPool(dsn, 1) as pool:
+        with pool.connection() as conn:
+            ensure_table(conn, schema)
+        reload_season(pool, schema, season, player_stats_records(season, json_dir), stats)
+    return stats.report()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk load player_stats JSON files into Postgres with COPY.")
+    parser.add_argument("--dsn", type=str, default=POSTGRES_DSN)
+    parser.add_argument("--table", type=str, default='playerStatsPerGame')
+    parser.add_argument("--input_folder", type=str, default=JSON_OUTPUT_DIR)
+    parser.add_argument("--from_season", type=int, default=1983)
+    parser.add_argument("--to_season", type=int, default=2024)
+    parser.add_argument("--workers", type=int, default=LOAD_WORKERS)
+    parser.add_argument("--keep_indexes", action="store_true", help="Maintain the indexes during the load.")
+    parser.add_argument("--reload_season", type=int, default=None,
+                        help="Only swap in the partition of this season (e.g. 2024) of a partitioned table.")
+    args = parser.parse_args()
+
+    if args.reload_season is not None:
+        reload_player_stats_season(args.reload_season, args.dsn, args.table, args.input_folder)
+    else:
+        load_player_stats(args.from_season, args.to_season, args.dsn, args.workers, args.table,
+                          args.input_folder, defer_indexes=not args.keep_indexes)
@@ -0,0 +1,733 @@
+import heapq
+import math
+import random
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from utilities.serializer import START_MAP, MAP_KEY, END_MAP, END_ARRAY, SCALAR, VALUE
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+    Bounded accumulators of the JSON profilers
+
+    collect_events() walks serializer parse events with an explicit
+    stack (no recursion, whatever the nesting) and hands every value
+    to the accumulators of its path: '$', '$[*]', '$[*].PlayerStats[*].PTS'.
+    Child paths are resolved once per path (PathTree), not rebuilt
+    as strings for every value.
+
+    Flat records (PlayerGameLogs, LeagueGameFinderResults, PlayerStats:
+    dicts with the same keys and scalar values only) are handed over
+    as tables: TABLE_BATCH_SIZE records become one column per key,
+    each added to its path at once (add_values) instead of walked
+    value by value.
+
+    Values are buffered per path (BUFFER_SIZE) and added in batches
+    (add_many), which keeps the per value work in C where it can.
+    Every accumulator has a fixed size, so profiling a file needs
+    about the same memory for 1k or 1M records:
+        LengthStats   min / max / average of string or list lengths
+        RunningStats  min / max / mean / variance (Welford)
+        TopValues     value counts, exact up to `capacity` distinct
+                      values, then the most frequent ones only
+        Reservoir     uniform sample of `capacity` values (Algorithm L)
+        HyperLogLog   distinct count estimate, ~0.8% error (p=14)
+        KLLSketch     quantiles (median, p95, p99) with rank error
+                      ~1.7% for k=200, whatever the stream length
+
+    Accumulators merge (a.merge(b)) into what one pass over both
+    inputs would give, so files can be profiled in separate processes
+    (map_shards) and reduced with merge_collected().
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+
+# Distinct values counted per path before TopValues drops the rare ones
+MAX_TRACKED_VALUES = 10000
+RESERVOIR_SIZE = 10000
+# Values buffered per path before a batch update
+BUFFER_SIZE = 1024
+# Flat records turned into columns at a time
+TABLE_BATCH_SIZE = 4096
+
+UINT64_MAX = (1 << 64) - 1
+FNV_64_OFFSET = 14695981039346656037
+FNV_64_PRIME = np.uint64(1099511628211)
+# Kept apart in hash_values: '1' vs 1 vs 1.0
+STRING_TAG = np.uint64(0x9E3779B97F4A7C15)
+INT_TAG = np.uint64(0xC2B2AE3D27D4EB4F)
+FLOAT_TAG = np.uint64(0x165667B19E3779F9)
+OTHER_TAG = np.uint64(0xD6E8FEB86659FD93)
+
+
+def welford_combine(n_a, mean_a, m2_a, n_b, mean_b, m2_b):
+    """(n, mean, m2) of two Welford states over disjoint data (Chan et al. parallel variance)."""
+    n = n_a + n_b
+    if n == 0:
+        return 0, 0.0, 0.0
+    delta = mean_b - mean_a
+    mean = mean_a + delta * n_b / n
+    m2 = m2_a + m2_b + delta * delta * n_a * n_b / n
+    return n, mean, m2
+
+
+def welford_batch(values):
+    """(n, mean, m2) of a list of numbers."""
+    n = len(values)
+    if n == 0:
+        return 0, 0.0, 0.0
+    mean = math.fsum(values) / n
+    return n, mean, math.fsum([(x - mean) ** 2 for x in values])
+
+
+class LengthStats():
+    __slots__ = ('n', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.n = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def add(self, length):
+        self.n += 1
+        self.total += length
+        if self.min is None or length < self.min:
+            self.min = length
+        if self.max is None or length > self.max:
+            self.max = length
+
+    def add_many(self, lengths):
+        if not lengths:
+            return
+        self.n += len(lengths)
+        self.total += sum(lengths)
+        low, high = min(lengths), max(lengths)
+        if self.min is None or low < self.min:
+            self.min = low
+        if self.max is None or high > self.max:
+            self.max = high
+
+    def merge(self, other):
+        if other.n:
+            self.n += other.n
+            self.total += other.total
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def __bool__(self):
+        return self.n > 0
+
+    def to_dict(self):
+        return {
+            'min_length': self.min,
+            'max_length': self.max,
+            'avg_length': self.total / self.n if self.n else None,
+        }
+
+
+class RunningStats():
+    """Count, min, max, mean and sum of squared deviations of numbers, one pass (Welford)."""
+    __slots__ = ('n', 'mean', 'm2', 'min', 'max')
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+
+    def add_many(self, values):
+        if not values:
+            return
+        self.n, self.mean, self.m2 = welford_combine(self.n, self.mean, self.m2, *welford_batch(values))
+        self.min = min(self.min, min(values))
+        self.max = max(self.max, max(values))
+
+    def merge(self, other):
+        self.n, self.mean, self.m2 = welford_combine(self.n, self.mean, self.m2, other.n, other.mean, other.m2)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def __bool__(self):
+        return self.n > 0
+
+    @property
+    def variance_sample(self):
+        return max(self.m2, 0.0) / (self.n - 1) if self.n > 1 else None
+
+    @property
+    def variance_population(self):
+        return max(self.m2, 0.0) / self.n if self.n else None
+
+    @property
+    def stdev(self):
+        variance = self.variance_sample
+        return math.sqrt(variance) if variance is not None else None
+
+
+class TopValues():
+    """
+    Value counts bounded to `capacity` distinct values. Past it, the least frequent
+    half is dropped (lossy counting): counts of the frequent values stay exact unless
+    they were dropped themselves, `exact` turns False and unique_count is a lower bound.
+    """
+    __slots__ = ('capacity', 'counts', 'exact', 'dropped_max')
+
+    def __init__(self, capacity=MAX_TRACKED_VALUES):
+        self.capacity = capacity
+        self.counts = Counter()
+        self.exact = True
+        # Highest count dropped so far: the error bound of every count
+        self.dropped_max = 0
+
+    def add(self, value, count=1):
+        counts = self.counts
+        counts[value] = counts.get(value, 0) + count
+        if len(counts) > self.capacity:
+            self._prune()
+
+    def update(self, values):
+        self.counts.update(values)
+        if len(self.counts) > self.capacity:
+            self._prune()
+
+    def merge(self, other):
+        self.counts.update(other.counts)
+        self.exact = self.exact and other.exact
+        # A value may have been dropped on both sides
+        self.dropped_max += other.dropped_max
+        if len(self.counts) > self.capacity:
+            self._prune()
+        return self
+
+    def _prune(self):
+        keep = heapq.nlargest(self.capacity // 2, self.counts.items(), key=lambda i: i[1])
+        kept = Counter(dict(keep))
+        self.dropped_max = max([self.dropped_max] + [c for v, c in self.counts.items() if v not in kept])
+        self.counts = kept
+        self.exact = False
+
+    def __bool__(self):
+        return bool(self.counts)
+
+    @property
+    def unique_count(self):
+        return len(self.counts)
+
+    def most_common(self, n=5):
+        return heapq.nlargest(n, self.counts.items(), key=lambda i: i[1])
+
+    def median(self):
+        """Median of the counted numbers (statistics.median of the expanded values), None when not exact."""
+        if not self.exact or not self.counts:
+            return None
+        items = sorted((v, c) for v, c in self.counts.items() if isinstance(v, (int, float)) and not isinstance(v, bool))
+        total = sum(c for _, c in items)
+        if not total:
+            return None
+        low_pos, high_pos = (total - 1) // 2, total // 2
+        seen, low = 0, None
+        for value, count in items:
+            seen += count
+            if low is None and seen > low_pos:
+                low = value
+            if seen > high_pos:
+                return value if low == value else (low + value) / 2
+
+
+class Reservoir():
+    """Uniform random sample of `capacity` items of a stream of unknown length (Algorithm L)."""
+    __slots__ = ('capacity', 'items', 'n', '_w', '_next', '_random')
+
+    def __init__(self, capacity=RESERVOIR_SIZE, seed=None):
+        self.capacity = capacity
+        self.items = []
+        self.n = 0
+        self._random = random.Random(seed)
+        self._w = math.exp(math.log(self._random.random()) / capacity)
+        self._next = capacity + self._skip()
+
+    def _skip(self):
+        return int(math.log(self._random.random()) / math.log(1 - self._w)) + 1
+
+    def add(self, item):
+        self.n += 1
+        if self.n <= self.capacity:
+            self.items.append(item)
+        elif self.n == self._next:
+            self.items[self._random.randrange(self.capacity)] = item
+            self._w *= math.exp(math.log(self._random.random()) / self.capacity)
+            self._next += self._skip()
+
+    def add_many(self, items):
+        seen = self.n
+        fill = min(max(self.capacity - seen, 0), len(items))
+        self.items.extend(items[:fill])
+        end = seen + len(items)
+        # Jump straight to the next replaced item (1-based stream positions)
+        while self._next <= end:
+            self.items[self._random.randrange(self.capacity)] = items[self._next - seen - 1]
+            self._w *= math.exp(math.log(self._random.random()) / self.capacity)
+            self._next += self._skip()
+        self.n = end
+
+    def merge(self, other):
+        """
+        Sample of both streams: each slot is drawn from one side with probability proportional
+        to what is left of its stream (a hypergeometric split), then the items are sampled.
+        """
+        n = self.n + other.n
+        if n <= self.capacity:
+            self.items = self.items + other.items
+        else:
+            from_self, left_self, left_other = 0, self.n, other.n
+            for _ in range(self.capacity):
+                if self._random.random() * (left_self + left_other) < left_self:
+                    from_self += 1
+                    left_self -= 1
+                else:
+                    left_other -= 1
+            self.items = (self._random.sample(self.items, min(from_self, len(self.items)))
+                          + self._random.sample(other.items, min(self.capacity - from_self, len(other.items))))
+            # Continue at about capacity / n replacements per item
+            self._w = min(1.0, self.capacity / n) * math.exp(math.log(self._random.random()) / self.capacity)
+            self._next = n + self._skip()
+        self.n = n
+        return self
+
+    def __bool__(self):
+        return bool(self.items)
+
+    def median(self):
+        if not self.items:
+            return None
+        values = sorted(self.items)
+        mid = len(values) // 2
+        return values[mid] if len(values) % 2 else (values[mid - 1] + values[mid]) / 2
+
+
+# --- Vectorized hashing ---
+def fnv1a_64(strings, seeds=(0,)):
+    """
+    64-bit FNV-1a of the code points of each string, one row per seed: the numbers of
+    probables.hashes.fnv_1a(string, seed), the Count-Min Sketch hashes, computed one
+    character position at a time for the whole batch.
+
+    Returns:
+        np.ndarray: uint64, shape (len(seeds), len(strings)).
+    """
+    lengths = np.fromiter(map(len, strings), dtype=np.intp, count=len(strings))
+    hashes = np.empty((len(seeds), len(strings)), dtype=np.uint64)
+    hashes[:] = np.array([(FNV_64_OFFSET + 31 * seed) & UINT64_MAX for seed in seeds], dtype=np.uint64)[:, None]
+    width = int(lengths.max()) if len(strings) else 0
+    if not width:
+        return hashes
+    # Longest first, so the strings still going at position j are the first active[j]
+    order = np.argsort(-lengths, kind='stable')
+    codes = np.array(strings, dtype=f'<U{width}').view(np.uint32).reshape(len(strings), width)[order]
+    active = np.searchsorted(-lengths[order], -np.arange(width), side='left')
+    hashes = hashes[:, order]
+    for j in range(width):
+        n = active[j]
+        hashes[:, :n] = (hashes[:, :n] ^ codes[:n, j]) * FNV_64_PRIME
+    result = np.empty_like(hashes)
+    result[:, order] = hashes
+    return result
+
+
+def mix64(hashes):
+    """splitmix64 finalizer: every input bit moves every output bit (FNV alone leaves the high bits weak)."""
+    hashes = hashes ^ (hashes >> np.uint64(30))
+    hashes = hashes * np.uint64(0xBF58476D1CE4E5B9)
+    hashes = hashes ^ (hashes >> np.uint64(27))
+    hashes = hashes * np.uint64(0x94D049BB133111EB)
+    return hashes ^ (hashes >> np.uint64(31))
+
+
+def hash_values(values):
+    """
+    64-bit hashes (uint64 array) of JSON scalars, in no particular order and the same in every
+    process (hash() of a str is salted per process). Strings, ints and floats are hashed as arrays.
+    """
+    strings, ints, floats, others = [], [], [], []
+    for value in values:
+        value_type = type(value)
+        if value_type is str:
+            strings.append(value)
+        elif value_type is int and -(1 << 63) <= value < (1 << 63):
+            ints.append(value)
+        elif value_type is float:
+            floats.append(value)
+        else:
+            others.append(repr(value))
+    parts = []
+    if strings:
+        parts.append(fnv1a_64(strings)[0] ^ STRING_TAG)
+    if ints:
+        parts.append(np.array(ints, dtype=np.int64).view(np.uint64) ^ INT_TAG)
+    if floats:
+        parts.append(np.array(floats, dtype=np.float64).view(np.uint64) ^ FLOAT_TAG)
+    if others:
+        parts.append(fnv1a_64(others)[0] ^ OTHER_TAG)
+    if not parts:
+        return np.empty(0, dtype=np.uint64)
+    return mix64(np.concatenate(parts))
+
+
+def bit_length(values):
+    """int.bit_length of each uint64, exact: float64 holds 32-bit halves exactly."""
+    high = values >> np.uint64(32)
+    low = values & np.uint64(0xFFFFFFFF)
+    return np.where(high > 0, 32 + np.frexp(high.astype(np.float64))[1], np.frexp(low.astype(np.float64))[1])
+
+
+class HyperLogLog():
+    """
+    Distinct count estimate in 2**p one-byte registers (16 KB for p=14, standard error
+    1.04 / sqrt(2**p) ~ 0.8%), with linear counting for small counts. Mergeable: max of registers.
+    """
+    __slots__ = ('p', 'registers')
+
+    def __init__(self, p=14):
+        self.p = p
+        self.registers = bytearray(1 << p)
+
+    def add_hashes(self, hashes):
+        """Adds 64-bit hashes (uint64 array): the first p bits pick the register, it keeps the max rank."""
+        p = np.uint64(self.p)
+        index = (hashes >> (np.uint64(64) - p)).astype(np.intp)
+        rest = hashes & ((np.uint64(1) << (np.uint64(64) - p)) - np.uint64(1))
+        rank = ((64 - self.p) - bit_length(rest) + 1).astype(np.uint8)
+        # A view of the bytearray, updated in place
+        np.maximum.at(np.frombuffer(self.registers, dtype=np.uint8), index, rank)
+
+    def add(self, value):
+        self.add_hashes(hash_values([value]))
+
+    def update(self, values):
+        """Adds distinct values (e.g. the keys of a batch Counter)."""
+        self.add_hashes(hash_values(values))
+
+    def merge(self, other):
+        if other.p != self.p:
+            raise ValueError("Unable to merge HyperLogLog sketches of different precision")
+        self.registers = bytearray(np.maximum(np.frombuffer(self.registers, dtype=np.uint8),
+                                              np.frombuffer(other.registers, dtype=np.uint8)).tobytes())
+        return self
+
+    def count(self):
+        m = len(self.registers)
+        zeros = self.registers.count(0)
+        if zeros == m:
+            return 0
+        registers = np.frombuffer(self.registers, dtype=np.uint8)
+        estimate = (0.7213 / (1 + 1.079 / m)) * m * m / float(np.exp2(-registers.astype(np.float64)).sum())
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class KLLSketch():
+    """
+    Quantile sketch (Karnin, Lang, Liberty): level h holds items of weight 2**h, a full
+    level is sorted and every other item promoted. About 3k items whatever the stream length.
+    """
+    __slots__ = ('k', 'c', 'compactors', 'size', 'max_size', '_random')
+
+    def __init__(self, k=200, c=2 / 3, seed=None):
+        self.k = k
+        self.c = c
+        self.compactors = []
+        self.size = 0
+        self.max_size = 0
+        self._random = random.Random(seed)
+        self._grow()
+
+    def _grow(self):
+        self.compactors.append([])
+        self.max_size = sum(self._capacity(h) for h in range(len(self.compactors)))
+
+    def _capacity(self, height):
+        depth = len(self.compactors) - height - 1
+        return int(math.ceil(self.c ** depth * self.k)) + 1
+
+    def _compress(self):
+        for h in range(len(self.compactors)):
+            if len(self.compactors[h]) >= self._capacity(h):
+                if h + 1 >= len(self.compactors):
+                    self._grow()
+                items = sorted(self.compactors[h])
+                # Odd length: the largest item stays at this level
+                keep = [items.pop()] if len(items) % 2 else []
+                self.compactors[h + 1].extend(items[self._random.randint(0, 1)::2])
+                self.compactors[h] = keep
+                self.size = sum(len(i) for i in self.compactors)
+                break
+
+    def add(self, x):
+        self.compactors[0].append(x)
+        self.size += 1
+        if self.size >= self.max_size:
+            self._compress()
+
+    def add_many(self, values):
+        self.compactors[0].extend(values)
+        self.size += len(values)
+        while self.size >= self.max_size:
+            self._compress()
+
+    def merge(self, other):
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for h, items in enumerate(other.compactors):
+            self.compactors[h].extend(items)
+        self.size = sum(len(i) for i in self.compactors)
+        while self.size >= self.max_size:
+            self._compress()
+        return self
+
+    def __bool__(self):
+        return self.size > 0
+
+    def quantiles(self, qs):
+        """{q: value} of each q in [0, 1], None without items."""
+        weighted = sorted((item, 1 << h) for h, items in enumerate(self.compactors) for item in items)
+        if not weighted:
+            return {q: None for q in qs}
+        total = sum(w for _, w in weighted)
+        result = {}
+        for q in qs:
+            target, seen = q * total, 0
+            for item, weight in weighted:
+                seen += weight
+                if seen >= target:
+                    result[q] = item
+                    break
+            else:
+                result[q] = weighted[-1][0]
+        return result
+
+
+# --- Merge and process pool ---
+def merge_collected(collected_data, other, merge_info):
+    """
+    Adds `other` (path -> info) into `collected_data` with merge_info(info, other_info).
+    Paths new to collected_data are appended, as a second pass would have found them.
+    """
+    for path, info in other.items():
+        if path in collected_data:
+            merge_info(collected_data[path], info)
+        else:
+            collected_data[path] = info
+    return collected_data
+
+
+def map_shards(shard_function, shards, workers=1):
+    """
+    shard_function(shard) of every shard, in shard order. With workers > 1 they run in a
+    process pool: shard_function must be a module level function (or a partial of one).
+    """
+    if workers <= 1 or len(shards) <= 1:
+        yield from map(shard_function, shards)
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(shards))) as pool:
+        yield from pool.map(shard_function, shards)
+
+
+# --- Event walker ---
+class PathNode():
+    """Accumulators (`info`) of one path, with its child paths resolved once instead of per value."""
+    __slots__ = ('path', 'info', 'children', 'item')
+
+    def __init__(self, path, info):
+        self.path = path
+        self.info = info
+        self.children = {}
+        self.item = None
+
+
+class PathTree():
+    """PathNode of every path, backed by collected_data (path -> info)."""
+    def __init__(self, new_info, collected_data=None):
+        self.new_info = new_info
+        self.collected_data = {} if collected_data is None else collected_data
+        self.nodes = {}
+
+    def node(self, path):
+        node = self.nodes.get(path)
+        if node is None:
+            info = self.collected_data.get(path)
+            if info is None:
+                info = self.collected_data[path] = self.new_info()
+            node = self.nodes[path] = PathNode(path, info)
+        return node
+
+    def child(self, node, key):
+        child = node.children.get(key)
+        if child is None:
+            # Keys differing only by '.' vs '_' share a path, as in the path strings
+            child = node.children[key] = self.node(f"{node.path}.{str(key).replace('.', '_')}")
+        return child
+
+    def item(self, node):
+        if node.item is None:
+            node.item = self.node(f"{node.path}[*]")
+        return node.item
+
+
+def table_columns(records):
+    """
+    (keys, columns) of dicts with the same keys in the same order and scalar values only,
+    None when `records` are not such a table.
+    """
+    keys = list(records[0])
+    for record in records:
+        if type(record) is not dict or len(record) != len(keys) or list(record) != keys:
+            return None
+    columns = list(zip(*[record.values() for record in records]))
+    for column in columns:
+        value_types = set(map(type, column))
+        if dict in value_types or list in value_types:
+            return None
+    return keys, columns
+
+
+def add_table(tree, node, records, add_container, add_values):
+    """
+    Adds the records (items of the array path `node`) column by column when they are a table,
+    returns False, with nothing added, when they are not.
+    """
+    table = table_columns(records)
+    if table is None:
+        return False
+    keys, columns = table
+    info = node.info
+    for _ in records:
+        add_container(info, 'dict', len(keys))
+    children = node.children
+    for key, column in zip(keys, columns):
+        child = children.get(key) or tree.child(node, key)
+        add_values(child.info, column)
+    return True
+
+
+def walk_value(tree, node, value, add_value, add_container, add_values=None):
+    """
+    Adds a decoded value (a VALUE event, e.g. one record) under `node`, with an explicit stack.
+    Lists of flat records go through add_table when add_values is given.
+    """
+    if type(value) is not dict and type(value) is not list:
+        add_value(node.info, value)
+        return
+    # (node, container), popped in document order
+    stack = [(node, value)]
+    while stack:
+        node, value = stack.pop()
+        nested = []
+        if type(value) is dict:
+            add_container(node.info, 'dict', len(value))
+            children = node.children
+            for key, item in value.items():
+                child = children.get(key) or tree.child(node, key)
+                if type(item) is dict or type(item) is list:
+                    nested.append((child, item))
+                else:
+                    add_value(child.info, item)
+        else:
+            add_container(node.info, 'list', len(value))
+            if not value:
+                continue
+            child = node.item or tree.item(node)
+            if add_values is not None and type(value[0]) is dict and \
+                    add_table(tree, child, value, add_container, add_values):
+                continue
+            info = child.info
+            for item in value:
+                if type(item) is dict or type(item) is list:
+                    nested.append((child, item))
+                else:
+                    add_value(info, item)
+        if nested:
+            stack.extend(reversed(nested))
+
+
+def collect_events(events, new_info, add_value, add_container, collected_data=None, root_path='$', add_values=None):
+    """
+    Feeds parse events (serializer.iter_events) to per-path accumulators.
+
+    Args:
+        new_info (callable): Empty accumulators of a new path.
+        add_value (callable): add_value(info, scalar).
+        add_container (callable): add_container(info, 'dict' | 'list', number of items), at its end.
+        collected_data (dict): path -> info to add to, e.g. from an earlier file.
+        add_values (callable): add_values(info, scalars), enables the table fast path: runs of
+            flat records (one VALUE event each) are batched and added a column at a time.
+
+    Returns:
+        dict: path -> info, paths in the order they were first seen.
+    """
+    tree = PathTree(new_info, collected_data)
+    root = tree.node(root_path)
+    # [node, is_map, items so far, node of the current key]
+    stack = []
+    # Run of record VALUE events of one array path, waiting to be added as a table
+    records, records_node = [], None
+
+    def flush_records():
+        if records and not add_table(tree, records_node, records, add_container, add_values):
+            for record in records:
+                walk_value(tree, records_node, record, add_value, add_container, add_values)
+        records.clear()
+
+    for event, value in events:
+        if records and event != VALUE:
+            flush_records()
+        if event == MAP_KEY:
+            frame = stack[-1]
+            frame[2] += 1
+            frame[3] = tree.child(frame[0], value)
+            continue
+        if event == END_MAP or event == END_ARRAY:
+            node, is_map, length, _ = stack.pop()
+            add_container(node.info, 'dict' if is_map else 'list', length)
+            continue
+
+        if not stack:
+            target = root
+        elif stack[-1][1]:
+            target = stack[-1][3]
+        else:
+            frame = stack[-1]
+            frame[2] += 1
+            target = tree.item(frame[0])
+
+        if event == VALUE:
+            if add_values is not None and type(value) is dict and stack and not stack[-1][1]:
+                if target is not records_node:
+                    flush_records()
+                    records_node = target
+                records.append(value)
+                if len(records) >= TABLE_BATCH_SIZE:
+                    flush_records()
+                continue
+            flush_records()
+            walk_value(tree, target, value, add_value, add_container, add_values)
+        elif event == SCALAR:
+            add_value(target.info, value)
+        else:
+            stack.append([target, event == START_MAP, 0, None])
+    flush_records()
+    return tree.collected_data
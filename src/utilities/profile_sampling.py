@@ -0,0 +1,228 @@
+import math
+import random
+import time
+from statistics import NormalDist
+
+from utilities import serializer
+from utilities.season_store import season_of_game_id
+from utilities.profile_accumulators import Reservoir
+from utilities.serializer import START_MAP, MAP_KEY, END_MAP, START_ARRAY, END_ARRAY, VALUE
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+    Sampled profiles: `size` records in a bounded time
+
+    sample_records() draws the records, profiled as usual by
+    data_profile.py / data_profile_simple.py --sample:
+        reservoir   uniform over the records read (Algorithm L)
+        season      stratified by season (SEASON_YEAR, SEASON_ID or
+                    the GAME_ID / id): one reservoir of `size` per
+                    season (its share is only known at the end), then
+                    `size` split between the seasons in proportion to
+                    their records, so the sample weights itself
+    Files are read in a random order until `max_seconds`: a large
+    input stops at the deadline with a sample of the files read
+    (a random subset of them), whatever its size.
+
+    add_intervals() adds confidence intervals to the profile of the
+    sample, records being the sampling unit (values of nested lists,
+    e.g. PlayerStats of a game, are taken as independent, so their
+    intervals are on the narrow side):
+        null_percentage_ci / empty_percentage_ci   Wilson
+        numeric_stats.mean_ci                      normal, s / sqrt(n)
+        numeric_stats.median_ci                    order statistics
+        estimated_count                            count * N / n
+    With the whole input read, N is known and the intervals get the
+    finite population correction (0 width for a sample of everything).
+    A stratified sample is taken as a simple random one: its
+    intervals are conservative.
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+
+DEFAULT_SAMPLE_SIZE = 10000
+DEFAULT_MAX_SECONDS = 60
+# Records read between deadline checks
+CHECK_EVERY = 256
+STRATIFY = ['season']
+
+
+def season_of(record):
+    """'2023_24' of a player stats / game / box score record, None when it has no season field."""
+    season = record.get('season')
+    if isinstance(season, str) and len(season) == 7 and season[4] == '_':
+        return season
+    season_year = record.get('SEASON_YEAR')
+    if isinstance(season_year, str) and len(season_year) >= 4 and season_year[:4].isdigit():
+        year = int(season_year[:4])
+        return f"{str(year)}_{str(year +1)[-2:]}"
+    season_id = record.get('SEASON_ID')
+    if season_id is not None and str(season_id)[-4:].isdigit():
+        year = int(str(season_id)[-4:])
+        return f"{str(year)}_{str(year +1)[-2:]}"
+    game_id = record.get('GAME_ID') or record.get('id')
+    if game_id is not None and str(game_id)[3:5].isdigit():
+        return season_of_game_id(game_id)
+    return None
+
+
+def record_shape(path, key=None):
+    """Where iter_events puts the records of a file: '$' for documents, '$[*]' for array items and NDJSON lines, key for the items under it."""
+    if serializer.is_ndjson(path):
+        return '$[*]'
+    if key is not None:
+        return key
+    return '$[*]' if serializer.first_char(path) == '[' else '$'
+
+
+def iter_sources(shards, key=None, rng=None):
+    """(record, shape) of every data file, files in a random order."""
+    files = [path for shard in shards for path in serializer.list_data_files(shard)]
+    (rng or random).shuffle(files)
+    for path in files:
+        shape = record_shape(path, key)
+        for record in serializer.iter_json(path, key=key):
+            yield record, shape
+
+
+def allocate(counts, size):
+    """`size` split in proportion to counts (largest remainder), no stratum above its count."""
+    total = sum(counts.values())
+    if total <= size:
+        return dict(counts)
+    shares = {name: size * count / total for name, count in counts.items()}
+    result = {name: int(share) for name, share in shares.items()}
+    for name in sorted(shares, key=lambda i: shares[i] - result[i], reverse=True)[:size - sum(result.values())]:
+        result[name] += 1
+    return result
+
+
+def sample_records(shards, size=DEFAULT_SAMPLE_SIZE, key=None, stratify=None, max_seconds=DEFAULT_MAX_SECONDS,
+                   seed=0):
+    """
+    Random sample of the records of the shards (files / folders).
+
+    Args:
+        size (int): Records in the sample.
+        key (str): Top-level key holding the record array (e.g. PlayerGameLogs).
+        stratify (str): None for one reservoir, 'season' for one per season.
+        max_seconds (float): Reading stops at this deadline, None to read everything.
+        seed (int): Seed of the file order and the reservoirs.
+
+    Returns:
+        tuple: ([(record, shape)], info) with info = {'method', 'size', 'records_read',
+            'complete' (whole input read), 'seconds', 'strata': {season: {'records', 'sampled'}}}
+    """
+    if stratify not in (None, *STRATIFY):
+        raise ValueError(f"Unsupported stratification: {stratify}")
+    if size < 1:
+        raise ValueError(f"Sample size must be at least 1, not {size}")
+    rng = random.Random(seed)
+    started = time.monotonic()
+    deadline = started + max_seconds if max_seconds else None
+    strata = {}
+    read, complete = 0, True
+    for record, shape in iter_sources(shards, key, rng):
+        name = season_of(record) if stratify == 'season' and type(record) is dict else None
+        reservoir = strata.get(name)
+        if reservoir is None:
+            reservoir = strata[name] = Reservoir(size, seed=rng.random())
+        reservoir.add((record, shape))
+        read += 1
+        if read % CHECK_EVERY:
+            continue
+        if deadline is not None and time.monotonic() > deadline:
+            complete = False
+            break
+
+    targets = allocate({name: reservoir.n for name, reservoir in strata.items()}, size)
+    sample, strata_info = [], {}
+    for name, reservoir in strata.items():
+        picked = rng.sample(reservoir.items, min(targets[name], len(reservoir.items)))
+        sample += picked
+        strata_info[str(name)] = {'records': reservoir.n, 'sampled': len(picked)}
+    info = {
+        'method': f'stratified by {stratify}' if stratify else 'reservoir',
+        'size': len(sample),
+        'records_read': read,
+        'complete': complete,
+        'seconds': round(time.monotonic() - started, 3),
+    }
+    if stratify:
+        info['strata'] = strata_info
+    return sample, info
+
+
+def sample_events(sample):
+    """
+    Parse events of the sampled records, in the shapes they were read from, so paths are the
+    ones of the full profile: documents at '$', array items at '$[*]', items under a key at
+    '$.<key>[*]'. The items of each shape are one array: list_stats of '$' are the sample's.
+    """
+    shapes = {}
+    for record, shape in sample:
+        shapes.setdefault(shape, []).append(record)
+    for shape, records in shapes.items():
+        if shape == '$':
+            for record in records:
+                yield VALUE, record
+            continue
+        if shape != '$[*]':
+            yield START_MAP, None
+            yield MAP_KEY, shape
+        yield START_ARRAY, None
+        for record in records:
+            yield VALUE, record
+        yield END_ARRAY, None
+        if shape != '$[*]':
+            yield END_MAP, None
+
+
+def wilson_interval(successes, n, z):
+    if not n:
+        return None
+    p = successes / n
+    center = (p + z * z / (2 * n)) / (1 + z * z / n)
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+    return [max(0.0, center - half), min(1.0, center + half)]
+
+
+def add_intervals(profile, info, confidence=0.95, quantiles=None):
+    """
+    Confidence intervals of the sampled profile (see the module notes), in place.
+
+    Args:
+        info (dict): sample_records() info, stored under profile['$']['sample'].
+        quantiles (callable): quantiles(path, [q, ...]) -> [value, ...] of the path's numbers,
+            for median_ci; skipped when None.
+    """
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    n_records = info['size']
+    population = info['records_read'] if info['complete'] else None
+    fpc = 1.0
+    if population is not None:
+        fpc = math.sqrt((population - n_records) / (population - 1)) if population > 1 else 0.0
+    scale = population / n_records if population and n_records else None
+
+    for path, stats in profile.items():
+        count = stats.get('count', 0)
+        if scale is not None:
+            stats['estimated_count'] = round(count * scale)
+        for name in ('null_percentage', 'empty_percentage'):
+            interval = wilson_interval(stats.get(name, 0) / 100 * count, count, z * fpc)
+            if interval is not None:
+                stats[f'{name}_ci'] = [i * 100 for i in interval]
+
+        numeric = stats.get('numeric_stats')
+        if not numeric:
+            continue
+        types = stats.get('types', {})
+        n = types.get('int', 0) + types.get('float', 0)
+        if n > 1 and numeric.get('mean') is not None and numeric.get('stdev') is not None:
+            half = z * fpc * numeric['stdev'] / math.sqrt(n)
+            numeric['mean_ci'] = [numeric['mean'] - half, numeric['mean'] + half]
+        if quantiles is not None and n > 1:
+            # Ranks of the median's bounds: n / 2 +- z * sqrt(n) / 2
+            half = z * fpc * math.sqrt(n) / 2
+            numeric['median_ci'] = quantiles(path, [max(0.0, (n / 2 - half) / n), min(1.0, (n / 2 + half) / n)])
+
+    profile.setdefault('$', {})['sample'] = {**info, 'confidence': confidence}
+    return profile
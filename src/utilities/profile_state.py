@@ -0,0 +1,153 @@
+import hashlib
+import os
+import pickle
+
+from utilities import serializer
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+    Saved profiler state, for incremental profiles
+
+    boxscore_profile.json     the published profile
+    boxscore_profile.state    pickle: the accumulators of every path
+                              (Welford sums, sketches, counters) and
+                              the files read, with how far
+
+    data_profile.py / data_profile_simple.py --update load the state,
+    read only what was added to the inputs since, and publish the
+    refreshed profile, in time proportional to the delta:
+        - new data files (a new game of boxScoreAdvance/2024_25)
+          are read whole
+        - NDJSON files that grew (the season store partitions,
+          utilities/season_store.py, only get lines appended) are
+          read from the byte offset reached last time
+        - unchanged files are skipped
+    Accumulators only add, so a file rewritten (a season partition
+    with corrected games is replaced by a new file: another inode;
+    a JSON file modified since) or removed cannot be folded in: the
+    update stops and asks for a full run.
+
+    For the '$' path of a grown NDJSON file only the new lines are
+    counted as array items, its list_stats (lines per file) keep the
+    length of the first read.
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+
+# 2: data_profile keeps one HyperLogLog per value kind
+STATE_VERSION = 2
+# Bytes before the offset compared to tell an append from a rewrite
+TAIL_BYTES = 4096
+
+
+def state_path(profile_path):
+    """boxscore_profile.json -> boxscore_profile.state"""
+    return f"{os.path.splitext(profile_path)[0]}.state"
+
+
+def tail_hash(path, offset):
+    with open(path, 'rb') as f1:
+        f1.seek(max(0, offset - TAIL_BYTES))
+        return hashlib.blake2b(f1.read(offset - max(0, offset - TAIL_BYTES)), digest_size=16).hexdigest()
+
+
+def is_appendable(path):
+    """Uncompressed NDJSON: new records are new lines at the end, read from a byte offset."""
+    return serializer.is_ndjson(path) and serializer.detect_compression(path) is None
+
+
+def file_mark(path, end):
+    """What is known of a file read up to `end`: enough to tell next time if it only grew."""
+    stat = os.stat(path)
+    return {
+        'offset': end,
+        'tail': tail_hash(path, end),
+        'appendable': is_appendable(path),
+        'inode': stat.st_ino,
+        # Appends move it, only compared for files read whole
+        'mtime': stat.st_mtime_ns,
+    }
+
+
+def is_rewritten(path, mark, appendable):
+    """True when the bytes read last time (up to mark['offset']) may not be there any more."""
+    stat = os.stat(path)
+    if stat.st_ino != mark['inode'] or appendable != mark['appendable']:
+        return True
+    if not appendable and stat.st_mtime_ns != mark['mtime']:
+        return True
+    return stat.st_size < mark['offset'] or tail_hash(path, mark['offset']) != mark['tail']
+
+
+def plan_reads(shards, files=None):
+    """
+    What to read of the shards (files / folders), given the files of an earlier run.
+
+    Args:
+        shards (list): Data files or folders.
+        files (dict): state['files'] of the earlier run, {path: file_mark}. None for a full run.
+
+    Returns:
+        tuple: (reads, marks, changed)
+            reads: one list of (path, start, end) per shard, the arguments of serializer.iter_events
+            marks: {path: file_mark} of the files read, for the next state
+            changed: files that were rewritten or removed since, which an update cannot fold in
+    """
+    files = files or {}
+    reads, marks, changed = [], {}, []
+    for shard in shards:
+        shard_reads = []
+        for path in serializer.list_data_files(shard):
+            key = os.path.abspath(path)
+            appendable = is_appendable(path)
+            # Only complete lines of a file being appended to
+            end = serializer.ndjson_end(path) if appendable else os.path.getsize(path)
+            mark = files.get(key)
+            if mark is None:
+                start = 0
+            elif is_rewritten(path, mark, appendable):
+                changed.append(path)
+                continue
+            elif mark['offset'] >= end:
+                continue
+            elif appendable:
+                start = mark['offset']
+            else:
+                changed.append(path)
+                continue
+            # Files that are not appended to are read whole
+            shard_reads.append((path, start, end if appendable else None))
+            marks[key] = file_mark(path, end)
+        reads.append(shard_reads)
+    changed += [path for path in files if not os.path.exists(path)]
+    return reads, marks, changed
+
+
+def new_state(profiler, params, collected_data, files):
+    return {
+        'version': STATE_VERSION,
+        'profiler': profiler,
+        'params': params,
+        'files': files,
+        'collected': collected_data,
+    }
+
+
+def load_state(path, profiler, params):
+    """
+    The state saved by save_state, checked against the profiler and its parameters
+    (an update with another CMS size or key would mix incompatible accumulators).
+    """
+    with open(path, 'rb') as f1:
+        state = pickle.load(f1)
+    if state.get('version') != STATE_VERSION or state.get('profiler') != profiler:
+        raise ValueError(f"{path} is not a {profiler} state (version {STATE_VERSION}), run a full profile")
+    if state['params'] != params:
+        raise ValueError(f"{path} was saved with {state['params']}, not {params}, run a full profile")
+    return state
+
+
+def save_state(path, state):
+    """Written to a temporary file then renamed, an interrupted save keeps the previous state."""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f1:
+        pickle.dump(state, f1, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, path)
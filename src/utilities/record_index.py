@@ -0,0 +1,332 @@
+import argparse
+import json
+import os
+import shutil
+import time
+from array import array
+from datetime import date
+
+import numpy as np
+
+from constant import FULL_JSON_DIR, FULL_STORE_DIR, RECORD_INDEX_DIR
+from utilities import serializer
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+    Sorted key indexes over the full_json tables
+
+    <root>/<table>/_meta.json           rows, keys, source files
+    <root>/<table>/rows.ndjson          one row per line
+    <root>/<table>/rows.offsets.npy     byte offset of each row (+ end)
+    <root>/<table>/<KEY>.keys.npy       key of every row, sorted
+    <root>/<table>/<KEY>.rows.npy       row number of each sorted key
+    <root>/<table>/<KEY>.by_row.npy     key of each row, NO_KEY without
+
+    e.g. full_player_stats/PLAYER_ID.keys.npy
+
+    Rows are the records of full_player_stats, and the PlayerStats
+    lines of playerBoxscore (its records are games). Keys are int64:
+    PLAYER_ID / TEAM_ID as is, GAME_ID as the number of its digits,
+    GAME_DATE as yyyymmdd, so one np.searchsorted (binary search)
+    answers a point or a range lookup. Rows without a key are not in
+    its index (box score lines have no GAME_DATE).
+
+    Arrays are opened with numpy memmap on the first lookup of their
+    key, so opening an index only reads _meta.json, and a lookup reads
+    the few pages of the search plus the matching rows.
+
+    The index is built from the season store partitions (or the
+    combined full_json file) and rebuilt when a source file changed.
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+
+DATE = 'date'
+INT = 'int'
+NO_KEY = np.iinfo(np.int64).min
+TABLES = {
+    'full_player_stats': {'rows': None, 'keys': {'PLAYER_ID': INT, 'GAME_ID': INT, 'TEAM_ID': INT, 'GAME_DATE': DATE}},
+    'playerBoxscore': {'rows': 'PlayerStats', 'keys': {'PLAYER_ID': INT, 'GAME_ID': INT, 'TEAM_ID': INT}},
+}
+
+
+def encode_key(kind, value):
+    """int64 of a key value: '0022400123' -> 22400123, '2024-10-22T00:00:00' -> 20241022. None when it has none."""
+    if value is None or value == '':
+        return None
+    if kind == DATE:
+        if isinstance(value, date):
+            value = value.isoformat()
+        return int(str(value)[:10].replace('-', ''))
+    return int(value)
+
+
+def default_sources(table):
+    """The season store partitions of the table, else its combined full_json file."""
+    store_dir = os.path.join(FULL_STORE_DIR, table)
+    if os.path.isdir(store_dir):
+        return [store_dir]
+    file_path = serializer.find_data_file(os.path.join(FULL_JSON_DIR, table))
+    return [file_path] if file_path else []
+
+
+def source_files(sources):
+    """{absolute path: [size, mtime]} of the data files of the sources, to tell a stale index."""
+    result = {}
+    for source in sources:
+        for path in serializer.list_data_files(source):
+            stat = os.stat(path)
+            result[os.path.abspath(path)] = [stat.st_size, stat.st_mtime_ns]
+    return result
+
+
+def iter_rows(table, sources):
+    rows_key = TABLES[table]['rows']
+    for source in sources:
+        for path in serializer.list_data_files(source):
+            for record in serializer.iter_json(path):
+                if rows_key is None:
+                    yield record
+                else:
+                    yield from record.get(rows_key) or []
+
+
+def build_index(table, sources=None, root=RECORD_INDEX_DIR):
+    """
+    Writes the rows and the sorted key arrays of a table, replacing the index if it exists.
+    The index is built next to the old one and swapped in when complete.
+
+    Args:
+        table (str): A TABLES name, e.g. 'full_player_stats'.
+        sources (list): Data files or folders, default_sources(table) by default.
+
+    Returns:
+        int: Number of rows.
+    """
+    sources = default_sources(table) if sources is None else sources
+    keys = TABLES[table]['keys']
+    index_dir = os.path.join(root, table)
+    tmp_dir = f'{index_dir}.tmp'
+    if os.path.isdir(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+
+    offsets = array('q', [0])
+    key_values = {name: array('q') for name in keys}
+    key_rows = {name: array('q') for name in keys}
+    with open(os.path.join(tmp_dir, 'rows.ndjson'), 'wb') as f1:
+        for n, row in enumerate(iter_rows(table, sources)):
+            line = json.dumps(row, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+            f1.write(line)
+            offsets.append(offsets[-1] + len(line))
+            for name, kind in keys.items():
+                try:
+                    value = encode_key(kind, row.get(name))
+                except ValueError:
+                    continue
+                if value is not None:
+                    key_values[name].append(value)
+                    key_rows[name].append(n)
+    rows = len(offsets) - 1
+    np.save(os.path.join(tmp_dir, 'rows.offsets.npy'), np.frombuffer(offsets, dtype=np.int64))
+
+    row_dtype = np.int32 if rows < np.iinfo(np.int32).max else np.int64
+    meta = {'table': table, 'rows': rows, 'sources': sources, 'files': source_files(sources), 'keys': {}}
+    for name, kind in keys.items():
+        values = np.frombuffer(key_values[name], dtype=np.int64)
+        # Stable: the rows of one key stay in file order
+        order = np.argsort(values, kind='stable')
+        np.save(os.path.join(tmp_dir, f'{name}.keys.npy'), values[order])
+        np.save(os.path.join(tmp_dir, f'{name}.rows.npy'),
+                np.frombuffer(key_rows[name], dtype=np.int64)[order].astype(row_dtype))
+        by_row = np.full(rows, NO_KEY, dtype=np.int64)
+        by_row[np.frombuffer(key_rows[name], dtype=np.int64)] = values
+        np.save(os.path.join(tmp_dir, f'{name}.by_row.npy'), by_row)
+        meta['keys'][name] = {'kind': kind, 'count': len(values)}
+    with open(os.path.join(tmp_dir, '_meta.json'), 'w', encoding='utf-8') as f1:
+        json.dump(meta, f1, indent=4)
+
+    if os.path.isdir(index_dir):
+        shutil.rmtree(index_dir)
+    os.replace(tmp_dir, index_dir)
+    return rows
+
+
+class RecordIndex():
+    """
+    Point and range lookups of one table's rows. Arrays are memory-mapped on first access.
+
+    Conditions of find() / get(), one per key (all must match):
+        PLAYER_ID=2544                          point
+        GAME_ID=['0022400001', '0022400002']    any of the values
+        GAME_DATE=('2024-01-01', '2024-01-31')  inclusive range, None for an open end
+
+    Args:
+        path (str): Index folder, <root>/<table>.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, '_meta.json'), 'r', encoding='utf-8') as f1:
+            self.meta = json.load(f1)
+        self.rows = self.meta['rows']
+        self.keys = list(self.meta['keys'])
+        self._cache = {}
+        self._file = None
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def is_stale(self):
+        """True when a source file was added, changed or removed since the build."""
+        return source_files(self.meta['sources']) != self.meta['files']
+
+    def _array(self, name):
+        if name not in self._cache:
+            self._cache[name] = np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode='r')
+        return self._cache[name]
+
+    def _encode(self, name, value):
+        if name not in self.meta['keys']:
+            raise KeyError(f"{name} is not indexed in {self.meta['table']}, indexed: {', '.join(self.keys)}")
+        return encode_key(self.meta['keys'][name]['kind'], value)
+
+    def _spans(self, name, condition):
+        """(start, end) slices of the sorted keys matching a condition."""
+        if isinstance(condition, tuple):
+            low, high = (None if i is None else self._encode(name, i) for i in condition)
+            bounds = [(low, high)]
+        elif isinstance(condition, (list, set)):
+            # A value asked twice matches its rows once
+            bounds = [(i, i) for i in sorted({self._encode(name, i) for i in condition})]
+        else:
+            value = self._encode(name, condition)
+            bounds = [(value, value)]
+        keys = self._array(f'{name}.keys')
+        return [(0 if low is None else np.searchsorted(keys, low, 'left'),
+                 len(keys) if high is None else np.searchsorted(keys, high, 'right')) for low, high in bounds]
+
+    def _rows(self, name, spans):
+        rows = self._array(f'{name}.rows')
+        if not spans:
+            return rows[:0]
+        if len(spans) == 1:
+            return rows[spans[0][0]:spans[0][1]]
+        return np.concatenate([rows[start:end] for start, end in spans])
+
+    def lookup(self, name, value):
+        """Row numbers whose key `name` is `value`, in file order."""
+        return self._rows(name, self._spans(name, value))
+
+    def range(self, name, low=None, high=None):
+        """Row numbers whose key `name` is within [low, high], in key order."""
+        return self._rows(name, self._spans(name, (low, high)))
+
+    def find(self, **conditions):
+        """
+        Row numbers matching every condition, in file order. The rows of the most selective
+        condition (counted from the binary search bounds) are filtered on the keys of the
+        other conditions, read by row number.
+        """
+        if not conditions:
+            return np.arange(self.rows)
+        spans = {name: self._spans(name, condition) for name, condition in conditions.items()}
+        first = min(spans, key=lambda name: sum(end - start for start, end in spans[name]))
+        result = np.sort(self._rows(first, spans[first]))
+        for name, condition in conditions.items():
+            if name == first or not len(result):
+                continue
+            keys = self._array(f'{name}.keys')
+            values = self._array(f'{name}.by_row')[result]
+            mask = np.zeros(len(result), dtype=bool)
+            for start, end in spans[name]:
+                if start < end:
+                    mask |= (values >= keys[start]) & (values <= keys[end - 1])
+            result = result[mask]
+        return result
+
+    def records(self, row_numbers):
+        """The rows (dicts), in the order of row_numbers."""
+        if self._file is None:
+            self._file = open(os.path.join(self.path, 'rows.ndjson'), 'rb')
+        offsets = self._array('rows.offsets')
+        result = []
+        for n in row_numbers:
+            self._file.seek(offsets[n])
+            result.append(json.loads(self._file.read(offsets[n + 1] - offsets[n])))
+        return result
+
+    def get(self, **conditions):
+        """Rows matching every condition (see the class notes), in file order."""
+        return self.records(self.find(**conditions))
+
+    def player_games(self, player_id, date_from=None, date_to=None):
+        """Game lines of a player, between two dates (inclusive) when given."""
+        if date_from is None and date_to is None:
+            return self.get(PLAYER_ID=player_id)
+        return self.get(PLAYER_ID=player_id, GAME_DATE=(date_from, date_to))
+
+    def game_lines(self, game_id):
+        """Every player line of a game."""
+        return self.get(GAME_ID=game_id)
+
+
+def open_index(table, root=RECORD_INDEX_DIR, sources=None, rebuild=False):
+    """
+    Index of a table, built first when it is missing, stale or rebuild is set.
+
+    Args:
+        sources (list): Data files or folders of a build, default_sources(table) by default.
+    """
+    index_dir = os.path.join(root, table)
+    if not rebuild and os.path.isfile(os.path.join(index_dir, '_meta.json')):
+        index = RecordIndex(index_dir)
+        if sources in (None, index.meta['sources']) and not index.is_stale():
+            return index
+        index.close()
+    rows = build_index(table, sources, root)
+    print(f'{table}: indexed {rows} rows')
+    return RecordIndex(index_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Look up rows of a full_json table by player, game, team and date.")
+    parser.add_argument("--table", choices=list(TABLES), default='full_player_stats')
+    parser.add_argument("--source", nargs="+", default=None,
+                        help="Data files or folders to index, the season store of the table by default.")
+    parser.add_argument("--root", type=str, default=RECORD_INDEX_DIR)
+    parser.add_argument("--build", action="store_true", help="Rebuild the index even if it is up to date.")
+    parser.add_argument("--player_id", type=int)
+    parser.add_argument("--game_id", type=str)
+    parser.add_argument("--team_id", type=int)
+    parser.add_argument("--date_from", type=str, help="First GAME_DATE, e.g. 2024-10-22.")
+    parser.add_argument("--date_to", type=str, help="Last GAME_DATE (inclusive).")
+    parser.add_argument("--limit", type=int, default=20, help="Rows printed.")
+    args = parser.parse_args()
+
+    conditions = {}
+    if args.player_id is not None:
+        conditions['PLAYER_ID'] = args.player_id
+    if args.game_id is not None:
+        conditions['GAME_ID'] = args.game_id
+    if args.team_id is not None:
+        conditions['TEAM_ID'] = args.team_id
+    if args.date_from is not None or args.date_to is not None:
+        conditions['GAME_DATE'] = (args.date_from, args.date_to)
+
+    with open_index(args.table, args.root, args.source, args.build) as index:
+        if conditions:
+            started = time.perf_counter()
+            try:
+                row_numbers = index.find(**conditions)
+            except KeyError as e:
+                parser.error(str(e))
+            elapsed = time.perf_counter() - started
+            for record in index.records(row_numbers[:args.limit]):
+                print(json.dumps(record, ensure_ascii=False))
+            print(f'{len(row_numbers)} rows in {elapsed * 1e6:.0f} us')
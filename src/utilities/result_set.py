@@ -0,0 +1,65 @@
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+    Raw result sets
+
+    stats.nba.com answers with a header list and a rowSet of value
+    lists per result set. Keeping that layout avoids one dict per
+    row (with every column name repeated):
+
+        {"PlayerStats": {"headers": [...], "rowSet": [[...], ...]}}
+
+    These helpers convert it to columns or row dicts only when a
+    consumer needs them.
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+
+
+def raw_result(api_result):
+    """Result sets of an nba_api endpoint object as {name: {'headers', 'rowSet'}}, without building row dicts."""
+    try:
+        data_sets = api_result.nba_response.get_data_sets()
+    except KeyError:
+        # V3 endpoints return nested JSON and need the endpoint's own parser
+        data_sets = api_result.nba_response.get_data_sets(api_result.endpoint)
+    return {
+        name: {'headers': data_set['headers'], 'rowSet': data_set['data']}
+        for name, data_set in data_sets.items()
+    }
+
+
+def is_raw_result_set(value):
+    return isinstance(value, dict) and 'headers' in value and 'rowSet' in value
+
+
+def is_raw_result(data):
+    return isinstance(data, dict) and bool(data) and any(is_raw_result_set(v) for v in data.values())
+
+
+def row_count(result_set):
+    """Number of rows of a result set in either layout."""
+    if is_raw_result_set(result_set):
+        return len(result_set['rowSet'])
+    return len(result_set)
+
+
+def to_columnar(result_set):
+    """{'headers', 'rowSet'} -> {column: [values]}."""
+    headers = result_set['headers']
+    if not result_set['rowSet']:
+        return {column: [] for column in headers}
+    return {column: list(values) for column, values in zip(headers, zip(*result_set['rowSet']))}
+
+
+def to_records(result_set):
+    """{'headers', 'rowSet'} -> [row dict], the layout of get_normalized_dict."""
+    headers = result_set['headers']
+    return [dict(zip(headers, row)) for row in result_set['rowSet']]
+
+
+def normalize_result(data):
+    """Returns a file's content in the get_normalized_dict layout, whichever layout it was written in."""
+    if not is_raw_result(data):
+        return data
+    return {
+        name: to_records(value) if is_raw_result_set(value) else value
+        for name, value in data.items()
+    }
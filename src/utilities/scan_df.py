@@ -1,26 +1,72 @@
+import argparse
+import json
+import math
+import re
+
 import pandas as pd
 import numpy as np
 
-def pandas_dtype_to_postgres_type(dtype):
-    """Maps Pandas/NumPy dtype to a PostgreSQL SQL type string."""
-    if pd.api.types.is_integer_dtype(dtype):
-    # Use BIGINT for 64-bit integers (common in Pandas)
-        if dtype == np.int64:
-            return "INTEGER"
-        else:
-            return "INTEGER"
+# Extra room over the longest string seen, for VARCHAR(n)
+VARCHAR_HEADROOM = 1.25
+# Fixed length strings up to this length become CHAR(n)
+MAX_CHAR_LENGTH = 16
+# Floats up to this magnitude fit REAL (about 7 significant digits), larger ones DOUBLE PRECISION
+REAL_MAX_ABS = 1e6
+
+def integer_type(min_val, max_val):
+    """Smallest Postgres integer type holding [min_val, max_val]."""
+    if min_val is None or max_val is None:
+        return "INTEGER"
+    if -32768 <= min_val and max_val <= 32767:
+        return "SMALLINT"
+    if -2147483648 <= min_val and max_val <= 2147483647:
+        return "INTEGER"
+    return "BIGINT"
+
+def float_type(min_val, max_val):
+    if min_val is None or max_val is None:
+        return "DOUBLE PRECISION"
+    return "REAL" if max(abs(min_val), abs(max_val)) <= REAL_MAX_ABS else "DOUBLE PRECISION"
+
+def string_type(min_length, max_length):
+    """CHAR(n) for short fixed length strings (GAME_ID, SEASON_ID), VARCHAR(n) with headroom otherwise."""
+    if not max_length:
+        return "VARCHAR(30)"
+    if min_length == max_length and max_length <= MAX_CHAR_LENGTH:
+        return f"CHAR({max_length})"
+    return f"VARCHAR({math.ceil(max_length * VARCHAR_HEADROOM)})"
+
+def pandas_dtype_to_postgres_type(dtype, series=None):
+    """
+    Maps Pandas/NumPy dtype to a PostgreSQL SQL type string.
+    With `series`, integer, float and string columns are sized from its values.
+    """
+    if pd.api.types.is_bool_dtype(dtype):
+        return "BOOLEAN"
+    elif pd.api.types.is_integer_dtype(dtype):
+        if series is not None and series.notna().any():
+            return integer_type(int(series.min()), int(series.max()))
+        return "INTEGER"
     elif pd.api.types.is_float_dtype(dtype):
+        if series is not None and series.notna().any():
+            return float_type(float(series.min()), float(series.max()))
         # Use DOUBLE PRECISION for 64-bit floats (common in Pandas)
         if dtype == np.float64:
              return "DOUBLE PRECISION"
         else:
              return "REAL" # For float32
-    elif pd.api.types.is_bool_dtype(dtype):
-        return "BOOLEAN"
     elif pd.api.types.is_datetime64_any_dtype(dtype):
     # TIMESTAMP WITHOUT TIME ZONE is common, use TIMESTAMPTZ if needed
         return "TIMESTAMP"
     elif pd.api.types.is_string_dtype(dtype):
+        if series is not None:
+            values = series.dropna()
+            if len(values) and all(isinstance(v, str) for v in values):
+                lengths = values.str.len()
+                return string_type(int(lengths.min()), int(lengths.max()))
+            if len(values):
+                # Lists / dicts / mixed values in an object column
+                return "TEXT"
         return "VARCHAR(30)"
     # Check if it is list or dict
     elif pd.api.types.is_object_dtype(dtype) or  isinstance(dtype, pd.CategoricalDtype):
@@ -49,15 +95,191 @@ def create_postgres_sql_from_pandas(df: pd.DataFrame, table_name: str) -> str:
     if not table_name or not isinstance(table_name, str):
          raise ValueError("Table name must be a non-empty string")
 
-    columns_sql = []
+    columns = []
     for column_name, dtype in df.dtypes.items():
-        sql_type = pandas_dtype_to_postgres_type(dtype)
+        series = df[column_name]
+        sql_type = pandas_dtype_to_postgres_type(dtype, series)
+        columns.append((column_name, sql_type, bool(series.isna().any())))
+
+    return create_table_sql(table_name, columns)
+
+def create_table_sql(table_name, columns):
+    """CREATE TABLE script of [(column, sql type, nullable)], NOT NULL only on columns without nulls."""
+    columns_sql = []
+    for column_name, sql_type, nullable in columns:
         quoted_name = f'"{column_name.lower()}"'
-        columns_sql.append(f"  {quoted_name} {sql_type}")
+        columns_sql.append(f"  {quoted_name} {sql_type}{'' if nullable else ' NOT NULL'}")
+    columns_sql.append('  "creation_timestamp" TIMESTAMPTZ DEFAULT NOW() NOT NULL')
 
     sql_script = f"CREATE TABLE \"{table_name}\" (\n"
-    sql_script += " NOT NULL,\n".join(columns_sql)
-    sql_script += ',\n  "creation_timestamp" TIMESTAMPTZ DEFAULT NOW() NOT NULL'
+    sql_script += ",\n".join(columns_sql)
     sql_script += "\n);"
 
-    return sql_script
\ No newline at end of file
+    return sql_script
+
+# --- DDL from a data_profile.py profile ---
+def record_path_of(profile):
+    """
+    Path of the records in a profile: the array item path with the most scalar children,
+    e.g. '$[*]' or '$[*].PlayerStats[*]'.
+    """
+    best, best_count = None, -1
+    for path in profile:
+        if not path.endswith('[*]'):
+            continue
+        children = len(profile_columns(profile, path))
+        if children > best_count:
+            best, best_count = path, children
+    return best
+
+def profile_columns(profile, record_path):
+    """{column: stats} of the direct children of `record_path` in the profile."""
+    prefix = f"{record_path}."
+    return {
+        path[len(prefix):]: stats for path, stats in profile.items()
+        if path.startswith(prefix) and not re.search(r'[.\[]', path[len(prefix):])
+    }
+
+def profile_to_postgres_type(stats):
+    """Postgres type of one profiled column from its types, numeric_stats and string_stats."""
+    types = {t for t, c in stats.get('types', {}).items() if c and t != 'NoneType'}
+    numeric = stats.get('numeric_stats') or {}
+    string = stats.get('string_stats') or {}
+    if not types:
+        return "TEXT"
+    if types == {'bool'}:
+        return "BOOLEAN"
+    if types == {'int'}:
+        return integer_type(numeric.get('min'), numeric.get('max'))
+    if types <= {'int', 'float'}:
+        return float_type(numeric.get('min'), numeric.get('max'))
+    if types == {'str'}:
+        return string_type(string.get('min_length'), string.get('max_length'))
+    if types <= {'list', 'dict'}:
+        return "JSONB"
+    return "TEXT"
+
+def profile_nullable(stats, record_count):
+    """Nullable when nulls were seen or the key is missing from some records."""
+    if stats.get('null_percentage', 0) > 0:
+        return True
+    return record_count is not None and stats.get('count', 0) < record_count
+
+def create_postgres_sql_from_profile(profile, table_name, record_path=None):
+    """
+    Generates a PostgreSQL CREATE TABLE script from a data_profile.py profile
+    (e.g. boxscore_profile.json): integer width from min/max, REAL or DOUBLE PRECISION,
+    CHAR(n) / VARCHAR(n) from string lengths and NOT NULL only on columns without nulls.
+
+    Args:
+        profile (dict or str): Profile, or the path of its JSON file.
+        table_name (str): The desired name for the PostgreSQL table.
+        record_path (str): Profile path of the records, detected when None.
+    """
+    if isinstance(profile, str):
+        with open(profile, 'r', encoding='utf-8') as f1:
+            profile = json.load(f1)
+    if not table_name or not isinstance(table_name, str):
+         raise ValueError("Table name must be a non-empty string")
+    record_path = record_path or record_path_of(profile)
+    if record_path is None or record_path not in profile:
+        raise ValueError("No record array found in the profile")
+
+    record_count = profile[record_path].get('count')
+    columns = [
+        (column, profile_to_postgres_type(stats), profile_nullable(stats, record_count))
+        for column, stats in profile_columns(profile, record_path).items()
+    ]
+    return create_table_sql(table_name, columns)
+
+# --- Season partitioned tables ---
+# Composite indexes for the usual lookups: a player's games by date, one game, a team's season
+PLAYER_STATS_INDEXES = [
+    ('player_id', 'game_date'),
+    ('game_id',),
+    ('team_id', 'season_year'),
+]
+
+def season_year(season):
+    """2024 -> '2024-25', the season_year value of the stats rows."""
+    return f"{str(season)}-{str(season +1)[-2:]}"
+
+def _quote(name, quoted):
+    return f'"{name}"' if quoted else name
+
+def partition_name(table_name, season):
+    """Name of the partition of one season: playerstatspergame_2024_25."""
+    return f"{table_name}_{str(season)}_{str(season +1)[-2:]}"
+
+def partition_bound_sql(season, strategy='list'):
+    if strategy == 'list':
+        return f"FOR VALUES IN ('{season_year(season)}')"
+    if strategy == 'range':
+        return f"FOR VALUES FROM ('{season_year(season)}') TO ('{season_year(season + 1)}')"
+    raise ValueError(f"Unsupported partition strategy: {strategy}")
+
+def partition_sql(table_name, season, strategy='list', quoted=False):
+    """CREATE TABLE of the partition of one season."""
+    return (f"CREATE TABLE IF NOT EXISTS {_quote(partition_name(table_name, season), quoted)} "
+            f"PARTITION OF {_quote(table_name, quoted)} {partition_bound_sql(season, strategy)};")
+
+def index_sql(table_name, indexes=PLAYER_STATS_INDEXES, quoted=False):
+    """CREATE INDEX statements, on the parent so every partition gets them."""
+    statements = []
+    for columns in indexes:
+        name = f"idx_{table_name.lower()}_{'_'.join(columns)}"
+        column_list = ', '.join(f'"{i}"' for i in columns)
+        statements.append(f"CREATE INDEX IF NOT EXISTS {name} ON {_quote(table_name, quoted)} ({column_list});")
+    return statements
+
+def create_partitioned_sql(create_script, partition_key='season_year', from_season=1983, to_season=2024,
+                           strategy='list', indexes=PLAYER_STATS_INDEXES, default_partition=True):
+    """
+    Turns a CREATE TABLE script (scan_df output or sql/postgres) into a table partitioned
+    by season: PARTITION BY LIST / RANGE (season_year), one partition per season, an optional
+    DEFAULT partition for rows of unknown seasons, and the indexes on the parent.
+
+    Partitions can be detached and attached on their own (see utilities/pg_loader.py), so
+    reloading the current season never rewrites or re-indexes the others.
+    """
+    from utilities.sql_schema import parse_create_table
+
+    schema = parse_create_table(create_script)[0]
+    quoted = schema['identifier'].startswith('"')
+    table_name = schema['table'] if quoted else schema['table'].lower()
+    if partition_key not in {i['name'] for i in schema['columns']}:
+        raise ValueError(f"{table_name} has no {partition_key} column")
+
+    parent = re.sub(r'\n\s*\)\s*;\s*$', f"\n) PARTITION BY {strategy.upper()} ({partition_key});",
+                    schema['sql'].rstrip())
+    statements = [parent, '']
+    statements += [partition_sql(table_name, season, strategy, quoted) for season in range(from_season, to_season + 1)]
+    if default_partition:
+        statements.append(f"CREATE TABLE IF NOT EXISTS {_quote(f'{table_name}_default', quoted)} "
+                          f"PARTITION OF {_quote(table_name, quoted)} DEFAULT;")
+    statements.append('')
+    statements += index_sql(table_name, indexes, quoted)
+    return '\n'.join(statements) + '\n'
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a CREATE TABLE script from a data_profile.py profile.")
+    parser.add_argument("-p", "--profile", help="Path to the profile JSON file (e.g. boxscore_profile.json).")
+    parser.add_argument("-t", "--table", help="Table name.")
+    parser.add_argument("--record_path", default=None, help="Profile path of the records, e.g. '$[*].PlayerStats[*]'.")
+    parser.add_argument("-o", "--output", default=None, help="Path of the .sql file, printed when omitted.")
+    parser.add_argument("--partition", choices=["list", "range"], default=None,
+                        help="Partition the table by season_year, with the player stats indexes.")
+    parser.add_argument("--from_season", type=int, default=1983)
+    parser.add_argument("--to_season", type=int, default=2024)
+    args = parser.parse_args()
+
+    sql_script = create_postgres_sql_from_profile(args.profile, args.table, args.record_path)
+    if args.partition:
+        sql_script = create_partitioned_sql(sql_script, from_season=args.from_season, to_season=args.to_season,
+                                            strategy=args.partition)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f1:
+            f1.write(sql_script)
+    else:
+        print(sql_script)
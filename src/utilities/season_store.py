@@ -0,0 +1,383 @@
+import json
+import os
+import sqlite3
+import time
+
+from utils import content_hash
+from utilities import serializer
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+    Season partitioned, append-only record store
+
+    <root>/<table>/<season>.ndjson   one JSON record per line
+    <root>/<table>/_index.sqlite     GAME_ID -> season partition, content hash
+
+    Adding games only appends to the partition of their season and
+    inserts their GAME_IDs in the index, so an update costs the size
+    of the delta instead of the whole history.
+
+    Each game keeps the content hash of its records. upsert() rewrites
+    only the partitions holding games whose hash changed (stat
+    corrections), and changed_since() lets downstream loads pick up
+    exactly those games.
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+
+
+# Fields giving the rows of one game a stable order, whatever order the API listed them in
+ROW_ORDER_FIELDS = ('TEAM_ID', 'PLAYER_ID')
+
+
+def _row_order(row):
+    return tuple(str(row.get(i, '')) for i in ROW_ORDER_FIELDS) \
+        + (json.dumps(row, sort_keys=True, ensure_ascii=False),)
+
+
+def _ordered(value):
+    """Lists of row dicts sorted on ROW_ORDER_FIELDS, at any depth (the box score tables of a record)."""
+    if isinstance(value, dict):
+        return {k: _ordered(v) for k, v in value.items()}
+    if isinstance(value, list):
+        value = [_ordered(i) for i in value]
+        if value and all(isinstance(i, dict) for i in value):
+            value.sort(key=_row_order)
+        return value
+    return value
+
+
+def game_hash(game_records):
+    """Content hash of the records of one game, the same for a reordered response."""
+    return content_hash(_ordered(game_records))
+
+
+def season_of_game_id(game_id):
+    """'0022400123' -> '2024_25'. GAME_ID: 00 + season type + 2 digit season year + game number."""
+    year = int(str(game_id)[3:5])
+    year = 1900 + year if year >= 46 else 2000 + year
+    return f"{str(year)}_{str(year +1)[-2:]}"
+
+
+class SeasonStore():
+    """
+    Args:
+        root (str): Folder holding one sub folder per table.
+        table (str): Table name, e.g. 'full_player_stats'.
+        key (str): Field holding the GAME_ID of a record.
+    """
+    def __init__(self, root, table, key='GAME_ID'):
+        self.root = root
+        self.table = table
+        self.key = key
+        self.table_dir = os.path.join(root, table)
+        os.makedirs(self.table_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(self.table_dir, '_index.sqlite'), isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS game (
+                game_id TEXT PRIMARY KEY,
+                season TEXT NOT NULL,
+                rows INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_game_season ON game (season);
+            CREATE TABLE IF NOT EXISTS season_import (
+                season TEXT PRIMARY KEY,
+                games INTEGER NOT NULL,
+                imported_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        ''')
+        columns = {i[1] for i in self._conn.execute('PRAGMA table_info(game)').fetchall()}
+        if 'content_hash' not in columns:
+            # Index written before content hashes were kept
+            self._conn.execute('ALTER TABLE game ADD COLUMN content_hash TEXT')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_game_updated ON game (updated_at)')
+
+    def close(self):
+        self._conn.close()
+
+    def partition_path(self, season):
+        return os.path.join(self.table_dir, f'{season}.ndjson')
+
+    def seasons(self):
+        return sorted(i[0] for i in self._conn.execute('SELECT DISTINCT season FROM game').fetchall())
+
+    def count(self):
+        return self._conn.execute('SELECT COUNT(*) FROM game').fetchone()[0]
+
+    def has(self, game_id):
+        return self._conn.execute('SELECT 1 FROM game WHERE game_id = ?', (game_id,)).fetchone() is not None
+
+    def missing(self, game_ids):
+        """game_ids (in order) not in the store yet."""
+        game_ids = list(game_ids)
+        present = set()
+        for start in range(0, len(game_ids), 900):
+            chunk = game_ids[start:start + 900]
+            rows = self._conn.execute(
+                f"SELECT game_id FROM game WHERE game_id IN ({','.join('?' * len(chunk))})",
+                chunk
+            ).fetchall()
+            present.update(i[0] for i in rows)
+        return [i for i in game_ids if i not in present]
+
+    def hashes(self, game_ids):
+        """{game_id: content hash} of the stored games among game_ids."""
+        game_ids = list(game_ids)
+        result = {}
+        for start in range(0, len(game_ids), 900):
+            chunk = game_ids[start:start + 900]
+            rows = self._conn.execute(
+                f"SELECT game_id, content_hash FROM game WHERE game_id IN ({','.join('?' * len(chunk))})",
+                chunk
+            ).fetchall()
+            result.update(rows)
+        return result
+
+    def changed_since(self, timestamp):
+        """GAME_IDs added or rewritten after `timestamp` (time.time()), for downstream loads."""
+        return [i[0] for i in self._conn.execute(
+            'SELECT game_id FROM game WHERE updated_at > ? ORDER BY updated_at', (timestamp,)
+        ).fetchall()]
+
+    def _group(self, records, season_of):
+        season_of = season_of or (lambda record: season_of_game_id(record[self.key]))
+        by_game = {}
+        for record in records:
+            by_game.setdefault(record[self.key], []).append(record)
+        return by_game, season_of
+
+    def append(self, records, season_of=None):
+        """
+        Appends records of games not in the store yet, grouped into their season partition.
+        Records of a GAME_ID already stored are skipped.
+
+        Args:
+            records (iterable): Record dicts holding `self.key`.
+            season_of (callable): record -> partition name, defaults to the season of its GAME_ID.
+
+        Returns:
+            dict: Number of new games per season.
+        """
+        by_game, season_of = self._group(records, season_of)
+        by_season = {}
+        for game_id in self.missing(by_game):
+            game_records = by_game[game_id]
+            by_season.setdefault(season_of(game_records[0]), []).append((game_id, game_records))
+
+        added = {}
+        for season, games in by_season.items():
+            self._append_games(season, games)
+            added[season] = len(games)
+        return added
+
+    def upsert(self, records, season_of=None):
+        """
+        Appends new games and replaces stored games whose content hash changed.
+        Games with the same hash are left untouched.
+
+        Returns:
+            dict: {'added': [game_id], 'changed': [game_id]}
+        """
+        by_game, season_of = self._group(records, season_of)
+        stored = self.hashes(by_game)
+
+        new_by_season = {}
+        changed_by_season = {}
+        for game_id, game_records in by_game.items():
+            if game_id not in stored:
+                new_by_season.setdefault(season_of(game_records[0]), []).append((game_id, game_records))
+            elif stored[game_id] != game_hash(game_records):
+                changed_by_season.setdefault(self._season_of_stored(game_id), []).append((game_id, game_records))
+
+        for season, games in new_by_season.items():
+            self._append_games(season, games)
+        for season, games in changed_by_season.items():
+            self._replace_games(season, games)
+
+        return {
+            'added': [game_id for games in new_by_season.values() for game_id, _ in games],
+            'changed': [game_id for games in changed_by_season.values() for game_id, _ in games],
+        }
+
+    def _season_of_stored(self, game_id):
+        return self._conn.execute('SELECT season FROM game WHERE game_id = ?', (game_id,)).fetchone()[0]
+
+    def _index_rows(self, season, games):
+        now = time.time()
+        return [(game_id, season, len(game_records), now, game_hash(game_records))
+                for game_id, game_records in games]
+
+    def _append_games(self, season, games):
+        with open(self.partition_path(season), 'a', encoding='utf-8') as f1:
+            start = f1.tell()
+            try:
+                for _, game_records in games:
+                    for record in game_records:
+                        f1.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+                        f1.write('\n')
+                f1.flush()
+                self._conn.execute('BEGIN')
+                self._conn.executemany(
+                    'INSERT INTO game (game_id, season, rows, updated_at, content_hash) VALUES (?, ?, ?, ?, ?)',
+                    self._index_rows(season, games)
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                # Drop the half written lines so the partition matches the index
+                if self._conn.in_transaction:
+                    self._conn.execute('ROLLBACK')
+                f1.truncate(start)
+                raise
+
+    def _replace_games(self, season, games):
+        """Rewrites one partition without the old records of `games`, then appends their new records."""
+        replaced = {game_id for game_id, _ in games}
+        path = self.partition_path(season)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as out:
+            for record in self.iter_season(season):
+                if record[self.key] not in replaced:
+                    out.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+                    out.write('\n')
+            for _, game_records in games:
+                for record in game_records:
+                    out.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+                    out.write('\n')
+        self._conn.execute('BEGIN')
+        try:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO game (game_id, season, rows, updated_at, content_hash) VALUES (?, ?, ?, ?, ?)',
+                self._index_rows(season, games)
+            )
+            os.replace(tmp_path, path)
+            self._conn.execute('COMMIT')
+        except Exception:
+            # The partition is left as it was, so is the index
+            if self._conn.in_transaction:
+                self._conn.execute('ROLLBACK')
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def iter_season(self, season):
+        path = self.partition_path(season)
+        if not os.path.isfile(path):
+            return
+        with open(path, 'r', encoding='utf-8') as f1:
+            for line in f1:
+                if line.strip():
+                    yield json.loads(line)
+
+    def iter_all(self):
+        for season in self.seasons():
+            yield from self.iter_season(season)
+
+    def write_combined(self, output_file, fmt=None, compression=None):
+        """
+        Writes the whole store as one combined file (the old full_json layout), one record at a time.
+        fmt and compression default to those of output_file's extension (serializer.path_format),
+        so rewriting the file the store was migrated from keeps its format. Returns the number of records.
+        """
+        path_fmt, path_compression = serializer.path_format(output_file)
+        return serializer.write_records(output_file, self.iter_all(), fmt or path_fmt, compression or path_compression)
+
+    def _meta(self, key):
+        row = self._conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self._conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    def imported_seasons(self):
+        """Seasons of the combined file already migrated, partition and index."""
+        return {i[0] for i in self._conn.execute('SELECT season FROM season_import').fetchall()}
+
+    def _adopt_legacy_import(self):
+        """
+        Stores migrated before season_import existed: seasons in the index were imported
+        in one transaction each. Returns True when every partition on disk is indexed.
+        """
+        indexed = set(self.seasons())
+        now = time.time()
+        self._conn.execute('BEGIN')
+        self._conn.executemany(
+            'INSERT OR IGNORE INTO season_import (season, games, imported_at) VALUES (?, ?, ?)',
+            [(season, games, now) for season, games in self._conn.execute(
+                'SELECT season, COUNT(*) FROM game GROUP BY season').fetchall()]
+        )
+        self._conn.execute('COMMIT')
+        on_disk = {i[:-len('.ndjson')] for i in os.listdir(self.table_dir) if i.endswith('.ndjson')}
+        return on_disk <= indexed
+
+    def import_combined(self, combined_file, season_of=None):
+        """
+        Migration of a combined full_json file (JSON or NDJSON, optionally compressed) into the store.
+
+        The file is streamed: each record is appended to its season partition as it is read,
+        then the index is built one partition at a time, so memory stays at about one season.
+        A season is recorded in season_import with its index rows, in one transaction. A
+        migration that stopped halfway is resumed on the next call: the seasons not recorded
+        yet are written again, the others are skipped.
+
+        Returns:
+            dict: Number of games imported per season by this call.
+        """
+        if self._meta('combined_import') or combined_file is None or not os.path.isfile(combined_file):
+            return {}
+        if self.count() > 0 and not self.imported_seasons() and self._adopt_legacy_import():
+            self._set_meta('combined_import', combined_file)
+            return {}
+        done = self.imported_seasons()
+        season_of = season_of or (lambda record: season_of_game_id(record[self.key]))
+        partitions = {}
+        try:
+            for record in serializer.iter_json(combined_file):
+                season = season_of(record)
+                if season in done:
+                    continue
+                if season not in partitions:
+                    partitions[season] = open(self.partition_path(season), 'w', encoding='utf-8')
+                partitions[season].write(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+                partitions[season].write('\n')
+        finally:
+            for f1 in partitions.values():
+                f1.close()
+
+        imported = {}
+        for season in partitions:
+            by_game = {}
+            for record in self.iter_season(season):
+                by_game.setdefault(record[self.key], []).append(record)
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.execute('DELETE FROM game WHERE season = ?', (season,))
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO game (game_id, season, rows, updated_at, content_hash) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    self._index_rows(season, by_game.items())
+                )
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO season_import (season, games, imported_at) VALUES (?, ?, ?)',
+                    (season, len(by_game), time.time())
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            imported[season] = len(by_game)
+        self._set_meta('combined_import', combined_file)
+        return imported
+
+
+def unique_records(records, fields):
+    """Records without the repeats of an already seen `fields` value, first one kept."""
+    seen = set()
+    for record in records:
+        key = tuple(record[i] for i in fields)
+        if key not in seen:
+            seen.add(key)
+            yield record
@@ -0,0 +1,554 @@
+import gzip
+import io
+import json
+import math
+import os
+import re
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+    Serializer layer
+
+    fmt:          pretty  - JSON, indent=4 (the original layout)
+                  compact - JSON without whitespace
+                  ndjson  - one JSON record per line
+    compression:  None | gzip | zstd (needs `pip install zstandard`)
+
+    File names carry the format: .json / .ndjson, plus .gz / .zst.
+    Readers detect compression from the file's magic bytes and
+    NDJSON from the extension or the content, so any file written
+    here can be read back with load() / iter_records().
+
+    iter_json() / iter_batches() stream the items of a top-level array
+    (or of the array under a key, e.g. PlayerGameLogs) chunk by chunk,
+    so a multi GB combined file is never held in memory as a whole.
+
+    iter_events() is the same stream as parse events (start_map,
+    map_key, end_map, start_array, end_array, scalar), for readers
+    that walk any document shape without recursion. Values nested
+    deeper than STREAM_DEPTH (one record) come as a single `value`
+    event holding the decoded value; value_events() expands one.
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+
+FORMATS = ['pretty', 'compact', 'ndjson']
+COMPRESSIONS = [None, 'gzip', 'zstd']
+COMPRESSION_EXT = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+DATA_EXT = ['.json', '.ndjson']
+
+CHUNK_SIZE = 1024 * 1024
+BATCH_SIZE = 10000
+# iter_events(): containers above this depth are tokenized, deeper values decoded whole (one record).
+# A top-level array counts as one level, so its items are records too
+STREAM_DEPTH = 2
+
+START_MAP = 'start_map'
+MAP_KEY = 'map_key'
+END_MAP = 'end_map'
+START_ARRAY = 'start_array'
+END_ARRAY = 'end_array'
+SCALAR = 'scalar'
+VALUE = 'value'
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+
+def _check(fmt, compression):
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unsupported compression: {compression}")
+    if compression == 'zstd' and zstandard is None:
+        raise ImportError("zstd compression needs the 'zstandard' package: pip install zstandard")
+
+
+def file_extension(fmt='pretty', compression=None):
+    """'json', 'ndjson', 'json.gz', 'ndjson.zst', ..."""
+    ext = 'ndjson' if fmt == 'ndjson' else 'json'
+    return f'{ext}{COMPRESSION_EXT[compression]}'
+
+
+def split_extension(filename):
+    """'0022400001.json.gz' -> ('0022400001', '.json.gz'). ext is '' for non data files."""
+    stem = filename
+    compression_ext = ''
+    for ext in ('.gz', '.zst'):
+        if stem.lower().endswith(ext):
+            stem, compression_ext = stem[:-len(ext)], ext
+            break
+    for ext in DATA_EXT:
+        if stem.lower().endswith(ext):
+            return stem[:-len(ext)], ext + compression_ext
+    return filename, ''
+
+
+def path_format(path):
+    """(fmt, compression) a data file's extension stands for: '.json' a pretty JSON array, '.ndjson.gz' gzip NDJSON, ..."""
+    ext = split_extension(os.path.basename(path))[1]
+    fmt = 'ndjson' if ext.startswith('.ndjson') else 'pretty'
+    compression = next((c for c, e in COMPRESSION_EXT.items() if e and ext.endswith(e)), None)
+    return fmt, compression
+
+
+def is_data_file(filename):
+    return split_extension(filename)[1] != ''
+
+
+def find_data_file(base_path):
+    """Path of `base_path` + any data extension that exists, None when there is none."""
+    for ext in DATA_EXT:
+        for compression_ext in COMPRESSION_EXT.values():
+            path = f'{base_path}{ext}{compression_ext}'
+            if os.path.isfile(path):
+                return path
+    return None
+
+
+def list_data_files(path):
+    """`path` itself for a file, else every data file under the folder, sorted."""
+    if not os.path.isdir(path):
+        return [path]
+    files = []
+    for root, dirs, filenames in os.walk(path):
+        dirs.sort()
+        files += [os.path.join(root, i) for i in sorted(filenames) if is_data_file(i)]
+    return files
+
+
+def open_write(path, compression=None):
+    _check('compact', compression)
+    if compression == 'gzip':
+        return gzip.open(path, 'wt', encoding='utf-8')
+    if compression == 'zstd':
+        raw = open(path, 'wb')
+        return io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(raw, closefd=True), encoding='utf-8')
+    return open(path, 'w', encoding='utf-8')
+
+
+def detect_compression(path):
+    with open(path, 'rb') as f1:
+        head = f1.read(4)
+    if head.startswith(GZIP_MAGIC):
+        return 'gzip'
+    if head == ZSTD_MAGIC:
+        return 'zstd'
+    return None
+
+
+def open_read(path):
+    """Text stream of a data file, decompressed when needed."""
+    compression = detect_compression(path)
+    if compression == 'gzip':
+        return gzip.open(path, 'rt', encoding='utf-8')
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ImportError(f"{path} is zstd compressed, install 'zstandard' to read it")
+        raw = open(path, 'rb')
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(raw, closefd=True), encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+def dumps(obj, fmt='pretty'):
+    if fmt == 'pretty':
+        return json.dumps(obj, indent=4, ensure_ascii=False)
+    if fmt == 'compact':
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+    if fmt == 'ndjson':
+        records = obj if isinstance(obj, list) else [obj]
+        return ''.join(json.dumps(i, ensure_ascii=False, separators=(',', ':')) + '\n' for i in records)
+    raise ValueError(f"Unsupported format: {fmt}")
+
+
+def dump(obj, path, fmt='pretty', compression=None):
+    """Writes `obj` to `path` in one go. A list written as ndjson becomes one line per item."""
+    _check(fmt, compression)
+    with open_write(path, compression) as f1:
+        f1.write(dumps(obj, fmt))
+    return path
+
+
+class RecordWriter():
+    """
+    Writes records one at a time: as a JSON array ('pretty' / 'compact') or one record
+    per line ('ndjson'), optionally compressed. Output goes to a temporary file that
+    replaces `output_file` on close(), so a failed write never leaves a truncated file.
+    """
+    def __init__(self, output_file, fmt='pretty', compression=None):
+        _check(fmt, compression)
+        self.output_file = output_file
+        self.fmt = fmt
+        self.count = 0
+        self._tmp_file = f'{output_file}.tmp'
+        if os.path.dirname(output_file):
+            os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        self._f = open_write(self._tmp_file, compression)
+        if self.fmt != 'ndjson':
+            self._f.write('[')
+
+    def write(self, record):
+        if self.fmt == 'ndjson':
+            self._f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+            self._f.write('\n')
+        else:
+            if self.count:
+                self._f.write(',')
+            if self.fmt == 'pretty':
+                self._f.write('\n')
+                self._f.write(json.dumps(record, indent=4, ensure_ascii=False))
+            else:
+                self._f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+        self.count += 1
+
+    def close(self):
+        if self.fmt != 'ndjson':
+            self._f.write('\n]' if self.fmt == 'pretty' else ']')
+        self._f.close()
+        os.replace(self._tmp_file, self.output_file)
+
+    def discard(self):
+        self._f.close()
+        os.remove(self._tmp_file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+def write_records(path, records, fmt='ndjson', compression=None):
+    """Streams an iterator of records to `path`. Returns the number written."""
+    with RecordWriter(path, fmt, compression) as writer:
+        for record in records:
+            writer.write(record)
+    return writer.count
+
+
+def is_ndjson(path):
+    stem, ext = split_extension(os.path.basename(path))
+    return ext.startswith('.ndjson')
+
+
+def iter_ndjson(path, start=0, end=None):
+    """
+    Records of an NDJSON file. With `start` / `end` (byte offsets of line starts, uncompressed
+    files only) the lines in between: the part of a file appended to since an earlier read.
+    """
+    if not start and end is None:
+        with open_read(path) as f1:
+            for line in f1:
+                if line.strip():
+                    yield json.loads(line)
+        return
+    with open(path, 'rb') as f1:
+        f1.seek(start)
+        position = start
+        for line in f1:
+            position += len(line)
+            if end is not None and position > end:
+                break
+            if line.strip():
+                yield json.loads(line)
+
+
+def ndjson_end(path, size=None):
+    """Byte offset after the last complete line (ending with a newline) of an uncompressed NDJSON file."""
+    position = os.path.getsize(path) if size is None else size
+    with open(path, 'rb') as f1:
+        while position > 0:
+            step = min(CHUNK_SIZE, position)
+            f1.seek(position - step)
+            newline = f1.read(step).rfind(b'\n')
+            if newline >= 0:
+                return position - step + newline + 1
+            position -= step
+    return 0
+
+
+def load(path):
+    """
+    Reads any file written by this module (or plain JSON). NDJSON comes back as a list.
+    """
+    if is_ndjson(path):
+        return list(iter_ndjson(path))
+    with open_read(path) as f1:
+        contents = f1.read()
+    try:
+        return json.loads(contents)
+    except json.JSONDecodeError as e:
+        # NDJSON saved under a .json name
+        if e.msg != 'Extra data':
+            raise
+        return [json.loads(line) for line in contents.splitlines() if line.strip()]
+
+
+class _JsonStream():
+    """Decodes JSON values one at a time from a text stream read in chunks of `chunk_size` characters."""
+    WHITESPACE = re.compile(r'[ \t\n\r]*')
+    NUMBER_TAIL = re.compile(r'[0-9.eE+\-]*')
+
+    def __init__(self, f1, chunk_size=CHUNK_SIZE):
+        self._f = f1
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        """Reads the next chunk, dropping what was already parsed. False at end of file."""
+        if self._eof:
+            return False
+        chunk = self._f.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self):
+        """Next non whitespace character, '' at end of file."""
+        while True:
+            self._pos = self.WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", self._buf, self._pos)
+        self._pos += 1
+
+    def decode(self):
+        """Next JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                # The value runs past the end of the buffer
+                if self._fill():
+                    continue
+                raise
+            if not self._eof and self.NUMBER_TAIL.match(self._buf, end).end() == len(self._buf) and self._fill():
+                # A number at the end of the buffer may continue in the next chunk ('2.' + '5')
+                continue
+            self._pos = end
+            return value
+
+    def iter_array(self):
+        """Items of the array starting at the current position."""
+        self.expect('[')
+        if self.peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self.decode()
+            char = self.peek()
+            self._pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                raise json.JSONDecodeError("Expecting ',' delimiter", self._buf, self._pos - 1)
+
+    def events(self, stream_depth=STREAM_DEPTH, depth=0):
+        """
+        Parse events of the value at the current position, `depth` levels below the root.
+        Containers are tokenized with an explicit stack, so nesting has no recursion limit.
+        """
+        # Closing character of every open container
+        open_chars = []
+        while True:
+            char = self.peek()
+            if char and char in '{[' and depth + len(open_chars) < stream_depth:
+                self._pos += 1
+                close = '}' if char == '{' else ']'
+                yield (START_MAP if char == '{' else START_ARRAY), None
+                if self.peek() != close:
+                    open_chars.append(close)
+                    if close == '}':
+                        yield MAP_KEY, self.decode()
+                        self.expect(':')
+                    continue
+                self._pos += 1
+                yield (END_MAP if close == '}' else END_ARRAY), None
+            elif char and char in '{[':
+                try:
+                    value = self.decode()
+                except RecursionError:
+                    # Nested too deep for the json decoder, tokenize the rest instead
+                    stream_depth = math.inf
+                    continue
+                yield VALUE, value
+            else:
+                yield SCALAR, self.decode()
+
+            # After a value: close the containers it ends, or move on to the next item
+            while open_chars:
+                next_char = self.peek()
+                self._pos += 1
+                if next_char == ',':
+                    if open_chars[-1] == '}':
+                        yield MAP_KEY, self.decode()
+                        self.expect(':')
+                    break
+                if next_char != open_chars[-1]:
+                    raise json.JSONDecodeError(f"Expecting ',' or '{open_chars[-1]}'", self._buf, self._pos - 1)
+                open_chars.pop()
+                yield (END_MAP if next_char == '}' else END_ARRAY), None
+            if not open_chars:
+                return
+
+    def seek_key(self, key):
+        """Moves to the value of `key` in the top-level object, skipping the values before it."""
+        self.expect('{')
+        while self.peek() != '}':
+            name = self.decode()
+            self.expect(':')
+            if name == key:
+                return True
+            self.decode()
+            if self.peek() == ',':
+                self._pos += 1
+        return False
+
+
+def iter_json(path, key=None, chunk_size=CHUNK_SIZE):
+    """
+    Streams the records of a data file without loading the whole document.
+
+    Args:
+        path (str): JSON or NDJSON file, optionally compressed.
+        key (str): Stream the array under this top-level key (e.g. 'PlayerGameLogs')
+            instead of a top-level array. Ignored for NDJSON, whose lines are the records.
+        chunk_size (int): Characters read at a time.
+
+    Yields:
+        Items of the array, lines of NDJSON, or the document itself when it is
+        neither (several concatenated documents are yielded one by one).
+    """
+    if is_ndjson(path):
+        yield from iter_ndjson(path)
+        return
+    with open_read(path) as f1:
+        stream = _JsonStream(f1, chunk_size)
+        if key is not None:
+            if not stream.seek_key(key):
+                raise KeyError(f"{key} not found in {path}")
+            if stream.peek() == '[':
+                yield from stream.iter_array()
+            else:
+                yield stream.decode()
+            return
+        if stream.peek() == '[':
+            yield from stream.iter_array()
+            return
+        while stream.peek():
+            yield stream.decode()
+
+
+_END = object()
+
+
+def value_events(value):
+    """Parse events of an already decoded value, in document order, walked with an explicit stack."""
+    # (is_map, items, end event)
+    stack = [(False, iter((value,)), None)]
+    while stack:
+        is_map, items, end = stack[-1]
+        item = next(items, _END)
+        if item is _END:
+            stack.pop()
+            if end is not None:
+                yield end, None
+            continue
+        if is_map:
+            yield MAP_KEY, item[0]
+            item = item[1]
+        if isinstance(item, dict):
+            yield START_MAP, None
+            stack.append((True, iter(item.items()), END_MAP))
+        elif isinstance(item, list):
+            yield START_ARRAY, None
+            stack.append((False, iter(item), END_ARRAY))
+        else:
+            yield SCALAR, item
+
+
+def iter_events(path, key=None, chunk_size=CHUNK_SIZE, stream_depth=STREAM_DEPTH, start=0, end=None):
+    """
+    Streams a data file as (event, value) parse events. Values `stream_depth` levels
+    down are decoded at once and yielded as one VALUE event, so memory stays at about
+    one record whatever the file size. A top-level array counts as the first level,
+    like the object holding an array under a key: its items (the records) are VALUE
+    events, as are the items of an array under a top-level key, e.g.
+        [{"a": 1}]            start_array, value {"a": 1}, end_array
+        {"k": [{"a": 1}]}     start_map, map_key k, start_array, value {"a": 1}, end_array, end_map
+
+    Args:
+        key (str): Only the events of this top-level key (e.g. 'PlayerGameLogs'), inside its
+            object: start_map, map_key <key>, <value events>, end_map.
+
+    NDJSON is streamed as an array of its lines, from byte offset `start` to `end` when
+    given (see iter_ndjson). From a `start` past 0 the array is left open: its new items
+    are added, the array itself was counted by the read that started it.
+    """
+    if is_ndjson(path):
+        yield START_ARRAY, None
+        for record in iter_ndjson(path, start, end):
+            yield VALUE, record
+        if not start:
+            yield END_ARRAY, None
+        return
+    with open_read(path) as f1:
+        stream = _JsonStream(f1, chunk_size)
+        if key is not None:
+            if not stream.seek_key(key):
+                raise KeyError(f"{key} not found in {path}")
+            yield START_MAP, None
+            yield MAP_KEY, key
+            yield from stream.events(stream_depth, 1)
+            yield END_MAP, None
+            return
+        while stream.peek():
+            yield from stream.events(stream_depth, 1 if stream.peek() == '[' else 0)
+
+
+def first_char(path):
+    """First non whitespace character of a JSON file: '[' for a top-level array, '{' for an object."""
+    if is_ndjson(path):
+        return '{'
+    with open_read(path) as f1:
+        return _JsonStream(f1, 4096).peek()
+
+
+def batched(records, batch_size=BATCH_SIZE):
+    """Groups an iterable into lists of `batch_size` items (the last one may be shorter)."""
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_batches(path, batch_size=BATCH_SIZE, key=None, chunk_size=CHUNK_SIZE):
+    """iter_json() in lists of `batch_size` records."""
+    yield from batched(iter_json(path, key, chunk_size), batch_size)
+
+
+def iter_records(path, key=None):
+    """Records of a data file: lines of NDJSON, items of a JSON array, or the document itself."""
+    yield from iter_json(path, key)
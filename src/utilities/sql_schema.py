@@ -0,0 +1,74 @@
+import os
+import re
+
+from constant import SQL_SCHEMA_DIR
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+    CREATE TABLE scripts of sql/postgres as column lists
+
+    parse_create_table('CREATE TABLE "team" ("id" INT PRIMARY KEY NOT NULL, ...)')
+        -> {'table': 'team', 'identifier': '"team"', 'sql': <the statement>,
+            'columns': [{'name': 'id', 'type': 'INT', 'not_null': True, 'primary_key': True}, ...]}
+
+    Only the subset of the grammar used by the scripts of this repo
+    is handled: one column per line, optional quotes.
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+
+CREATE_TABLE = re.compile(r'CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?"?([\w.]+)"?\s*\((.*?)\n\s*\)\s*(?:PARTITION\s+BY[^;]*)?;',
+                          re.IGNORECASE | re.DOTALL)
+COLUMN = re.compile(r'^\s*"?(\w+)"?\s+([A-Z]+(?:\s+PRECISION)?(?:\s*\(\s*\d+(?:\s*,\s*\d+)?\s*\))?)(.*?),?\s*$',
+                    re.IGNORECASE)
+CONSTRAINT_WORDS = ('PRIMARY', 'CONSTRAINT', 'UNIQUE', 'FOREIGN', 'CHECK')
+
+
+def parse_create_table(sql_text):
+    """Schemas of every CREATE TABLE in `sql_text`, in order."""
+    schemas = []
+    for match in CREATE_TABLE.finditer(sql_text):
+        columns = []
+        for line in match.group(2).splitlines():
+            line = line.split('--')[0]
+            if not line.strip() or line.strip().upper().startswith(CONSTRAINT_WORDS):
+                continue
+            column = COLUMN.match(line)
+            if column is None:
+                continue
+            name, sql_type, rest = column.groups()
+            columns.append({
+                'name': name.lower(),
+                'type': ' '.join(sql_type.upper().split()),
+                'not_null': 'NOT NULL' in rest.upper() or 'PRIMARY KEY' in rest.upper(),
+                'primary_key': 'PRIMARY KEY' in rest.upper(),
+            })
+        schemas.append({
+            'table': match.group(1),
+            # Unquoted names are folded to lower case by Postgres
+            'identifier': f'"{match.group(1)}"' if f'"{match.group(1)}"' in match.group(0) else match.group(1).lower(),
+            'columns': columns,
+            'sql': match.group(0),
+        })
+    return schemas
+
+
+def load_schemas(schema_dir=SQL_SCHEMA_DIR):
+    """{table name (lower case): schema} of every .sql file in `schema_dir`."""
+    schemas = {}
+    if not os.path.isdir(schema_dir):
+        return schemas
+    for filename in sorted(os.listdir(schema_dir)):
+        if not filename.lower().endswith('.sql'):
+            continue
+        with open(os.path.join(schema_dir, filename), 'r', encoding='utf-8') as f1:
+            for schema in parse_create_table(f1.read()):
+                schema['file'] = filename
+                schemas[schema['table'].lower()] = schema
+    return schemas
+
+
+def column_types(table, schema_dir=SQL_SCHEMA_DIR):
+    """{column (lower case): SQL type} of `table`, empty when no script defines it."""
+    schema = load_schemas(schema_dir).get(table.lower())
+    if schema is None:
+        return {}
+    return {i['name']: i['type'] for i in schema['columns']}
@@ -1,20 +1,25 @@
 import functools
+import hashlib
 import json
 from pathlib import Path
 import logging
 import os
 import unicodedata
+import random
 import time
 from datetime import datetime
 import pandas as pd
 import requests
 
+from utilities import serializer
+
+logger = logging.getLogger(__name__)
+
 def clean_utf8(x):
     return unicodedata.normalize('NFD',x).encode('ascii', 'ignore')
 
 def get_data_sample(file, sample_size=10):
-    with open(file, 'r',encoding='utf-8') as f1:
-        temp = json.load(f1)
+    temp = serializer.load(file)
     result = []
     sample_count = 0
     for table in temp:
@@ -30,43 +35,111 @@ def get_data_sample(file, sample_size=10):
         )
 
 
-def retry(max_retries=3, delay=1, exceptions=(Exception,)):
-    """Decorator to retry a function call."""
+def retry(max_retries=3, delay=1, exceptions=(Exception,), backoff=2, max_delay=60, jitter=True,
+          stats=None, breaker=None, max_retry_after=None):
+    """
+    Decorator to retry a function call with exponential backoff.
+
+    Args:
+        max_retries (int): Total number of attempts.
+        delay (float): Base wait after the first failure.
+        exceptions (tuple): Exceptions that trigger a retry, anything else is raised at once.
+        backoff (float): Multiplier applied to the wait after each failure.
+        max_delay (float): Upper bound of a single wait.
+        jitter (bool): Wait a random time in [0, computed wait] ("full jitter") so workers don't retry in lockstep.
+        stats: Optional counter object with record_attempt / record_wait / record_failure / record_success.
+        breaker: Optional circuit breaker with before_call / record_success / record_failure.
+        max_retry_after (float): Upper bound of a wait asked by the server, None for no bound.
+
+    An exception carrying a `retry_after` attribute (seconds) is waited at least that long,
+    past max_delay: coming back earlier than the server asked only gets throttled again.
+    """
     def decorator_retry(func):
         @functools.wraps(func) # Preserves original function metadata
         def wrapper_retry(*args, **kwargs):
             last_exception = None
             for attempt in range(max_retries):
+                if breaker is not None:
+                    breaker.before_call()
+                if stats is not None:
+                    stats.record_attempt()
                 try:
-                    print(f"Decorator: Attempt {attempt + 1}/{max_retries} for {func.__name__}")
-                    return func(*args, **kwargs) # Call the decorated function
+                    result = func(*args, **kwargs) # Call the decorated function
                 except exceptions as e: # Catch only specified exceptions
-                    print(f"Decorator: Attempt {attempt + 1} failed: {e}")
                     last_exception = e
+                    if breaker is not None:
+                        breaker.record_failure()
                     if attempt == max_retries - 1:
-                        print("Decorator: All retries failed.")
+                        logger.warning("%s: all %s attempts failed: %s", func.__name__, max_retries, e)
+                        if stats is not None:
+                            stats.record_failure()
                         raise # Re-raise the last caught exception
-                    else:
-                        print(f"Decorator: Waiting {delay}s...")
-                        time.sleep(delay)
+
+                    wait = min(max_delay, delay * (backoff ** attempt))
+                    if jitter:
+                        wait = random.uniform(0, wait)
+                    retry_after = getattr(e, 'retry_after', None)
+                    if retry_after:
+                        retry_after = float(retry_after)
+                        if max_retry_after is not None:
+                            retry_after = min(retry_after, max_retry_after)
+                        wait = max(wait, retry_after)
+                    logger.info("%s: attempt %s/%s failed (%s), waiting %.2fs",
+                                func.__name__, attempt + 1, max_retries, e, wait)
+                    if stats is not None:
+                        stats.record_wait(wait)
+                    time.sleep(wait)
+                except Exception:
+                    # Not retryable, still counts against the breaker
+                    if breaker is not None:
+                        breaker.record_failure()
+                    if stats is not None:
+                        stats.record_failure()
+                    raise
+                else:
+                    if breaker is not None:
+                        breaker.record_success()
+                    if stats is not None:
+                        stats.record_success()
+                    return result
             # This should not be reached if exceptions are raised correctly
             # but ensures we raise if loop finishes unexpectedly
             raise RuntimeError("Retry loop exited without success or exception") from last_exception
         return wrapper_retry
     return decorator_retry
 
-def export_to_file(f_name: str, sometext, output_dir="output/data", file_type ="json"):
+def export_to_file(f_name: str, sometext, output_dir="output/data", file_type ="json", indent=4,
+                   fmt=None, compression=None):
+    """
+    Writes `sometext` to <output_dir>/<f_name>.<file_type>.
+
+    For json, fmt ('pretty', 'compact' or 'ndjson', see utilities/serializer.py) and
+    compression (None, 'gzip' or 'zstd') pick the layout and the extension, e.g.
+    .ndjson.gz. fmt defaults to 'pretty', or 'compact' when indent is None.
+
+    Returns:
+        str: Path of the written file, False for an unsupported file type.
+    """
     make_dir(output_dir)
     if file_type not in ["json","txt","html","md","yml","csv","sql"]:
         print("File type not supported.")
         return False
     if file_type == "json":
-        sometext = json.dumps(sometext, indent=4, ensure_ascii= False)
+        fmt = fmt or ('pretty' if indent is not None else 'compact')
+        path = f'{output_dir}/{f_name}.{serializer.file_extension(fmt, compression)}'
+        return serializer.dump(sometext, path, fmt, compression)
 
-    with open(f'{output_dir}/{f_name}.{file_type}', "w", encoding="utf-8") as outfile:
+    path = f'{output_dir}/{f_name}.{file_type}'
+    with open(path, "w", encoding="utf-8") as outfile:
         outfile.write(sometext)
 
-    return True
+    return path
+
+
+def content_hash(payload):
+    """sha256 of the payload as canonical JSON, so it does not depend on how the file is written."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
 
 
 def add_to_list(my_list, new_item):
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+from utilities.column_store import ColumnStore, DICTIONARY, NUMERIC, encode_column
+
+
+def player_rows(season_year, n, offset=0):
+    return [{'SEASON_YEAR': season_year, 'PLAYER_ID': 1627750 + i + offset, 'PLAYER_NAME': f'Player {i % 7}',
+             'PTS': i % 50, 'FG_PCT': None if i % 5 == 0 else (i % 10) / 10, 'PLUS_MINUS': i - n // 2,
+             'WL': 'W' if i % 2 else 'L', 'BLKA': None if i == 3 else i % 4}
+            for i in range(n)]
+
+
+def test_encode_column():
+    assert encode_column([1, 2, 100])[2] == {'dtype': 'int8'}
+    assert encode_column([1, -40000])[2] == {'dtype': 'int32'}
+    kind, arrays, meta = encode_column([1, None])
+    assert kind == NUMERIC and meta == {'dtype': 'float64', 'int_values': True} and np.isnan(arrays[''][1])
+    kind, arrays, meta = encode_column(['W', None, 'L', 'W'])
+    assert kind == DICTIONARY and arrays['dict'] == ['W', 'L'] and arrays['codes'].tolist() == [0, -1, 1, 0]
+
+
+def test_round_trip(tmp_path):
+    store = ColumnStore(str(tmp_path))
+    regular = player_rows('2023-24', 40)
+    playoffs = player_rows('2023-24', 9, offset=100)
+    assert store.write('2023_24', 'Regular Season', regular) == 40
+    store.write('2023_24', 'Playoffs', playoffs)
+
+    part = store.partitions(season_types=['Regular Season'])[0]
+    assert part.rows == 40
+    for column in regular[0]:
+        values = store.read([column], season_types=['Regular Season'])[column]
+        expected = [i[column] for i in regular]
+        got = [None if isinstance(v, float) and np.isnan(v) else v for v in np.asarray(values).tolist()]
+        assert got == expected, column
+
+    both = store.read(['PLAYER_NAME', 'PTS'], seasons=['2023_24'])
+    rows = playoffs + regular
+    assert both['PLAYER_NAME'].tolist() == [i['PLAYER_NAME'] for i in rows]
+    assert both['PTS'].tolist() == [i['PTS'] for i in rows]
+
+
+def test_to_frame_across_partitions(tmp_path):
+    store = ColumnStore(str(tmp_path))
+    store.write('2022_23', 'Regular Season', player_rows('2022-23', 6))
+    newer = player_rows('2023-24', 4)
+    for i in newer:
+        i['NICKNAME'] = 'Nick'
+    store.write('2023_24', 'Regular Season', newer)
+
+    df = store.to_frame(['PLAYER_NAME', 'PTS', 'NICKNAME'])
+    assert len(df) == 10
+    assert isinstance(df['PLAYER_NAME'].dtype, pd.CategoricalDtype)
+    # Missing from the 2022-23 partition
+    assert df['NICKNAME'].isna().tolist() == [True] * 6 + [False] * 4
+    assert df['PTS'].tolist() == [i['PTS'] for i in player_rows('2022-23', 6) + newer]
+
+
+def test_numeric_column_missing_from_a_partition(tmp_path):
+    store = ColumnStore(str(tmp_path))
+    store.write('2022_23', 'Regular Season', player_rows('2022-23', 3))
+    newer = player_rows('2023-24', 2)
+    for i in newer:
+        i['PFD'] = 4
+    store.write('2023_24', 'Regular Season', newer)
+
+    # NaN with a float dtype, not None in an object column
+    df = store.to_frame(['PFD'])
+    assert df['PFD'].dtype == np.float64
+    assert df['PFD'].isna().tolist() == [True] * 3 + [False] * 2
+    assert df['PFD'].sum() == 8
+
+    pfd = store.read(['PFD'])['PFD']
+    assert pfd.dtype == np.float64
+    assert np.isnan(pfd[:3]).all() and pfd[3:].tolist() == [4.0, 4.0]
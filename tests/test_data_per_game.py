@@ -0,0 +1,88 @@
+import json
+
+import pytest
+from nba_api.stats.library.http import NBAStatsHTTP, NBAStatsResponse
+
+from api_call import data_per_game, response_cache
+from api_call.manifest import FetchManifest, STATUS_DONE, STATUS_EMPTY
+from api_call.response_cache import ResponseCache
+from utilities import serializer
+
+GAME_ID = '0021000001'
+SEASON = 2010
+
+
+def box_score(player_rows):
+    return json.dumps({'resultSets': [
+        {'name': 'PlayerStats', 'headers': ['GAME_ID', 'PLAYER_ID', 'PTS'], 'rowSet': player_rows},
+        {'name': 'TeamStats', 'headers': ['GAME_ID', 'TEAM_ID', 'PTS'], 'rowSet': [[GAME_ID, 1610612737, 100]]},
+    ]})
+
+
+class FakeServer():
+    """Answers the box score requests with `responses` in turn."""
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def endpoint(self):
+        server = self
+
+        class FakeBoxScore():
+            endpoint = 'boxscoreadvancedv2'
+
+            def __init__(self, game_id, get_request=True):
+                self.parameters = {'GameID': game_id}
+                if get_request:
+                    self.get_request()
+
+            def get_request(self):
+                server.requests.append(self.parameters['GameID'])
+                self.nba_response = NBAStatsResponse(response=server.responses.pop(0), status_code=200, url=None)
+
+        return FakeBoxScore
+
+
+@pytest.fixture
+def season_dir(tmp_path, monkeypatch):
+    dirr = str(tmp_path / 'json_export')
+    serializer.dump({'LeagueGameFinderResults': [
+        {'GAME_ID': GAME_ID, 'SEASON_ID': '22010', 'MATCHUP': 'ATL vs. BOS'},
+    ]}, f'{dirr}\\gameSummary\\2010_11.json', 'compact')
+    manifest = FetchManifest(str(tmp_path / 'manifest.sqlite'))
+    monkeypatch.setattr(data_per_game, 'get_default_manifest', lambda: manifest)
+    monkeypatch.setattr(response_cache, '_default_cache', ResponseCache(str(tmp_path / 'cache')))
+    return dirr, manifest
+
+
+def fetch(server, dirr, monkeypatch):
+    monkeypatch.setitem(data_per_game.PER_GAME_ENDPOINTS, 'fakeBox', {'endpoint': server.endpoint(), 'first_season': None})
+    return data_per_game.get_per_game_data(SEASON, ['fakeBox'], dirr, max_workers=1, requests_per_second=1000)
+
+
+def test_empty_game_is_fetched_again(season_dir, monkeypatch):
+    dirr, manifest = season_dir
+    server = FakeServer(box_score([]), box_score([[GAME_ID, 1, 20]]))
+
+    fetch(server, dirr, monkeypatch)
+    assert manifest.get('fakeBox', GAME_ID)['status'] == STATUS_EMPTY
+    # An empty payload cached before empty responses were left out
+    response_cache.get_default_cache().set('boxscoreadvancedv2', {'GameID': GAME_ID}, box_score([]),
+                                           NBAStatsHTTP.base_url)
+
+    fetch(server, dirr, monkeypatch)
+    assert server.requests == [GAME_ID, GAME_ID]
+    assert manifest.get('fakeBox', GAME_ID)['status'] == STATUS_DONE
+    written = serializer.load(serializer.find_data_file(f'{dirr}\\fakeBox\\2010_11/{GAME_ID}'))
+    assert written['PlayerStats']['rowSet'] == [[GAME_ID, 1, 20]]
+
+    # Done games are not asked again
+    fetch(server, dirr, monkeypatch)
+    assert server.requests == [GAME_ID, GAME_ID]
+
+
+def test_ndjson_per_game_format_rejected(season_dir, monkeypatch):
+    dirr, _ = season_dir
+    monkeypatch.setattr(data_per_game, 'PER_GAME_FORMAT', 'ndjson')
+    with pytest.raises(ValueError):
+        fetch(FakeServer(box_score([[GAME_ID, 1, 20]])), dirr, monkeypatch)
@@ -0,0 +1,39 @@
+import os
+
+from utilities import serializer
+from utilities.data_process import combine_json_files, combine_seasons
+
+
+def write_game(folder, game_id, points, raw=False):
+    os.makedirs(folder, exist_ok=True)
+    if raw:
+        data = {'PlayerStats': {'headers': ['PLAYER_ID', 'PTS'], 'rowSet': [[1, points]]}}
+    else:
+        data = {'PlayerStats': [{'PLAYER_ID': 1, 'PTS': points}]}
+    serializer.dump(data, os.path.join(folder, f'{game_id}.json'))
+
+
+def test_combine_seasons(tmp_path):
+    input_path = tmp_path / 'boxScoreAdvance'
+    # Written out of name order, one file in the raw headers/rowSet layout
+    write_game(input_path / '2023_24', '0022300002', 20)
+    write_game(input_path / '2023_24', '0022300001', 10, raw=True)
+    write_game(input_path / '2024_25', '0022400001', 30)
+
+    output_path = tmp_path / 'boxScore'
+    os.makedirs(output_path)
+    results = combine_seasons(str(input_path), str(output_path), 2023, 2024, output_format='ndjson', max_workers=2)
+    assert results[str(input_path / '2023_24')] == {'files': 2, 'records': 2, 'errors': 0}
+    assert results[str(input_path / '2024_25')] == {'files': 1, 'records': 1, 'errors': 0}
+
+    records = serializer.load(str(output_path / '2023_24.ndjson'))
+    assert records == [
+        {'id': '0022300001', 'PlayerStats': [{'PLAYER_ID': 1, 'PTS': 10}]},
+        {'id': '0022300002', 'PlayerStats': [{'PLAYER_ID': 1, 'PTS': 20}]},
+    ]
+    assert [r['id'] for r in serializer.load(str(output_path / '2024_25.ndjson'))] == ['0022400001']
+
+
+def test_combine_missing_folder(tmp_path):
+    assert combine_json_files(str(tmp_path / 'missing'), str(tmp_path / 'out.json'), exit_on_error=False) is None
+    assert not os.path.exists(tmp_path / 'out.json')
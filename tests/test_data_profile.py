@@ -0,0 +1,140 @@
+import random
+
+import pytest
+from probables import CountMinSketch
+
+from utilities import data_profile, data_profile_simple, profile_accumulators, serializer
+
+CMS = CountMinSketch(error_rate=0.001, confidence=0.99)
+CMS_ARGS = (CMS.width, CMS.depth, 0.001, 0.99)
+# KLL quantiles depend on the order items were compacted in, checked in test_profile_accumulators
+SKETCHED = {'median', 'p95', 'p99'}
+
+
+def records(n, seed=1):
+    rng = random.Random(seed)
+    return [{'GAME_ID': f'00223{i:05d}', 'PTS': rng.randint(0, 50), 'FG_PCT': None if i % 7 == 0 else rng.randint(0, 1000) / 1000,
+             'WL': rng.choice(['W', 'L', '']), 'STATS': {'REB': rng.randint(0, 20)}, 'LIST': [1] * (i % 3)}
+            for i in range(n)]
+
+
+PROFILERS = {
+    'data_profile': {
+        'files': lambda shards: data_profile.profile_json_files(shards, *CMS_ARGS),
+        'file': lambda path: data_profile.profile_json_file(path, *CMS_ARGS),
+        'state': lambda shards, state, update: data_profile.profile_with_state(shards, state, *CMS_ARGS,
+                                                                               update=update),
+    },
+    'data_profile_simple': {
+        'files': data_profile_simple.profile_json_files,
+        'file': data_profile_simple.profile_json_file,
+        'state': lambda shards, state, update: data_profile_simple.profile_with_state(shards, state,
+                                                                                      update=update),
+    },
+}
+
+
+def assert_same_profile(profile, expected, skip_paths=()):
+    assert set(profile) == set(expected)
+    for path in expected:
+        if path in skip_paths:
+            continue
+        assert_same_stats(profile[path], expected[path], path)
+
+
+def assert_same_stats(stats, expected, where):
+    assert set(stats) == set(expected), where
+    for name, value in expected.items():
+        if name in SKETCHED:
+            continue
+        if isinstance(value, dict):
+            assert_same_stats(stats[name], value, f'{where}.{name}')
+        elif isinstance(value, float):
+            assert stats[name] == pytest.approx(value, rel=1e-9), f'{where}.{name}'
+        else:
+            assert stats[name] == value, f'{where}.{name}'
+
+
+@pytest.mark.parametrize('profiler', PROFILERS)
+def test_merged_shards_equal_single_pass(tmp_path, profiler):
+    rows = records(3000)
+    shards = []
+    for n in range(3):
+        shards.append(str(tmp_path / f'shard_{n}.ndjson'))
+        serializer.dump(rows[n * 1000:(n + 1) * 1000], shards[-1], 'ndjson')
+    single = str(tmp_path / 'all.json')
+    serializer.dump(rows, single, 'compact')
+
+    merged = PROFILERS[profiler]['files'](shards)
+    # '$' is 3 arrays of 1000 records against 1 of 3000
+    assert_same_profile(merged, PROFILERS[profiler]['file'](single), skip_paths={'$'})
+    assert merged['$']['count'] == 3
+    assert merged['$[*].PTS']['count'] == 3000
+
+
+@pytest.mark.parametrize('profiler', PROFILERS)
+def test_update_reads_appended_ndjson(tmp_path, profiler):
+    rows = records(3000)
+    path = str(tmp_path / 'player_stats.ndjson')
+    state = str(tmp_path / 'profile.state')
+    serializer.dump(rows[:2000], path, 'ndjson')
+    PROFILERS[profiler]['state']([path], state, False)
+
+    with open(path, 'a', encoding='utf-8') as f1:
+        f1.write(serializer.dumps(rows[2000:], 'ndjson'))
+        # A line still being written is left for the next update
+        f1.write('{"GAME_ID": "002230')
+    updated = PROFILERS[profiler]['state']([path], state, True)
+
+    full = str(tmp_path / 'full.ndjson')
+    serializer.dump(rows, full, 'ndjson')
+    expected = PROFILERS[profiler]['file'](full)
+    # The file's array was measured by the first read, appended lines only add records
+    assert updated['$']['list_stats']['max_length'] == 2000
+    assert_same_profile(updated, expected, skip_paths={'$'})
+    assert updated['$']['count'] == expected['$']['count'] == 1
+
+
+@pytest.mark.parametrize('profiler', PROFILERS)
+def test_update_refuses_rewritten_file(tmp_path, profiler):
+    path = str(tmp_path / 'player_stats.ndjson')
+    state = str(tmp_path / 'profile.state')
+    serializer.dump(records(100), path, 'ndjson')
+    PROFILERS[profiler]['state']([path], state, False)
+
+    serializer.dump(records(120, seed=2), path, 'ndjson')
+    with pytest.raises(ValueError):
+        PROFILERS[profiler]['state']([path], state, True)
+
+
+def test_unique_counts_per_value_kind():
+    # Numbers and strings under the same path are counted apart
+    data = [{'MIN': i} for i in range(30)] + [{'MIN': f'{i}:00'} for i in range(5)] + [{'MIN': None}]
+    profile = data_profile.profile_json_data(data, *CMS_ARGS)
+    assert profile['$[*].MIN']['numeric_stats']['unique_count'] == 30
+    assert profile['$[*].MIN']['string_stats']['unique_count'] == 5
+
+
+@pytest.mark.parametrize('profiler', PROFILERS)
+def test_top_level_array_takes_the_table_path(tmp_path, monkeypatch, profiler):
+    # Flat records, as in full_player_stats.json
+    rows = [{k: v for k, v in row.items() if k not in ('STATS', 'LIST')} for row in records(500)]
+    path = str(tmp_path / 'full_player_stats.json')
+    serializer.dump(rows, path, 'pretty')
+
+    tabled = []
+    add_table = profile_accumulators.add_table
+    def counting_add_table(tree, node, records, *args):
+        added = add_table(tree, node, records, *args)
+        tabled.append((node.path, len(records) if added else 0))
+        return added
+    monkeypatch.setattr(profile_accumulators, 'add_table', counting_add_table)
+
+    profile = PROFILERS[profiler]['file'](path)
+    assert tabled and {node_path for node_path, _ in tabled} == {'$[*]'}
+    assert sum(n for _, n in tabled) == 500
+    assert profile['$[*]']['count'] == 500 and profile['$[*].PTS']['count'] == 500
+
+    ndjson = str(tmp_path / 'full_player_stats.ndjson')
+    serializer.dump(rows, ndjson, 'ndjson')
+    assert_same_profile(profile, PROFILERS[profiler]['file'](ndjson))
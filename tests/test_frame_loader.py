@@ -0,0 +1,24 @@
+import pandas as pd
+
+from utilities.frame_loader import concat_frames, optimize_frame
+
+
+def test_whole_floats_stay_float():
+    # FG_PCT of a file where every player shot 0 or 100%
+    df = pd.DataFrame({'PTS': [10, 0, 31], 'FG_PCT': [1.0, 0.0, 1.0], 'REB': [4.0, None, 2.0]})
+    frame = optimize_frame(df, {'REB': (0, 31)})
+    assert str(frame['PTS'].dtype) == 'int8'
+    assert str(frame['FG_PCT'].dtype) == 'float64'
+    # Int in the profile, nullable int here
+    assert str(frame['REB'].dtype) == 'Int8'
+
+
+def test_concat_keeps_category_of_missing_column():
+    first = optimize_frame(pd.DataFrame({'WL': ['W', 'L'], 'PTS': [10, 20]}))
+    second = optimize_frame(pd.DataFrame({'PTS': [5]}))
+    third = optimize_frame(pd.DataFrame({'WL': ['L'], 'PTS': [7]}))
+    frame = concat_frames([first, second, third])
+    assert isinstance(frame['WL'].dtype, pd.CategoricalDtype)
+    assert frame['WL'].isna().tolist() == [False, False, True, False]
+    assert frame['WL'].tolist()[:2] == ['W', 'L'] and frame['WL'].tolist()[3] == 'L'
+    assert frame['PTS'].tolist() == [10, 20, 5, 7]
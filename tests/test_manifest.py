@@ -0,0 +1,51 @@
+import os
+
+from api_call.manifest import FetchManifest, STATUS_DONE, STATUS_EMPTY, STATUS_FAILED
+
+SEASON = '2023_24'
+
+
+def test_record_and_missing(tmp_path):
+    manifest = FetchManifest(str(tmp_path / 'manifest.sqlite'))
+    manifest.record('boxScoreAdvance', '0022300001', SEASON, STATUS_DONE, 120, 'abc')
+    manifest.record('boxScoreAdvance', '0022300002', SEASON, STATUS_EMPTY, 40)
+    manifest.record('boxScoreAdvance', '0022300003', SEASON, STATUS_FAILED, error='timeout')
+
+    game_ids = [f'00223000{i:02d}' for i in range(1, 5)]
+    # Empty and failed games are fetched again, other endpoints are separate
+    assert manifest.missing('boxScoreAdvance', game_ids) == game_ids[1:]
+    assert manifest.missing('boxScoreTraditional', game_ids) == game_ids
+    assert manifest.get('boxScoreAdvance', '0022300001')['content_hash'] == 'abc'
+    assert manifest.failed('boxScoreAdvance', SEASON) == ['0022300003']
+    assert manifest.game_ids('boxScoreAdvance', SEASON, STATUS_EMPTY) == {'0022300002'}
+    assert manifest.summary('boxScoreAdvance')[STATUS_DONE] == {'count': 1, 'bytes': 120}
+
+    # A later fetch replaces the row
+    manifest.record('boxScoreAdvance', '0022300003', SEASON, STATUS_DONE, 100)
+    assert manifest.is_done('boxScoreAdvance', '0022300003')
+    assert manifest.failed('boxScoreAdvance') == []
+
+
+def test_missing_past_parameter_limit(tmp_path):
+    manifest = FetchManifest(str(tmp_path / 'manifest.sqlite'))
+    game_ids = [f'0022{i:06d}' for i in range(2000)]
+    manifest.record_many(('boxScoreAdvance', i, SEASON, STATUS_DONE, 1, None, None) for i in game_ids[::2])
+    assert manifest.missing('boxScoreAdvance', game_ids) == game_ids[1::2]
+
+
+def test_import_dir_once(tmp_path):
+    directory = tmp_path / 'boxScoreAdvance' / SEASON
+    os.makedirs(directory)
+    for game_id in ('0022300001', '0022300002'):
+        (directory / f'{game_id}.json').write_text('{}')
+    manifest = FetchManifest(str(tmp_path / 'manifest.sqlite'))
+    manifest.record('boxScoreAdvance', '0022300002', SEASON, STATUS_EMPTY)
+
+    assert manifest.import_dir('boxScoreAdvance', SEASON, str(directory)) == 2
+    assert manifest.is_done('boxScoreAdvance', '0022300001')
+    # Rows the fetcher wrote are kept
+    assert manifest.get('boxScoreAdvance', '0022300002')['status'] == STATUS_EMPTY
+
+    (directory / '0022300003.json').write_text('{}')
+    assert manifest.import_dir('boxScoreAdvance', SEASON, str(directory)) == 0
+    assert not manifest.is_done('boxScoreAdvance', '0022300003')
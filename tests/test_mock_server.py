@@ -0,0 +1,40 @@
+import json
+import os
+
+from nba_api.stats.endpoints import boxscoreadvancedv2, leaguegamefinder
+from nba_api.stats.library.http import NBAStatsHTTP
+
+from api_call import set_base_url
+from api_call.mock_server import MockStatsServer
+
+GAME_ID = '0022400001'
+
+
+def test_fetch_through_nba_api(tmp_path, monkeypatch):
+    recorded = {
+        'resource': 'boxscore',
+        'parameters': {'GameID': GAME_ID},
+        'resultSets': [
+            {'name': name, 'headers': headers, 'rowSet': [[GAME_ID if c == 'GAME_ID' else 1 for c in headers]]}
+            for name, headers in boxscoreadvancedv2.BoxScoreAdvancedV2.expected_data.items()
+        ],
+    }
+    os.makedirs(tmp_path / 'boxscoreadvancedv2')
+    with open(tmp_path / 'boxscoreadvancedv2' / f'{GAME_ID}.json', 'w', encoding='utf-8') as f1:
+        json.dump(recorded, f1)
+
+    monkeypatch.setattr(NBAStatsHTTP, 'base_url', NBAStatsHTTP.base_url)
+    # Port 0: an ephemeral port, read back from base_url
+    with MockStatsServer(port=0, fixture_dir=str(tmp_path)) as server:
+        set_base_url(server.base_url)
+        api_result = boxscoreadvancedv2.BoxScoreAdvancedV2(game_id=GAME_ID, timeout=5)
+        rows = api_result.player_stats.get_dict()['data']
+        assert rows == [r['rowSet'][0] for r in recorded['resultSets'] if r['name'] == 'PlayerStats']
+
+        # Nothing recorded: a generated payload with the endpoint's headers
+        api_result = leaguegamefinder.LeagueGameFinder(season_nullable='2023-24', timeout=5)
+        data = api_result.league_game_finder_results.get_dict()
+        assert data['headers'] == leaguegamefinder.LeagueGameFinder.expected_data['LeagueGameFinderResults']
+        assert data['data'] and all(row[0] == '2023-24' for row in data['data'])
+
+    assert server.counts['requests'] == 2 and server.counts['ok'] == 2
@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+from utilities import parquet_export, serializer
+
+pq = pytest.importorskip('pyarrow.parquet')
+
+
+def player_row(game_id, player_id, pts):
+    return {'SEASON_YEAR': '2023-24', 'PLAYER_ID': player_id, 'GAME_ID': game_id, 'MIN': 31.5, 'PTS': pts,
+            'FG_PCT': None}
+
+
+def test_export_player_stats(tmp_path):
+    json_dir = str(tmp_path / 'json_export')
+    output_dir = str(tmp_path / 'parquet')
+    rows = [player_row('0022300001', 1, 30), player_row('0022300001', 2, 12)]
+    os.makedirs(os.path.join(json_dir, 'player_stats'))
+    serializer.dump({'PlayerGameLogs': rows},
+                    os.path.join(json_dir, 'player_stats', 'player_stats_2023_24_regularseason.json'), 'compact')
+
+    written = parquet_export.export_player_stats(2023, ['Regular Season'], json_dir=json_dir, output_dir=output_dir)
+    path = written['Regular Season']
+    assert path == os.path.join(output_dir, 'player_stats', 'season=2023_24', 'season_type=regularseason',
+                                'part-0.parquet')
+
+    table = pq.read_table(path, partitioning=None)
+    assert table.to_pylist() == rows
+    # Types of sql/postgres/player_stats_per_game.sql
+    assert str(table.schema.field('PLAYER_ID').type) == 'int32'
+    assert str(table.schema.field('MIN').type) == 'double'
+    assert str(table.schema.field('GAME_ID').type) == 'string'
+
+
+def game_row(game_id, plus_minus, fg3_pct):
+    return {'GAME_ID': game_id, 'TEAM_ID': 1610612737, 'PLUS_MINUS': plus_minus, 'FG3_PCT': fg3_pct}
+
+
+def test_schema_across_seasons(tmp_path):
+    json_dir = str(tmp_path / 'json_export')
+    output_dir = str(tmp_path / 'parquet')
+    os.makedirs(os.path.join(json_dir, 'gameSummary'))
+    # gameSummary has no SQL schema: FG3_PCT is all null in 2022-23, PLUS_MINUS int there and double later
+    seasons = {
+        2022: [game_row('0022200001', 5, None), game_row('0022200002', -5, None)],
+        2023: [game_row('0022300001', 2.5, 0.4)],
+    }
+    for season, rows in seasons.items():
+        serializer.dump({'LeagueGameFinderResults': rows},
+                        os.path.join(json_dir, 'gameSummary', f'{season}_{str(season + 1)[-2:]}.json'))
+
+    parquet_export.export_parquet(['gameSummary'], 2022, 2023, json_dir=json_dir, output_dir=output_dir)
+
+    schema = parquet_export.table_schema('gameSummary', output_dir)
+    assert str(schema.field('FG3_PCT').type) == 'double'
+    assert str(schema.field('PLUS_MINUS').type) == 'double'
+    # Every partition written with the table schema
+    for season in ('2022_23', '2023_24'):
+        path = os.path.join(output_dir, 'gameSummary', f'season={season}', 'season_type=regularseason',
+                            'part-0.parquet')
+        assert pq.read_schema(path).equals(schema)
+
+    df = parquet_export.read_parquet('gameSummary', output_dir=output_dir).sort_values('GAME_ID')
+    assert df['PLUS_MINUS'].tolist() == [5.0, -5.0, 2.5]
+    assert df['FG3_PCT'].isna().tolist() == [True, True, False]
+    assert df['season'].tolist() == ['2022_23', '2022_23', '2023_24']
@@ -0,0 +1,151 @@
+import pytest
+
+from utilities import pg_loader
+
+
+class FakeConnection():
+    """
+    psycopg connection stand-in: `log` keeps the statements, COPY rows and commits in order.
+    `answers` maps a piece of SQL to the rows its query returns.
+    """
+    def __init__(self, answers=None):
+        self.answers = answers or {}
+        self.log = []
+
+    def execute(self, sql, params=None):
+        self.log.append(('execute', ' '.join(sql.split())))
+        rows = next((rows for part, rows in self.answers.items() if part in sql), [])
+        return FakeResult(rows)
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.log.append(('commit',))
+
+    def rollback(self):
+        self.log.append(('rollback',))
+
+    def statements(self):
+        return [i[1] for i in self.log if i[0] == 'execute']
+
+
+class FakeResult():
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeCursor():
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def copy(self, sql):
+        return FakeCopy(self.conn)
+
+
+class FakeCopy(FakeCursor):
+    def write_row(self, row):
+        self.conn.log.append(('copy', row))
+
+
+class FakePool():
+    def __init__(self, conn):
+        self.conn = conn
+
+    def connection(self):
+        return pg_loader._PooledConnection(self)
+
+    # queue.Queue of the real pool
+    def get(self):
+        return self.conn
+
+    def put(self, conn):
+        pass
+
+
+SCHEMA = {
+    'table': 'player_stats', 'identifier': 'player_stats',
+    'columns': [{'name': 'season_year'}, {'name': 'player_id'}, {'name': 'pts'}, {'name': 'creation_timestamp'}],
+}
+
+
+def rows(n):
+    return [{'SEASON_YEAR': '2023-24', 'PLAYER_ID': i, 'PTS': 10} for i in range(n)]
+
+
+def test_table_schema_from_records():
+    records = iter(rows(3))
+    schema = pg_loader.table_schema('no_script_table', records)
+    assert [i['name'] for i in schema['columns']] == ['season_year', 'player_id', 'pts', 'creation_timestamp']
+    with pytest.raises(KeyError):
+        pg_loader.table_schema('no_script_table', iter([]))
+    # A table with a script never reads the records
+    untouched = iter(rows(3))
+    assert pg_loader.table_schema('playerStatsPerGame', untouched)['table'].lower() == 'playerstatspergame'
+    assert len(list(untouched)) == 3
+
+
+def test_load_season_single_transaction():
+    conn = FakeConnection({'pg_partitioned_table': [('l',)]})
+    loaded = pg_loader.load_season(FakePool(conn), SCHEMA, 2023, rows(5), pg_loader.LoadStats(), chunk_rows=2)
+    assert loaded == 5
+
+    delete = next(n for n, i in enumerate(conn.log) if i[0] == 'execute' and i[1].startswith('DELETE'))
+    after = conn.log[delete:]
+    # Old rows deleted and the new ones copied, then one commit
+    assert [i for i in after if i[0] == 'commit'] == [('commit',)]
+    assert after[-1] == ('commit',)
+    assert [i[1] for i in after if i[0] == 'copy'] == [['2023-24', i, 10] for i in range(5)]
+
+
+def test_failed_load_rolls_back():
+    conn = FakeConnection()
+
+    def failing():
+        yield from rows(3)
+        raise OSError('truncated file')
+    with pytest.raises(OSError):
+        pg_loader.load_season(FakePool(conn), SCHEMA, 2023, failing(), pg_loader.LoadStats(), chunk_rows=2)
+    delete = next(n for n, i in enumerate(conn.log) if i[0] == 'execute' and i[1].startswith('DELETE'))
+    assert ('commit',) not in conn.log[delete:]
+    assert conn.log[-1] == ('rollback',)
+
+
+def test_deferred_indexes_of_partitioned_table():
+    definition = ('CREATE INDEX idx_player ON ONLY public.playerstatspergame '
+                  'USING btree (player_id, game_date)')
+    conn = FakeConnection({'pg_get_indexdef': [('idx_player', definition)]})
+    indexes = pg_loader.drop_indexes(conn, 'playerstatspergame')
+    assert conn.statements()[-1] == 'DROP INDEX IF EXISTS "idx_player"'
+
+    pg_loader.rebuild_indexes(FakePool(conn), indexes)
+    # Built on the parent and every partition, not as an invalid parent only index
+    assert conn.statements()[-1] == \
+        'CREATE INDEX idx_player ON public.playerstatspergame USING btree (player_id, game_date)'
+
+
+def test_recursive_definition_of_plain_table():
+    definition = 'CREATE INDEX idx_only_col ON public.team USING btree (only_col)'
+    assert pg_loader.recursive_definition(definition) == definition
+
+
+def test_repair_invalid_indexes():
+    definition = 'CREATE INDEX idx_player ON ONLY public.playerstatspergame USING btree (player_id)'
+    conn = FakeConnection({'indisvalid': [('idx_player', definition)]})
+    assert pg_loader.repair_invalid_indexes(conn, 'playerstatspergame') == ['idx_player']
+    assert conn.statements()[-2:] == [
+        'DROP INDEX IF EXISTS "idx_player"',
+        'CREATE INDEX idx_player ON public.playerstatspergame USING btree (player_id)',
+    ]
@@ -0,0 +1,120 @@
+import random
+import statistics
+
+import pytest
+from probables.hashes import fnv_1a
+
+from utilities.profile_accumulators import HyperLogLog, KLLSketch, Reservoir, RunningStats, TopValues, fnv1a_64
+
+
+def test_hll_error_bound():
+    # Standard error 1.04 / sqrt(2**14) ~ 0.8%, 4 of them
+    for n in (100, 5000, 200000):
+        hll = HyperLogLog(14)
+        hll.update(range(n))
+        assert abs(hll.count() - n) <= max(2, 0.033 * n), n
+
+
+def test_hll_merge_is_union():
+    left, right, both = HyperLogLog(12), HyperLogLog(12), HyperLogLog(12)
+    left.update([f'player {i}' for i in range(30000)])
+    right.update([f'player {i}' for i in range(20000, 50000)])
+    both.update([f'player {i}' for i in range(50000)])
+    assert left.merge(right).registers == both.registers
+    with pytest.raises(ValueError):
+        left.merge(HyperLogLog(14))
+
+
+def test_hll_keeps_types_apart():
+    hll = HyperLogLog(14)
+    hll.update(['1', 1, 1.0, True, None])
+    assert hll.count() == 5
+
+
+def rank_error(values, q, estimate):
+    ordered = sorted(values)
+    low = sum(1 for i in ordered if i < estimate) / len(ordered)
+    high = sum(1 for i in ordered if i <= estimate) / len(ordered)
+    return 0 if low <= q <= high else min(abs(q - low), abs(q - high))
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_kll_rank_error(seed):
+    rng = random.Random(seed)
+    values = [rng.gauss(20, 8) for _ in range(100000)]
+    sketch = KLLSketch(200, seed=seed)
+    sketch.add_many(values[:50000])
+    for x in values[50000:]:
+        sketch.add(x)
+    # About 3k items kept
+    assert sketch.size < 3 * 200 + 100
+    qs = [0.01, 0.25, 0.5, 0.75, 0.95, 0.99]
+    for q, estimate in sketch.quantiles(qs).items():
+        assert rank_error(values, q, estimate) <= 0.02, q
+
+
+def test_kll_merge_rank_error():
+    rng = random.Random(3)
+    shards = [[rng.random() for _ in range(20000)] for _ in range(4)]
+    sketch = KLLSketch(200, seed=0)
+    for shard in shards:
+        other = KLLSketch(200, seed=1)
+        other.add_many(shard)
+        sketch.merge(other)
+    values = [x for shard in shards for x in shard]
+    for q, estimate in sketch.quantiles([0.1, 0.5, 0.9]).items():
+        assert rank_error(values, q, estimate) <= 0.02, q
+    assert KLLSketch().quantiles([0.5]) == {0.5: None}
+
+
+def test_running_stats_merge_equals_single_pass():
+    rng = random.Random(4)
+    values = [rng.uniform(-50, 1e6) for _ in range(10000)]
+    single = RunningStats()
+    for x in values:
+        single.add(x)
+    merged = RunningStats()
+    merged.add_many(values[:3000])
+    part = RunningStats()
+    part.add_many(values[3000:])
+    merged.merge(part)
+    assert merged.n == single.n == 10000
+    assert merged.mean == pytest.approx(statistics.fmean(values), rel=1e-12)
+    assert merged.stdev == pytest.approx(statistics.stdev(values), rel=1e-9)
+    assert single.stdev == pytest.approx(statistics.stdev(values), rel=1e-9)
+    assert (merged.min, merged.max) == (min(values), max(values))
+
+
+def test_top_values_prune():
+    top = TopValues(capacity=10)
+    top.update({'frequent': 100, 'common': 50})
+    for i in range(30):
+        top.add(f'rare {i}')
+    assert top.most_common(2) == [('frequent', 100), ('common', 50)]
+    assert not top.exact and top.median() is None
+    assert TopValues().merge(TopValues()).exact
+    exact = TopValues()
+    exact.update([1, 2, 2, 10])
+    assert exact.median() == 2
+
+
+def test_reservoir_uniform():
+    # Each of 20 items lands in a size 5 sample with probability 1/4
+    hits = [0] * 20
+    for seed in range(2000):
+        reservoir = Reservoir(5, seed=seed)
+        reservoir.add_many(list(range(8)))
+        for i in range(8, 20):
+            reservoir.add(i)
+        assert len(reservoir.items) == 5 and reservoir.n == 20
+        for i in reservoir.items:
+            hits[i] += 1
+    assert all(abs(h / 2000 - 0.25) < 0.05 for h in hits)
+
+
+def test_fnv1a_matches_probables():
+    strings = ['', 'a', 'Luka Dončić', 'LAL @ BOS', 'x' * 70]
+    hashes = fnv1a_64(strings, seeds=(0, 3))
+    for n, string in enumerate(strings):
+        assert int(hashes[0][n]) == fnv_1a(string, 0)
+        assert int(hashes[1][n]) == fnv_1a(string, 3)
@@ -0,0 +1,40 @@
+import pytest
+
+from utilities import serializer
+from utilities.profile_sampling import allocate, sample_records
+
+
+@pytest.fixture
+def seasons_dir(tmp_path):
+    """10 seasons of 3000 player game logs, one file each."""
+    for year in range(2010, 2020):
+        records = [{'SEASON_YEAR': f'{year}-{str(year + 1)[-2:]}', 'PLAYER_ID': i, 'PTS': i % 40}
+                   for i in range(3000)]
+        serializer.dump(records, str(tmp_path / f'player_stats_{year}.ndjson'), 'ndjson')
+    return str(tmp_path)
+
+
+def test_stratified_sample_size_and_shares(seasons_dir):
+    sample, info = sample_records([seasons_dir], 2000, stratify='season', max_seconds=None)
+    assert len(sample) == info['size'] == 2000
+    assert info['complete'] and info['records_read'] == 30000
+    # Equal seasons, equal shares
+    assert {i['sampled'] for i in info['strata'].values()} == {200}
+
+
+def test_reservoir_sample(seasons_dir):
+    sample, info = sample_records([seasons_dir], 500, max_seconds=None)
+    assert len(sample) == 500
+    assert len({(record['SEASON_YEAR'], record['PLAYER_ID']) for record, _ in sample}) == 500
+    assert {shape for _, shape in sample} == {'$[*]'}
+
+
+def test_sample_size_must_be_positive(seasons_dir):
+    with pytest.raises(ValueError):
+        sample_records([seasons_dir], 0)
+
+
+def test_allocate():
+    assert allocate({'a': 3, 'b': 1}, 10) == {'a': 3, 'b': 1}
+    assert allocate({'a': 500, 'b': 300, 'c': 200}, 10) == {'a': 5, 'b': 3, 'c': 2}
+    assert sum(allocate({'a': 1, 'b': 1, 'c': 1}, 2).values()) == 2
@@ -0,0 +1,70 @@
+import pytest
+
+from api_call import rate_limit
+from api_call.rate_limit import TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.monotonic / time.sleep of rate_limit on a fake clock: sleeping moves it forward."""
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, 'monotonic', lambda: now[0])
+
+    def sleep(seconds):
+        now[0] += seconds
+    monkeypatch.setattr(rate_limit.time, 'sleep', sleep)
+    return now
+
+
+def test_starts_empty(clock):
+    bucket = TokenBucket(4)
+    assert not bucket.try_acquire()
+    # The first second sends `rate` requests, not a full bucket on top
+    clock[0] += 1
+    assert all(bucket.try_acquire() for _ in range(4))
+    assert not bucket.try_acquire()
+
+
+def test_burst_then_refill(clock):
+    bucket = TokenBucket(2, capacity=4, tokens=4)
+    assert all(bucket.try_acquire() for _ in range(4))
+    assert not bucket.try_acquire()
+    clock[0] += 0.5
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+    # Never above capacity
+    clock[0] += 60
+    assert all(bucket.try_acquire() for _ in range(4))
+    assert not bucket.try_acquire()
+
+
+def test_acquire_waits_for_rate(clock):
+    bucket = TokenBucket(4)
+    start = clock[0]
+    waited = sum(bucket.acquire() for _ in range(12))
+    # 12 at 4 per second from an empty bucket
+    assert clock[0] - start == pytest.approx(3.0)
+    assert waited == pytest.approx(3.0)
+
+
+def test_rate_must_be_positive():
+    with pytest.raises(ValueError):
+        TokenBucket(0)
+
+
+def test_rate_limited_takes_a_token(clock):
+    bucket = TokenBucket(1)
+
+    class Endpoint():
+        calls = 0
+
+        def get_request(self):
+            Endpoint.calls += 1
+
+    limited = rate_limit.rate_limited(Endpoint, bucket)
+    assert limited.__name__ == 'Endpoint'
+    start = clock[0]
+    for _ in range(3):
+        limited().get_request()
+    assert Endpoint.calls == 3
+    assert clock[0] - start == pytest.approx(3.0)
@@ -0,0 +1,120 @@
+import os
+import random
+
+import pytest
+
+from utilities import serializer
+from utilities.record_index import RecordIndex, build_index, encode_key, open_index, DATE
+
+PLAYERS = [2544, 201939, 1629029, 1628983, 203999]
+TEAMS = [1610612737, 1610612738, 1610612747]
+
+
+def player_rows(season, n, rng):
+    year = int(season[:4])
+    rows = []
+    for i in range(n):
+        rows.append({
+            'GAME_ID': f'002{str(year)[-2:]}{rng.randint(1, 60):05d}',
+            'PLAYER_ID': rng.choice(PLAYERS),
+            'TEAM_ID': rng.choice(TEAMS),
+            # Some lines have no date
+            'GAME_DATE': '' if i % 17 == 0 else f'{year + rng.randint(0, 1)}-{rng.randint(1, 12):02d}-'
+                                                f'{rng.randint(1, 28):02d}T00:00:00',
+            'PTS': i,
+        })
+    return rows
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Two season partitions of full_player_stats."""
+    rng = random.Random(5)
+    store_dir = tmp_path / 'full_player_stats'
+    os.makedirs(store_dir)
+    rows = []
+    for season in ('2022_23', '2023_24'):
+        season_rows = player_rows(season, 600, rng)
+        serializer.dump(season_rows, str(store_dir / f'{season}.ndjson'), 'ndjson')
+        rows += season_rows
+    return str(store_dir), rows
+
+
+def matches(row, name, condition):
+    kind = DATE if name == 'GAME_DATE' else 'int'
+    value = encode_key(kind, row.get(name))
+    if value is None:
+        return False
+    if isinstance(condition, tuple):
+        low, high = (None if i is None else encode_key(kind, i) for i in condition)
+        return (low is None or value >= low) and (high is None or value <= high)
+    if isinstance(condition, list):
+        return value in {encode_key(kind, i) for i in condition}
+    return value == encode_key(kind, condition)
+
+
+def brute_force(rows, conditions):
+    return [n for n, row in enumerate(rows) if all(matches(row, k, v) for k, v in conditions.items())]
+
+
+def random_conditions(rng, rows):
+    conditions = {}
+    if rng.random() < 0.7:
+        conditions['PLAYER_ID'] = rng.choice(PLAYERS + [1])
+    if rng.random() < 0.4:
+        conditions['GAME_ID'] = [rng.choice(rows)['GAME_ID'] for _ in range(rng.randint(1, 3))]
+    if rng.random() < 0.3:
+        conditions['TEAM_ID'] = rng.choice(TEAMS)
+    if rng.random() < 0.5:
+        low = f'{rng.randint(2021, 2024)}-{rng.randint(1, 12):02d}-01'
+        high = f'{rng.randint(2022, 2025)}-{rng.randint(1, 12):02d}-28'
+        conditions['GAME_DATE'] = rng.choice([(low, high), (None, high), (low, None)])
+    return conditions
+
+
+def test_find_matches_brute_force(tmp_path, store):
+    store_dir, rows = store
+    assert build_index('full_player_stats', [store_dir], str(tmp_path / 'index')) == len(rows)
+    rng = random.Random(6)
+    with RecordIndex(str(tmp_path / 'index' / 'full_player_stats')) as index:
+        for _ in range(300):
+            conditions = random_conditions(rng, rows)
+            assert index.find(**conditions).tolist() == brute_force(rows, conditions), conditions
+        found = index.get(PLAYER_ID=2544, GAME_DATE=('2023-01-01', '2023-06-30'))
+        assert found == [rows[n] for n in brute_force(rows, {'PLAYER_ID': 2544,
+                                                             'GAME_DATE': ('2023-01-01', '2023-06-30')})]
+        assert index.lookup('PLAYER_ID', 2544).tolist() == brute_force(rows, {'PLAYER_ID': 2544})
+        assert index.lookup('GAME_ID', [rows[0]['GAME_ID']] * 2).tolist() == \
+            brute_force(rows, {'GAME_ID': rows[0]['GAME_ID']})
+        assert sorted(index.range('TEAM_ID', TEAMS[1]).tolist()) == \
+            brute_force(rows, {'TEAM_ID': (TEAMS[1], None)})
+        with pytest.raises(KeyError):
+            index.find(PTS=3)
+
+
+def test_box_score_lines(tmp_path):
+    games = [{'id': f'00223000{i:02d}', 'PlayerStats': [
+        {'GAME_ID': f'00223000{i:02d}', 'PLAYER_ID': player, 'TEAM_ID': TEAMS[0], 'PTS': i}
+        for player in PLAYERS[:i % 4 + 1]]} for i in range(20)]
+    source = str(tmp_path / 'playerBoxscore.json')
+    serializer.dump(games, source, 'compact')
+    with open_index('playerBoxscore', str(tmp_path / 'index'), [source]) as index:
+        lines = [line for game in games for line in game['PlayerStats']]
+        assert index.rows == len(lines)
+        assert index.game_lines('0022300007') == games[7]['PlayerStats']
+        assert index.find(PLAYER_ID=PLAYERS[3]).tolist() == brute_force(lines, {'PLAYER_ID': PLAYERS[3]})
+
+
+def test_stale_index_is_rebuilt(tmp_path, store):
+    store_dir, rows = store
+    root = str(tmp_path / 'index')
+    index = open_index('full_player_stats', root, [store_dir])
+    assert index.rows == len(rows) and not index.is_stale()
+    index.close()
+
+    extra = player_rows('2024_25', 10, random.Random(7))
+    serializer.dump(extra, os.path.join(store_dir, '2024_25.ndjson'), 'ndjson')
+    assert RecordIndex(os.path.join(root, 'full_player_stats')).is_stale()
+    with open_index('full_player_stats', root, [store_dir]) as index:
+        assert index.rows == len(rows) + 10
+        assert index.records([len(rows)]) == [extra[0]]
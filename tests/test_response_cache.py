@@ -0,0 +1,145 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from nba_api.stats.library.http import NBAStatsHTTP, NBAStatsResponse
+
+from api_call import response_cache, set_base_url
+from api_call.response_cache import ResponseCache, cached, cache_key, default_ttl, is_empty_response, \
+    STATS_BASE_URL
+
+# GAME_ID of the 2010-11 season: a closed season, cached without expiry
+CLOSED_GAME_ID = '0021000001'
+
+
+def payload(player_rows, team_rows=None):
+    return json.dumps({'resultSets': [
+        {'name': 'PlayerStats', 'headers': ['PLAYER_ID', 'PTS'], 'rowSet': player_rows},
+        {'name': 'TeamStats', 'headers': ['TEAM_ID', 'PTS'], 'rowSet': team_rows or []},
+    ]})
+
+
+def fake_endpoint(*responses):
+    """nba_api endpoint stand-in answering `responses` in turn, `requests` counts the calls to the server."""
+    pending = list(responses)
+
+    class FakeBoxScore():
+        endpoint = 'boxscoreadvancedv2'
+        requests = []
+
+        def __init__(self, game_id, get_request=True):
+            self.parameters = {'GameID': game_id}
+            if get_request:
+                self.get_request()
+
+        def get_request(self):
+            FakeBoxScore.requests.append(self.parameters['GameID'])
+            self.nba_response = NBAStatsResponse(response=pending.pop(0), status_code=200, url=None)
+            self.load_response()
+
+        def load_response(self):
+            self.data = self.nba_response.get_dict()
+
+    return FakeBoxScore
+
+
+def player_rows(endpoint):
+    return endpoint.data['resultSets'][0]['rowSet']
+
+
+def test_ttl_closed_and_current_season():
+    assert default_ttl('boxscoreadvancedv2', {'GameID': CLOSED_GAME_ID}) is None
+    assert default_ttl('boxscoreadvancedv2', {'GameID': '0022400001'}) is not None
+
+
+def test_expired_entry_is_a_miss(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttl=lambda endpoint, parameters: 60)
+    cache.set('e', {'a': 1}, '{"x": 1}')
+    assert cache.get('e', {'a': 1}) == '{"x": 1}'
+    old = time.time() - 120
+    os.utime(cache._path(cache_key('e', {'a': 1})), (old, old))
+    assert cache.get('e', {'a': 1}) is None
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_entry_evicted_while_reading_is_a_miss(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path), ttl=lambda endpoint, parameters: None)
+    cache.set('e', {'a': 1}, '{"x": 1}')
+
+    def evicted(path, *args, **kwargs):
+        raise FileNotFoundError(path)
+    # Another thread removes the file between the stat and the open
+    monkeypatch.setattr(response_cache, 'open', evicted, raising=False)
+    assert cache.get('e', {'a': 1}) is None
+    assert cache.stats()['misses'] == 1
+
+
+def test_counters_across_threads(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttl=lambda endpoint, parameters: None)
+    cache.set('e', {'a': 1}, '{"x": 1}')
+
+    def read(n):
+        cache.get('e', {'a': 1 if n % 2 else 2})
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(read, range(400)))
+    assert cache.stats()['hits'] == 200 and cache.stats()['misses'] == 200
+
+
+def test_evicts_least_recently_read(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=1000, ttl=lambda endpoint, parameters: None)
+    for n in range(3):
+        cache.set('e', {'n': n}, 'x' * 300)
+    # Last reads (atime): n=1 the oldest
+    for n, atime in ((0, 300), (1, 100), (2, 200)):
+        path = cache._path(cache_key('e', {'n': n}))
+        os.utime(path, (atime, os.stat(path).st_mtime))
+
+    cache.set('e', {'n': 3}, 'x' * 300)
+    assert cache.stats()['bytes'] <= 900
+    assert cache.get('e', {'n': 1}) is None
+    assert cache.get('e', {'n': 0}) is not None and cache.get('e', {'n': 3}) is not None
+
+
+def test_is_empty_response():
+    assert is_empty_response(payload([]))
+    # Team rows only: the player lines are not published yet
+    assert is_empty_response(payload([], [[1610612737, 100]]))
+    assert not is_empty_response(payload([[1, 20]]))
+    assert not is_empty_response(json.dumps({'meta': {}, 'boxScoreTraditional': {}}))
+    assert not is_empty_response(json.dumps({'resultSets': {'Meta': {}}}))
+    assert is_empty_response(json.dumps({'resultSets': [{'name': 'LeagueGameFinderResults', 'rowSet': []}]}))
+
+
+def test_empty_response_is_not_cached(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    server = fake_endpoint(payload([]), payload([[1, 20]]))
+    endpoint = cached(server, cache)
+
+    assert player_rows(endpoint(CLOSED_GAME_ID)) == []
+    assert cache.stats()['entries'] == 0
+    # Asked again, then served from the cache
+    assert player_rows(endpoint(CLOSED_GAME_ID)) == [[1, 20]]
+    assert player_rows(endpoint(CLOSED_GAME_ID)) == [[1, 20]]
+    assert len(server.requests) == 2
+    assert cache.stats()['entries'] == 1
+
+
+def test_base_url_in_key(tmp_path, monkeypatch):
+    # Keys of stats.nba.com entries did not change
+    assert cache_key('e', {'a': 1}, STATS_BASE_URL) == cache_key('e', {'a': 1})
+    assert cache_key('e', {'a': 1}, 'http://127.0.0.1:8765/stats/{endpoint}') != cache_key('e', {'a': 1})
+
+    cache = ResponseCache(str(tmp_path))
+    server = fake_endpoint(payload([[0, 99]]), payload([[1, 20]]))
+    endpoint = cached(server, cache)
+    monkeypatch.setattr(NBAStatsHTTP, 'base_url', NBAStatsHTTP.base_url)
+
+    set_base_url('http://127.0.0.1:8765/stats')
+    assert player_rows(endpoint(CLOSED_GAME_ID)) == [[0, 99]]
+    # The mock server's payload is not served to stats.nba.com requests
+    set_base_url('https://stats.nba.com/stats')
+    assert NBAStatsHTTP.base_url == STATS_BASE_URL
+    assert player_rows(endpoint(CLOSED_GAME_ID)) == [[1, 20]]
+    assert player_rows(endpoint(CLOSED_GAME_ID)) == [[1, 20]]
+    assert len(server.requests) == 2
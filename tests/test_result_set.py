@@ -0,0 +1,50 @@
+import json
+
+from nba_api.stats.endpoints import boxscoretraditionalv2
+from nba_api.stats.library.http import NBAStatsResponse
+
+from utilities import serializer
+from utilities.result_set import raw_result, is_raw_result, normalize_result, row_count, to_columnar, to_records
+
+GAME_ID = '0022400001'
+
+
+def box_score(rows=3):
+    """BoxScoreTraditionalV2 loaded from a payload in the stats.nba.com layout, without a request."""
+    result_sets = []
+    for name, headers in boxscoretraditionalv2.BoxScoreTraditionalV2.expected_data.items():
+        result_sets.append({
+            'name': name,
+            'headers': headers,
+            'rowSet': [[GAME_ID if c == 'GAME_ID' else f'{c}_{r}' if c.endswith('_NAME') else r for c in headers]
+                       for r in range(rows)],
+        })
+    api_result = boxscoretraditionalv2.BoxScoreTraditionalV2(game_id=GAME_ID, get_request=False)
+    api_result.nba_response = NBAStatsResponse(
+        response=json.dumps({'resource': 'boxscore', 'resultSets': result_sets}), status_code=200, url=None)
+    api_result.load_response()
+    return api_result
+
+
+def test_raw_result_round_trip(tmp_path):
+    api_result = box_score()
+    raw = raw_result(api_result)
+    assert is_raw_result(raw)
+    assert row_count(raw['PlayerStats']) == 3
+    assert to_records(raw['PlayerStats']) == api_result.player_stats.get_data_frame().to_dict('records')
+
+    # Written raw, read back in the get_normalized_dict layout
+    path = str(tmp_path / f'{GAME_ID}.json')
+    serializer.dump(raw, path)
+    assert normalize_result(serializer.load(path)) == api_result.get_normalized_dict()
+
+    columns = to_columnar(raw['TeamStats'])
+    assert list(columns) == raw['TeamStats']['headers']
+    assert columns['GAME_ID'] == [GAME_ID] * 3
+
+
+def test_normalized_layout_unchanged():
+    normalized = box_score().get_normalized_dict()
+    assert not is_raw_result(normalized)
+    assert normalize_result(normalized) is normalized
+    assert row_count(normalized['PlayerStats']) == 3
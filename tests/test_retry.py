@@ -0,0 +1,94 @@
+import pytest
+
+import utils
+from api_call import retry
+from api_call.retry import CircuitBreaker, ThrottledError
+
+
+@pytest.fixture
+def waits(monkeypatch):
+    """time.sleep of utils.retry, recorded instead of slept."""
+    slept = []
+    monkeypatch.setattr(utils.time, 'sleep', slept.append)
+    return slept
+
+
+def throttled_then_ok(retry_after, failures=1):
+    calls = []
+
+    def call():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise ThrottledError(429, retry_after, 'http://stats')
+        return 'ok'
+    return call, calls
+
+
+def test_retry_after_past_max_delay(waits):
+    call, calls = throttled_then_ok(120)
+    wrapped = utils.retry(max_retries=3, delay=1, max_delay=60, exceptions=(ThrottledError,))(call)
+    assert wrapped() == 'ok'
+    assert len(calls) == 2
+    assert waits == [120]
+
+
+def test_retry_after_own_cap(waits):
+    call, _ = throttled_then_ok(3600)
+    wrapped = utils.retry(max_retries=3, delay=1, max_delay=60, exceptions=(ThrottledError,),
+                          max_retry_after=900)(call)
+    assert wrapped() == 'ok'
+    assert waits == [900]
+
+
+def test_backoff_without_retry_after(waits):
+    call, _ = throttled_then_ok(None, failures=3)
+    wrapped = utils.retry(max_retries=4, delay=1, max_delay=3, exceptions=(ThrottledError,), jitter=False)(call)
+    assert wrapped() == 'ok'
+    assert waits == [1, 2, 3]
+
+
+def test_gives_up_after_max_retries(waits):
+    call, calls = throttled_then_ok(None, failures=5)
+    wrapped = utils.retry(max_retries=3, delay=1, exceptions=(ThrottledError,))(call)
+    with pytest.raises(ThrottledError):
+        wrapped()
+    assert len(calls) == 3
+    assert len(waits) == 2
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(retry.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_breaker_opens_on_error_rate(clock):
+    breaker = CircuitBreaker('test', window=10, min_calls=4, error_rate=0.5, cooldown=30)
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    # 2 failures of 4 calls
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and breaker.opened == 1
+
+
+def test_breaker_half_open_trial(clock):
+    breaker = CircuitBreaker('test', window=10, min_calls=2, error_rate=0.5, cooldown=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock[0] += 30
+    # One trial call after the cooldown, it fails: open again
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and breaker.opened == 2
+
+    clock[0] += 30
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
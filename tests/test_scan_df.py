@@ -0,0 +1,33 @@
+from probables import CountMinSketch
+
+from utilities import data_profile
+from utilities.scan_df import create_postgres_sql_from_profile, record_path_of
+
+CMS = CountMinSketch(error_rate=0.001, confidence=0.99)
+
+
+def test_create_postgres_sql_from_profile():
+    rows = [
+        {'GAME_ID': '0022300001', 'PTS': 12, 'PLAYER_ID': 1627750, 'NAME': 'Al', 'FG_PCT': 0.5, 'NOTE': None, 'BLKA': 1},
+        {'GAME_ID': '0022300002', 'PTS': 40, 'PLAYER_ID': 2147483648, 'NAME': 'Alexander', 'FG_PCT': None, 'NOTE': None},
+    ]
+    profile = data_profile.profile_json_data({'PlayerStats': rows}, CMS.width, CMS.depth, 0.001, 0.99)
+    assert record_path_of(profile) == '$.PlayerStats[*]'
+
+    script = create_postgres_sql_from_profile(profile, 'playerStats')
+    columns = {line.strip().rstrip(',') for line in script.splitlines()[1:-1]}
+    assert columns == {
+        '"game_id" CHAR(10) NOT NULL',
+        # Integer width from min / max
+        '"pts" SMALLINT NOT NULL',
+        '"player_id" BIGINT NOT NULL',
+        # Longest string with headroom
+        '"name" VARCHAR(12) NOT NULL',
+        '"fg_pct" REAL',
+        # All null: no type seen
+        '"note" TEXT',
+        # Missing from a record
+        '"blka" SMALLINT',
+        '"creation_timestamp" TIMESTAMPTZ DEFAULT NOW() NOT NULL',
+    }
+    assert script.startswith('CREATE TABLE "playerStats" (')
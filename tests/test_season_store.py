@@ -0,0 +1,132 @@
+import gzip
+import json
+
+import pytest
+
+from utilities import season_store, serializer
+from utilities.season_store import SeasonStore, game_hash, unique_records
+
+
+def player_row(game_id, player_id, pts=10):
+    return {'GAME_ID': game_id, 'PLAYER_ID': player_id, 'PTS': pts}
+
+
+def combined_file(tmp_path, records):
+    path = tmp_path / 'full_player_stats.json'
+    path.write_text(json.dumps(records), encoding='utf-8')
+    return str(path)
+
+
+RECORDS = [player_row(game_id, player_id)
+           for game_id in ('0021000001', '0021000002', '0021100001', '0021200001')
+           for player_id in (1, 2)]
+
+
+def test_import_combined(tmp_path):
+    store = SeasonStore(str(tmp_path / 'store'), 'full_player_stats')
+    source = combined_file(tmp_path, RECORDS)
+
+    assert store.import_combined(source) == {'2010_11': 2, '2011_12': 1, '2012_13': 1}
+    assert store.seasons() == ['2010_11', '2011_12', '2012_13']
+    assert list(store.iter_all()) == RECORDS
+    # Done once
+    assert store.import_combined(source) == {}
+
+
+def test_import_combined_resumes(tmp_path, monkeypatch):
+    store = SeasonStore(str(tmp_path / 'store'), 'full_player_stats')
+    source = combined_file(tmp_path, RECORDS)
+
+    index_rows = store._index_rows
+    def fail_on_2012(season, games):
+        if season == '2012_13':
+            raise OSError('disk full')
+        return index_rows(season, games)
+    monkeypatch.setattr(store, '_index_rows', fail_on_2012)
+    with pytest.raises(OSError):
+        store.import_combined(source)
+    assert store.imported_seasons() == {'2010_11', '2011_12'}
+    assert '2012_13' not in store.seasons()
+
+    monkeypatch.undo()
+    assert store.import_combined(source) == {'2012_13': 1}
+    assert store.count() == 4
+    assert list(store.iter_all()) == RECORDS
+
+
+def test_import_combined_legacy_partial(tmp_path):
+    # Migrated before season_import existed, stopped after indexing 2010-11
+    store = SeasonStore(str(tmp_path / 'store'), 'full_player_stats')
+    source = combined_file(tmp_path, RECORDS)
+    store.import_combined(source)
+    store._conn.execute('DELETE FROM game WHERE season != ?', ('2010_11',))
+    store._conn.execute('DELETE FROM season_import')
+    store._conn.execute('DELETE FROM meta')
+
+    assert store.import_combined(source) == {'2011_12': 1, '2012_13': 1}
+    assert store.count() == 4
+
+
+def test_write_combined_keeps_format(tmp_path):
+    source = tmp_path / 'full_player_stats.ndjson.gz'
+    serializer.write_records(str(source), RECORDS, fmt='ndjson', compression='gzip')
+    store = SeasonStore(str(tmp_path / 'store'), 'full_player_stats')
+    store.import_combined(str(source))
+    store.upsert([player_row('0021300001', 1)])
+
+    assert store.write_combined(str(source)) == len(RECORDS) + 1
+    with gzip.open(source, 'rt', encoding='utf-8') as f1:
+        assert json.loads(f1.readline()) == RECORDS[0]
+    assert serializer.load(str(source)) == RECORDS + [player_row('0021300001', 1)]
+
+    output_file = str(tmp_path / 'full_player_stats.json')
+    store.write_combined(output_file)
+    with open(output_file, encoding='utf-8') as f1:
+        assert f1.read(1) == '['
+    assert serializer.load(output_file) == serializer.load(str(source))
+
+
+def test_unique_records():
+    regular = [player_row('0022300001', 1, 30), player_row('0022300001', 2, 12)]
+    ist = [player_row('0022300001', 1, 31), player_row('0022300002', 1, 8)]
+    assert list(unique_records(regular + ist, ('GAME_ID', 'PLAYER_ID'))) == regular + ist[1:]
+
+
+def test_upsert(tmp_path):
+    store = SeasonStore(str(tmp_path / 'store'), 'full_player_stats')
+    game = [player_row('0022300001', 1, 30), player_row('0022300001', 2, 12)]
+    assert store.upsert(game) == {'added': ['0022300001'], 'changed': []}
+
+    # Same rows, listed in another order
+    assert store.upsert(game[::-1]) == {'added': [], 'changed': []}
+
+    corrected = [player_row('0022300001', 1, 32), game[1], player_row('0022300002', 1, 8)]
+    assert store.upsert(corrected) == {'added': ['0022300002'], 'changed': ['0022300001']}
+    assert sorted(store.iter_season('2023_24'), key=lambda i: (i['GAME_ID'], i['PLAYER_ID'])) == \
+        [corrected[0], corrected[1], corrected[2]]
+
+
+def test_box_score_hash_ignores_row_order():
+    record = {'id': '0022300001',
+              'PlayerStats': [{'PLAYER_ID': 1, 'PTS': 30}, {'PLAYER_ID': 2, 'PTS': 12}],
+              'TeamStats': [{'TEAM_ID': 1610612737, 'PTS': 100}, {'TEAM_ID': 1610612738, 'PTS': 98}]}
+    reordered = {'id': '0022300001',
+                 'PlayerStats': record['PlayerStats'][::-1], 'TeamStats': record['TeamStats'][::-1]}
+    assert game_hash([record]) == game_hash([reordered])
+    assert game_hash([record]) != game_hash([dict(record, PlayerStats=record['PlayerStats'][:1])])
+
+
+def test_replace_rolls_back(tmp_path, monkeypatch):
+    store = SeasonStore(str(tmp_path / 'store'), 'full_player_stats')
+    game = [player_row('0022300001', 1, 30)]
+    store.upsert(game)
+    before = store.hashes(['0022300001'])
+
+    def replace_fails(src, dst):
+        raise OSError('locked')
+    monkeypatch.setattr(season_store.os, 'replace', replace_fails)
+    with pytest.raises(OSError):
+        store.upsert([player_row('0022300001', 1, 32)])
+    assert not store._conn.in_transaction
+    assert store.hashes(['0022300001']) == before
+    assert list(store.iter_season('2023_24')) == game
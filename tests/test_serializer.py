@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from utilities import serializer
+from utilities.serializer import START_MAP, MAP_KEY, END_MAP, START_ARRAY, END_ARRAY, VALUE
+
+RECORDS = [
+    {'GAME_ID': '0022300001', 'PTS': 31, 'FG_PCT': 0.523, 'MIN': -1.5e-3, 'WL': None, 'STARTER': True},
+    {'PLAYER_NAME': 'Luka Dončić', 'NOTE': 'say "hi"\\n, [x] {y}', 'EMPTY': [], 'NESTED': {'a': [1, [2, {}]]}},
+    12345678901234567890,
+    'a string, with a comma',
+]
+
+
+def write(tmp_path, text, name='data.json'):
+    path = tmp_path / name
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 5, 7, 16, 64, 4096])
+def test_array_across_chunk_boundaries(tmp_path, chunk_size):
+    for text in (json.dumps(RECORDS, ensure_ascii=False), json.dumps(RECORDS, indent=4),
+                 ' \n[ ' + ' ,\n'.join(json.dumps(i) for i in RECORDS) + ' ]\n'):
+        path = write(tmp_path, text)
+        assert list(serializer.iter_json(path, chunk_size=chunk_size)) == RECORDS
+
+
+@pytest.mark.parametrize('chunk_size', [1, 4, 9, 4096])
+def test_key_across_chunk_boundaries(tmp_path, chunk_size):
+    document = {'resource': 'playergamelogs', 'parameters': {'Season': '2023-24', 'Skip': [1, '[']},
+                'PlayerGameLogs': RECORDS[:2], 'after': 1}
+    path = write(tmp_path, json.dumps(document, indent=2))
+    assert list(serializer.iter_json(path, key='PlayerGameLogs', chunk_size=chunk_size)) == RECORDS[:2]
+    events = list(serializer.iter_events(path, key='PlayerGameLogs', chunk_size=chunk_size))
+    assert events == [(START_MAP, None), (MAP_KEY, 'PlayerGameLogs'), (START_ARRAY, None),
+                      (VALUE, RECORDS[0]), (VALUE, RECORDS[1]), (END_ARRAY, None), (END_MAP, None)]
+    with pytest.raises(KeyError):
+        list(serializer.iter_json(path, key='missing', chunk_size=chunk_size))
+
+
+@pytest.mark.parametrize('chunk_size', [1, 5, 4096])
+def test_events_record_is_one_value(tmp_path, chunk_size):
+    # Items of a top-level array, of an array under a key, and NDJSON lines all come out whole
+    path = write(tmp_path, json.dumps(RECORDS[:2]))
+    assert list(serializer.iter_events(path, chunk_size=chunk_size)) == [
+        (START_ARRAY, None), (VALUE, RECORDS[0]), (VALUE, RECORDS[1]), (END_ARRAY, None)]
+    path = write(tmp_path, '\n'.join(json.dumps(i) for i in RECORDS[:2]), 'data.ndjson')
+    assert list(serializer.iter_events(path, chunk_size=chunk_size)) == [
+        (START_ARRAY, None), (VALUE, RECORDS[0]), (VALUE, RECORDS[1]), (END_ARRAY, None)]
+    path = write(tmp_path, json.dumps({'PlayerStats': RECORDS[:1]}))
+    assert list(serializer.iter_events(path, chunk_size=chunk_size)) == [
+        (START_MAP, None), (MAP_KEY, 'PlayerStats'), (START_ARRAY, None), (VALUE, RECORDS[0]),
+        (END_ARRAY, None), (END_MAP, None)]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 6, 4096])
+def test_concatenated_documents(tmp_path, chunk_size):
+    path = write(tmp_path, '{"a": 1} {"b": [2]}\n{"c": "}"}')
+    assert list(serializer.iter_json(path, chunk_size=chunk_size)) == [{'a': 1}, {'b': [2]}, {'c': '}'}]
+
+
+@pytest.mark.parametrize('fmt', serializer.FORMATS)
+@pytest.mark.parametrize('compression', [None, 'gzip'])
+def test_round_trip(tmp_path, fmt, compression):
+    path = str(tmp_path / f'records.{serializer.file_extension(fmt, compression)}')
+    serializer.dump(RECORDS[:2], path, fmt, compression)
+    assert serializer.load(path) == RECORDS[:2]
+    assert list(serializer.iter_json(path, chunk_size=3)) == RECORDS[:2]
+    assert serializer.find_data_file(str(tmp_path / 'records')) == path
+
+
+def test_ndjson_end_skips_partial_line(tmp_path):
+    path = write(tmp_path, '{"a": 1}\n{"b": 2}\n{"c":', 'data.ndjson')
+    end = serializer.ndjson_end(path)
+    assert end == len('{"a": 1}\n{"b": 2}\n')
+    assert list(serializer.iter_ndjson(path, len('{"a": 1}\n'), end)) == [{'b': 2}]